@@ -72,6 +72,39 @@ def task_test():
     )
 
 
+def task_benchmark():
+    """Runs the microbenchmarks and compares them against the stored baseline"""
+    return dict(
+        params=[
+            dict(
+                name="threshold",
+                long="threshold",
+                type=float,
+                default=0.1,
+                help="Tolerated relative slowdown before a benchmark fails",
+            ),
+            dict(
+                name="save",
+                long="save",
+                type=bool,
+                default=False,
+                help="Store the results as new baseline",
+            ),
+        ],
+        actions=[
+            do(
+                lambda threshold, save: [
+                    "python",
+                    str(HERE / "scripts" / "benchmark.py"),
+                    f"--threshold={threshold}",
+                    *(["--save"] if save else []),
+                ]
+            )
+        ],
+        verbosity=2,
+    )
+
+
 def task_build():
     """Builds the source distribution and wheel"""
     return dict(
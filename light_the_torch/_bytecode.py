@@ -0,0 +1,81 @@
+import compileall
+import concurrent.futures
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import warnings
+from typing import Iterable, List, Optional, Set
+
+DEFERRED_MARKER_FILE = "LTT_DEFERRED_BYTECODE"
+
+
+def _compile_file(path: str) -> bool:
+    # This mirrors how pip compiles the installed files.
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        with contextlib.redirect_stdout(io.StringIO()):
+            return bool(compileall.compile_file(path, force=True, quiet=True))
+
+
+def compile_files(
+    paths: Iterable[str], *, max_workers: Optional[int] = None
+) -> Set[str]:
+    paths = list(paths)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    if max_workers <= 1:
+        results: Iterable[bool] = map(_compile_file, paths)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            results = list(
+                executor.map(
+                    _compile_file,
+                    paths,
+                    chunksize=max(len(paths) // (max_workers * 4), 1),
+                )
+            )
+
+    return {path for path, success in zip(paths, results) if success}
+
+
+def write_deferred_marker(marker_path: str, paths: Iterable[str]) -> None:
+    with open(marker_path, "w") as file:
+        file.writelines(f"{path}\n" for path in paths)
+
+
+def read_deferred_marker(marker_path: str) -> List[str]:
+    with open(marker_path) as file:
+        return [line.rstrip("\n") for line in file if line.strip()]
+
+
+def spawn_deferred_compilation(marker_path: str) -> subprocess.Popen:
+    # The process is detached, so it is neither waited for nor killed when the
+    # installation finishes.
+    return subprocess.Popen(
+        [sys.executable, "-m", __name__, marker_path],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    (marker_path,) = argv
+
+    try:
+        paths = read_deferred_marker(marker_path)
+    except FileNotFoundError:
+        return
+
+    compile_files([path for path in paths if os.path.exists(path)])
+
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(marker_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
+import functools
 import platform
 import re
 import subprocess
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional, Set
+from typing import Any, FrozenSet, List, Optional, Set
 
 from pip._vendor.packaging.version import InvalidVersion, Version
 
@@ -213,6 +214,72 @@ _MINIMUM_DRIVER_VERSIONS = {
 }
 
 
+_COMPUTE_CAPABILITY_PATTERN = re.compile(r"^\d+\.\d+$")
+
+
+# The GPUs don't change while the process is running, so nvidia-smi only needs to be
+# probed once.
+@functools.lru_cache(maxsize=None)
+def _detect_nvidia_compute_capabilities() -> FrozenSet[Version]:
+    try:
+        result = subprocess.run(
+            [
+                "nvidia-smi",
+                "--query-gpu=compute_cap",
+                "--format=csv",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        # Older drivers don't support querying the compute capability.
+        return frozenset()
+
+    # The first line is the CSV header with the name of the queried field.
+    lines = [line.strip() for line in result.stdout.splitlines()]
+    if not lines or lines[0] != "compute_cap":
+        return frozenset()
+
+    return frozenset(
+        Version(line) for line in lines[1:] if _COMPUTE_CAPABILITY_PATTERN.match(line)
+    )
+
+
+# Compute capabilities that the PyTorch binaries ship native kernels (SASS) for. All
+# other GPUs have to JIT compile the kernels from PTX at runtime. See
+# https://github.com/pytorch/builder/blob/main/manywheel/build_cuda.sh
+_SASS_ARCHITECTURES = {
+    Version(cuda_version): [Version(architecture) for architecture in architectures]
+    for cuda_version, architectures in {
+        "12.6": ["5.0", "6.0", "7.0", "7.5", "8.0", "8.6", "9.0"],
+        "12.4": ["5.0", "6.0", "7.0", "7.5", "8.0", "8.6", "9.0"],
+        "12.1": ["5.0", "6.0", "7.0", "7.5", "8.0", "8.6", "9.0"],
+        "11.8": ["3.7", "5.0", "6.0", "7.0", "7.5", "8.0", "8.6", "9.0"],
+        "11.7": ["3.7", "5.0", "6.0", "7.0", "7.5", "8.0", "8.6"],
+        "11.6": ["3.7", "5.0", "6.0", "7.0", "7.5", "8.0", "8.6"],
+        "11.3": ["3.7", "5.0", "6.0", "6.1", "7.0", "7.5", "8.0", "8.6"],
+        "11.1": ["3.7", "5.0", "6.0", "6.1", "7.0", "7.5", "8.0", "8.6"],
+        "10.2": ["3.7", "5.0", "6.0", "6.1", "7.0", "7.5"],
+    }.items()
+}
+
+
+def _has_native_kernels(cuda_version: Version, compute_capability: Version) -> bool:
+    architectures = _SASS_ARCHITECTURES.get(cuda_version)
+    # If we don't know which architectures are supported, we assume the best.
+    if architectures is None:
+        return True
+
+    # Native kernels are compatible with all GPUs of the same major and a greater or
+    # equal minor compute capability.
+    return any(
+        architecture.major == compute_capability.major
+        and architecture.minor <= compute_capability.minor
+        for architecture in architectures
+    )
+
+
 def _detect_compatible_cuda_backends() -> List[CUDABackend]:
     driver_version = _detect_nvidia_driver_version()
     if not driver_version:
@@ -222,12 +289,30 @@ def _detect_compatible_cuda_backends() -> List[CUDABackend]:
     if not minimum_driver_versions:
         return []
 
-    return [
-        CUDABackend(cuda_version.major, cuda_version.minor)
+    cuda_versions = [
+        cuda_version
         for cuda_version, minimum_driver_version in minimum_driver_versions.items()
         if driver_version >= minimum_driver_version
     ]
 
+    # The driver is able to run all of these backends. Still, we prefer the ones that
+    # ship native kernels for the installed GPUs, since otherwise the kernels have to
+    # be JIT compiled on first use. If none of them does, we keep all of them.
+    compute_capabilities = _detect_nvidia_compute_capabilities()
+    native_cuda_versions = [
+        cuda_version
+        for cuda_version in cuda_versions
+        if all(
+            _has_native_kernels(cuda_version, compute_capability)
+            for compute_capability in compute_capabilities
+        )
+    ]
+
+    return [
+        CUDABackend(cuda_version.major, cuda_version.minor)
+        for cuda_version in native_cuda_versions or cuda_versions
+    ]
+
 
 def detect_compatible_computation_backends() -> Set[ComputationBackend]:
     return {*_detect_compatible_cuda_backends(), CPUBackend()}
@@ -0,0 +1,103 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import urllib.parse
+from typing import Any, Callable, Dict, Generic, Iterable, Set, TypeVar
+
+from pip._internal.models.link import Link
+
+T = TypeVar("T")
+
+
+class PageCollector(Generic[T]):
+    def __init__(self, fetch: Callable[[Link], T], *, max_per_host: int) -> None:
+        self._fetch = fetch
+        self._max_per_host = max_per_host
+
+        # The pages are fetched with pip's blocking session. Thus, the event loop only
+        # schedules the fetches and limits the concurrency, while the actual requests
+        # are performed by a thread pool.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            thread_name_prefix="ltt-collection"
+        )
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="ltt-collection-loop", daemon=True
+        )
+        self._thread.start()
+
+        # Only accessed from within the event loop.
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._collected: Set[str] = set()
+
+    async def _collect(self, link: Link, context: contextvars.Context) -> T:
+        host = urllib.parse.urlsplit(link.url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self._max_per_host)
+
+        async with semaphore:
+            return await self._loop.run_in_executor(
+                None, context.run, self._fetch, link
+            )
+
+    def _schedule(self, link: Link) -> concurrent.futures.Future:
+        future = self._pending.get(link.url)
+        if future is None:
+            # The page is fetched in the context of the caller, so it sees the same
+            # patches.
+            future = self._pending[link.url] = asyncio.run_coroutine_threadsafe(
+                self._collect(link, contextvars.copy_context()), self._loop
+            )
+        return future
+
+    def prefetch(self, links: Iterable[Link]) -> None:
+        with self._lock:
+            for link in links:
+                # Pages that were already handed to pip are not fetched again, since
+                # pip caches the candidates parsed from them.
+                if link.url not in self._collected:
+                    self._schedule(link)
+
+    def get(self, link: Link) -> T:
+        with self._lock:
+            future = self._schedule(link)
+            # We release the page as soon as it is handed to pip to keep the memory
+            # bounded. Some of the PyTorch index pages are multiple MB large.
+            del self._pending[link.url]
+            self._collected.add(link.url)
+
+        return future.result()
+
+    async def _cancel(self) -> None:
+        tasks = [
+            task
+            for task in asyncio.all_tasks(self._loop)
+            if task is not asyncio.current_task(self._loop)
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+        asyncio.run_coroutine_threadsafe(self._cancel(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        # Fetches that already started cannot be interrupted, so we need to wait for
+        # them to finish.
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "PageCollector[T]":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
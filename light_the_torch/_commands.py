@@ -0,0 +1,188 @@
+import os
+import subprocess
+import sys
+from optparse import Values
+from typing import List
+
+from pip._internal.cli.base_command import Command
+from pip._internal.cli.status_codes import ERROR, SUCCESS
+from pip._internal.metadata import get_default_environment
+from pip._internal.utils.logging import getLogger
+from pip._internal.utils.misc import format_size
+
+from . import _patch as patch, _shared_libraries as shared_libraries, _switch as switch
+
+logger = getLogger(__name__)
+
+
+class SharedLibrariesCommand(Command):
+    """
+    Inspect and manage the store of shared libraries that are deduplicated across
+    environments with '--pytorch-deduplicate-shared-libraries'.
+
+    Subcommands:
+
+    - dir: Show the store directory.
+    - gc: Remove the shared libraries that are not used by any environment anymore.
+    """
+
+    ignore_require_venv = True
+    usage = """
+        %prog dir
+        %prog gc [--dry-run]
+    """
+
+    def add_options(self) -> None:
+        self.cmd_opts.add_option(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="Only list the shared libraries that would be removed.",
+        )
+
+        self.parser.insert_option_group(0, self.cmd_opts)
+
+    def run(self, options: Values, args: List[str]) -> int:
+        handlers = {
+            "dir": self.show_store_dir,
+            "gc": self.collect_garbage,
+        }
+
+        root = shared_libraries.store_dir(options.cache_dir)
+        if root is None:
+            logger.error(
+                "The shared library store is located in the cache directory by "
+                "default, but the cache is disabled. Set %s to use a different "
+                "location.",
+                shared_libraries.STORE_DIR_ENV_VAR,
+            )
+            return ERROR
+
+        if not args or args[0] not in handlers:
+            logger.error(
+                "Need an action (%s) to perform.",
+                ", ".join(sorted(handlers)),
+            )
+            return ERROR
+
+        handlers[args[0]](shared_libraries.SharedLibraryStore(root), options)
+        return SUCCESS
+
+    def show_store_dir(
+        self, store: shared_libraries.SharedLibraryStore, options: Values
+    ) -> None:
+        logger.info(store.root)
+
+    def collect_garbage(
+        self, store: shared_libraries.SharedLibraryStore, options: Values
+    ) -> None:
+        size = 0
+        paths = store.unreferenced()
+        for path in paths:
+            size += os.stat(path).st_size
+            if options.dry_run:
+                logger.info(path)
+            else:
+                os.remove(path)
+
+        logger.info(
+            "%s %d unreferenced shared libraries (%s)",
+            "Found" if options.dry_run else "Removed",
+            len(paths),
+            format_size(size),
+        )
+
+
+class SwitchBackendCommand(Command):
+    """
+    Switch the installed PyTorch distributions to another computation backend.
+
+    Only the PyTorch distributions that were compiled against a different computation
+    backend are replaced by the same version for the new one. Their dependencies are
+    only installed if they are not satisfied yet. Afterwards, nvidia-* distributions
+    that are not required anymore are uninstalled. Unless a channel is given, the
+    replacements are installed from the channel of the installed distributions.
+    """
+
+    usage = """
+        %prog [options]
+    """
+
+    def add_options(self) -> None:
+        for option in patch.LttOptions.computation_backend_parser_options():
+            self.cmd_opts.add_option(option)
+        self.cmd_opts.add_option(patch.LttOptions.channel_parser_option())
+        self.cmd_opts.add_option(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="Only show the distributions that would be replaced.",
+        )
+
+        self.parser.insert_option_group(0, self.cmd_opts)
+
+    def run(self, options: Values, args: List[str]) -> int:
+        # If multiple computation backends are available, we switch to the one that
+        # would be preferred during an installation.
+        computation_backend = max(
+            patch.LttOptions.computation_backends_from_opts(options)
+        )
+
+        distributions = list(
+            get_default_environment().iter_installed_distributions(local_only=False)
+        )
+        requirements = switch.plan_backend_switch(distributions, computation_backend)
+        if not requirements:
+            logger.info(
+                "All installed PyTorch distributions already use the computation "
+                "backend %s.",
+                computation_backend,
+            )
+            return SUCCESS
+
+        logger.info("Replacing %s", ", ".join(requirements))
+        if options.dry_run:
+            return SUCCESS
+
+        channel = (
+            patch.Channel.from_str(options.pytorch_channel)
+            if options.pytorch_channel is not None
+            else switch.installed_channel(distributions, computation_backend)
+        )
+
+        previous_nvidia_distributions = {
+            distribution.canonical_name
+            for distribution in distributions
+            if distribution.canonical_name.startswith("nvidia-")
+        }
+
+        install_cmd = [
+            sys.executable,
+            "-m",
+            "light_the_torch",
+            "install",
+            f"--pytorch-computation-backend={computation_backend}",
+        ]
+        if options.pytorch_consistent_computation_backend:
+            install_cmd.append("--pytorch-consistent-computation-backend")
+        if channel != patch.Channel.STABLE:
+            install_cmd.append(f"--pytorch-channel={channel.name.lower()}")
+        if subprocess.call([*install_cmd, *requirements]) != 0:
+            return ERROR
+
+        obsolete = switch.obsolete_distributions(
+            previous_nvidia_distributions,
+            get_default_environment().iter_installed_distributions(local_only=False),
+        )
+        if not obsolete:
+            return SUCCESS
+
+        logger.info(
+            "Uninstalling %s, since they are not required anymore",
+            ", ".join(obsolete),
+        )
+        uninstall_cmd = [sys.executable, "-m", "light_the_torch", "uninstall", "-y"]
+        if subprocess.call([*uninstall_cmd, *obsolete]) != 0:
+            return ERROR
+
+        return SUCCESS
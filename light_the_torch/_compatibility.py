@@ -0,0 +1,89 @@
+import functools
+import importlib.resources
+import json
+from typing import Dict, List, Mapping, Optional
+
+from pip._vendor.packaging.specifiers import SpecifierSet
+from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.packaging.version import InvalidVersion, Version
+
+COMPATIBILITY_MATRIX_FILE = "_compatibility_matrix.json"
+
+
+@functools.lru_cache(maxsize=None)
+def load_compatibility_matrix() -> Dict[str, Dict[str, str]]:
+    # The matrix maps the version of a PyTorch distribution to the version of torch
+    # it requires. It can be regenerated with
+    # scripts/generate_compatibility_matrix.py.
+    return json.loads(
+        importlib.resources.files(__package__)
+        .joinpath(COMPATIBILITY_MATRIX_FILE)
+        .read_text()
+    )
+
+
+def _pinned_version(specifier: SpecifierSet) -> Optional[str]:
+    specs = list(specifier)
+    if len(specs) != 1:
+        return None
+
+    spec = specs[0]
+    if spec.operator not in {"==", "==="} or spec.version.endswith(".*"):
+        return None
+
+    try:
+        return Version(spec.version).base_version
+    except InvalidVersion:
+        return None
+
+
+def torch_version_constraints(
+    user_specifiers: Mapping[str, SpecifierSet]
+) -> List[SpecifierSet]:
+    matrix = load_compatibility_matrix()
+    constraints = []
+    for name, specifier in user_specifiers.items():
+        name = canonicalize_name(name)
+        if name == "torch":
+            # We can only compare base versions, since the matrix doesn't know about
+            # computation backends or pre-releases. Thus, we can't use specifiers
+            # with a local part or a pre-release, e.g. '==2.2.0.dev20231010', since
+            # no base version would satisfy them.
+            if not (
+                specifier.prereleases or any("+" in spec.version for spec in specifier)
+            ):
+                constraints.append(specifier)
+            continue
+
+        # For all other distributions we only use the requirement if it is pinned.
+        # Otherwise, it might be satisfied by a version that is not in the matrix yet.
+        version = _pinned_version(specifier)
+        if version is None:
+            continue
+
+        torch_version = matrix.get(name, {}).get(version)
+        if torch_version is not None:
+            constraints.append(SpecifierSet(f"=={torch_version}"))
+
+    return constraints
+
+
+def required_torch_version(name: str, version: Version) -> Optional[str]:
+    name = canonicalize_name(name)
+    if name == "torch":
+        return version.base_version
+
+    return load_compatibility_matrix().get(name, {}).get(version.base_version)
+
+
+def is_compatible(
+    name: str, version: Version, torch_constraints: List[SpecifierSet]
+) -> bool:
+    torch_version = required_torch_version(name, version)
+    if torch_version is None:
+        return True
+
+    return all(
+        constraint.contains(torch_version, prereleases=True)
+        for constraint in torch_constraints
+    )
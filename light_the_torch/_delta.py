@@ -0,0 +1,372 @@
+import collections
+import copy
+import dataclasses
+import hashlib
+import io
+import os
+import re
+import shutil
+import struct
+import uuid
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pip._internal.utils.misc import ensure_dir
+
+from ._utils import cache_subdir
+
+# The tail is fetched with the first request. For the torch wheels it includes the
+# whole central directory, so the comparison only needs a single request.
+TAIL_SIZE = 4 * 1024 * 1024
+# Ranges that are separated by less than this are downloaded with a single request,
+# since the overhead of another request outweighs the additional bytes.
+MAX_GAP = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+_CONTENT_RANGE_PATTERN = re.compile(
+    r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+)$"
+)
+_LOCAL_HEADER_STRUCT = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\003\004"
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+
+class DeltaError(Exception):
+    pass
+
+
+def store_dir(cache_dir: Optional[str]) -> Optional[str]:
+    return cache_subdir(cache_dir, "ltt", "nightly-wheels")
+
+
+def _wheel_key(filename: str) -> str:
+    # Nightly wheels of the same project, computation backend, and platform only
+    # differ in the date of the version, e.g.
+    # torch-2.3.0.dev20240101+cu121-cp311-cp311-linux_x86_64.whl. See
+    # https://packaging.python.org/en/latest/specifications/binary-distribution-format/#file-name-convention
+    name, version, *_, python, abi, platform = filename[: -len(".whl")].split("-")
+    _, _, local = version.partition("+")
+    return "-".join([name, local or "none", python, abi, platform])
+
+
+class NightlyWheelStore:
+    # Keeps the last downloaded nightly wheel of every project, computation backend,
+    # and platform as base for the delta download of the next one.
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.root, f"{_wheel_key(filename)}.whl")
+
+    def base(self, filename: str) -> Optional[str]:
+        path = self.path(filename)
+        return path if os.path.exists(path) else None
+
+    def add(self, filename: str, path: str) -> None:
+        ensure_dir(self.root)
+        tmp_path = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            # Hard linking avoids copying multiple GB, but is only possible if the
+            # download location is on the same file system.
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, self.path(filename))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class RangeReader(io.RawIOBase):
+    # Read-only file object over a remote file that fetches the requested bytes with
+    # HTTP range requests. This is enough for zipfile.ZipFile to parse the central
+    # directory without downloading the members.
+    def __init__(self, session, url: str, *, tail_size: int = TAIL_SIZE) -> None:
+        super().__init__()
+        self._session = session
+        self.url = url
+        self.downloaded = 0
+        self._pos = 0
+        self._chunks: List[Tuple[int, bytes]] = []
+
+        response = self._get(f"bytes=-{tail_size}")
+        start, _, self.size = self._parse_content_range(response)
+        self.content_type = response.headers.get("Content-Type", "")
+        self._chunks.append((start, self._read_body(response)))
+
+    def _get(self, range: str):
+        response = self._session.get(
+            self.url,
+            # The members are compressed already. Thus, the offsets need to refer to
+            # the file as is.
+            headers={"Range": range, "Accept-Encoding": "identity"},
+            stream=True,
+        )
+        if response.status_code != 206:
+            response.close()
+            raise DeltaError(
+                f"Expected a partial response from {self.url}, "
+                f"but got status {response.status_code}"
+            )
+        return response
+
+    def _parse_content_range(self, response) -> Tuple[int, int, int]:
+        match = _CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+        if match is None:
+            response.close()
+            raise DeltaError(f"Unable to parse the content range of {self.url}")
+        return int(match["start"]), int(match["end"]) + 1, int(match["size"])
+
+    def _read_body(self, response) -> bytes:
+        with response:
+            body = response.raw.read(decode_content=False)
+        self.downloaded += len(body)
+        return body
+
+    def _cached(self, start: int, end: int) -> Optional[bytes]:
+        for chunk_start, chunk in self._chunks:
+            if chunk_start <= start and end <= chunk_start + len(chunk):
+                return chunk[start - chunk_start : end - chunk_start]
+        return None
+
+    def iter_range(self, start: int, end: int) -> Iterator[bytes]:
+        if start >= end:
+            return
+
+        cached = self._cached(start, end)
+        if cached is not None:
+            yield cached
+            return
+
+        response = self._get(f"bytes={start}-{end - 1}")
+        if self._parse_content_range(response)[:2] != (start, end):
+            response.close()
+            raise DeltaError(f"Got a different range from {self.url} than requested")
+
+        remaining = end - start
+        with response:
+            while remaining:
+                chunk = response.raw.read(
+                    min(CHUNK_SIZE, remaining), decode_content=False
+                )
+                if not chunk:
+                    raise DeltaError(f"Partial response from {self.url} ended early")
+                self.downloaded += len(chunk)
+                remaining -= len(chunk)
+                yield chunk
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = (
+            self.size if size is None or size < 0 else min(self._pos + size, self.size)
+        )
+        data = b"".join(self.iter_range(self._pos, end))
+        # zipfile.ZipFile only reads the end of the central directory and the central
+        # directory itself. Both are needed again to assemble the wheel.
+        if self._cached(self._pos, end) is None:
+            self._chunks.append((self._pos, data))
+        self._pos = end
+        return data
+
+
+@dataclasses.dataclass
+class Segment:
+    start: int
+    end: int
+    # Bytes that are known in advance, i.e. the reconstructed local header of a
+    # member.
+    data: Optional[bytes] = None
+    # Offset of the same bytes in the base wheel.
+    base_offset: Optional[int] = None
+
+    @property
+    def is_remote(self) -> bool:
+        return self.data is None and self.base_offset is None
+
+
+def _member_key(info: zipfile.ZipInfo) -> Tuple[int, int, int, int]:
+    return info.CRC, info.compress_size, info.file_size, info.compress_type
+
+
+def _data_offset(file: BinaryIO, info: zipfile.ZipInfo) -> int:
+    file.seek(info.header_offset)
+    header = file.read(_LOCAL_HEADER_STRUCT.size)
+    if len(header) != _LOCAL_HEADER_STRUCT.size:
+        raise DeltaError(f"Truncated local header of {info.filename}")
+
+    fields = _LOCAL_HEADER_STRUCT.unpack(header)
+    if fields[0] != _LOCAL_HEADER_SIGNATURE:
+        raise DeltaError(f"Bad local header of {info.filename}")
+
+    filename_length, extra_length = fields[-2:]
+    return info.header_offset + len(header) + filename_length + extra_length
+
+
+def _local_header(info: zipfile.ZipInfo, span: int) -> Optional[bytes]:
+    # The local header is not part of the central directory, but zipfile.ZipFile and
+    # thus all common tools to build wheels write the same fields to both. The header
+    # is only used if it fills the gap to the next member exactly. Either way, the
+    # assembled wheel is verified against the hash in the end.
+    if info.flag_bits & _DATA_DESCRIPTOR_FLAG:
+        return None
+
+    for zip64 in [False, True]:
+        header = copy.copy(info).FileHeader(zip64=zip64)
+        if len(header) + info.compress_size == span:
+            return header
+    return None
+
+
+def plan(
+    new: zipfile.ZipFile, base: zipfile.ZipFile, size: int
+) -> Tuple[List[Segment], int]:
+    # Splits the new wheel into segments that are either reconstructed, copied from
+    # the base wheel, or downloaded. Returns them together with the number of reused
+    # members.
+    base_infos: Dict[str, zipfile.ZipInfo] = {
+        info.filename: info for info in base.infolist()
+    }
+    infos = sorted(new.infolist(), key=lambda info: info.header_offset)
+    # This is where the central directory starts.
+    offsets = [info.header_offset for info in infos] + [new.start_dir]
+
+    segments = []
+    if offsets[0] > 0:
+        segments.append(Segment(0, offsets[0]))
+
+    reused = 0
+    for info, start, end in zip(infos, offsets[:-1], offsets[1:]):
+        base_info = base_infos.get(info.filename)
+        header = (
+            _local_header(info, end - start)
+            if base_info is not None and _member_key(base_info) == _member_key(info)
+            else None
+        )
+        if header is None:
+            segments.append(Segment(start, end))
+            continue
+
+        data_start = start + len(header)
+        segments.append(Segment(start, data_start, data=header))
+        if end > data_start:
+            segments.append(
+                Segment(data_start, end, base_offset=_data_offset(base.fp, base_info))
+            )
+        reused += 1
+
+    segments.append(Segment(new.start_dir, size))
+    return segments, reused
+
+
+def coalesce(segments: List[Segment], *, max_gap: int = MAX_GAP) -> List[List[int]]:
+    ranges: List[List[int]] = []
+    for segment in segments:
+        if not segment.is_remote:
+            continue
+
+        if ranges and segment.start - ranges[-1][1] <= max_gap:
+            ranges[-1][1] = segment.end
+        else:
+            ranges.append([segment.start, segment.end])
+    return ranges
+
+
+def _copy(src: BinaryIO, offset: int, size: int) -> Iterator[bytes]:
+    src.seek(offset)
+    while size:
+        chunk = src.read(min(CHUNK_SIZE, size))
+        if not chunk:
+            raise DeltaError("Base wheel ended early")
+        size -= len(chunk)
+        yield chunk
+
+
+@dataclasses.dataclass
+class DeltaStats:
+    size: int
+    downloaded: int
+    members: int
+    reused: int
+
+
+def fetch(
+    session,
+    url: str,
+    base_path: str,
+    dest_path: str,
+    *,
+    hash_name: str,
+    digest: str,
+    tail_size: int = TAIL_SIZE,
+    max_gap: int = MAX_GAP,
+) -> Tuple[DeltaStats, str]:
+    # Downloads the wheel at url to dest_path while reusing all unchanged members of
+    # the wheel at base_path. Returns the statistics of the download and the content
+    # type. Raises DeltaError if the server doesn't support range requests or the
+    # assembled wheel doesn't match the digest.
+    reader = RangeReader(session, url, tail_size=tail_size)
+    with zipfile.ZipFile(reader) as new, zipfile.ZipFile(base_path) as base:
+        segments, reused = plan(new, base, reader.size)
+        pending = collections.deque(coalesce(segments, max_gap=max_gap))
+
+        hasher = hashlib.new(hash_name)
+        try:
+            with open(dest_path, "wb") as file:
+                pos = 0
+                for segment in segments:
+                    if segment.end <= pos:
+                        # Already downloaded as part of a coalesced range.
+                        continue
+
+                    if pending and segment.start >= pending[0][0]:
+                        start, end = pending.popleft()
+                        chunks = reader.iter_range(start, end)
+                    elif segment.data is not None:
+                        end = segment.end
+                        chunks = iter([segment.data])
+                    else:
+                        end = segment.end
+                        chunks = _copy(
+                            base.fp, segment.base_offset, end - segment.start
+                        )
+
+                    for chunk in chunks:
+                        hasher.update(chunk)
+                        file.write(chunk)
+                    pos = end
+
+            if hasher.hexdigest() != digest:
+                raise DeltaError(f"Assembled wheel does not match the {hash_name} hash")
+        except BaseException:
+            os.remove(dest_path)
+            raise
+
+        members = len(new.infolist())
+
+    return (
+        DeltaStats(
+            size=reader.size,
+            downloaded=reader.downloaded,
+            members=members,
+            reused=reused,
+        ),
+        reader.content_type,
+    )
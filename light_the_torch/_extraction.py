@@ -0,0 +1,202 @@
+import concurrent.futures
+import contextlib
+import contextvars
+import errno
+import mmap
+import os
+import struct
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterator, Tuple
+
+# Small members are not worth the additional system calls.
+LOW_COPY_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Indices of the name and extra field lengths in the local file header.
+_FH_FILENAME_LENGTH = 10
+_FH_EXTRA_FIELD_LENGTH = 11
+
+# The kernel copy paths are not available for all combinations of file systems. In
+# these cases we fall back to the next one.
+_UNSUPPORTED_COPY_ERRNOS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+}
+
+
+def is_script_path(record_path: str) -> bool:
+    # Mirrors pip's check for files that are installed into the scripts directory.
+    parts = record_path.split("/", 2)
+    return len(parts) > 2 and parts[0].endswith(".data") and parts[1] == "scripts"
+
+
+class ParallelExtractor:
+    def __init__(self, max_workers: int) -> None:
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="ltt-extraction"
+        )
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+
+    def submit(self, save: Callable[[], None], dest_path: str) -> None:
+        # Multiple archive members can map to the same destination. To keep the
+        # semantics of a serial extraction, i.e. the last one wins, we have to wait
+        # for the previous one to be written.
+        previous = self._futures.get(dest_path)
+        if previous is not None:
+            previous.result()
+
+        # The member is saved in the context of the caller, so it sees the same
+        # patches.
+        self._futures[dest_path] = self._executor.submit(
+            contextvars.copy_context().run, save
+        )
+
+    def wait(self) -> None:
+        futures = list(self._futures.values())
+        self._futures.clear()
+
+        done, not_done = concurrent.futures.wait(
+            futures, return_when=concurrent.futures.FIRST_EXCEPTION
+        )
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            future.result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "ParallelExtractor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self.close()
+
+
+def supports_low_copy_extraction(zipinfo: zipfile.ZipInfo) -> bool:
+    return (
+        zipinfo.compress_type in {zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED}
+        # Encrypted members are not supported by pip anyway.
+        and not zipinfo.flag_bits & 0x1
+        and zipinfo.file_size >= LOW_COPY_THRESHOLD
+    )
+
+
+def _data_offset(fd: int, zipinfo: zipfile.ZipInfo) -> int:
+    header = os.pread(fd, zipfile.sizeFileHeader, zipinfo.header_offset)
+    if len(header) != zipfile.sizeFileHeader:
+        raise zipfile.BadZipFile("Truncated file header")
+
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile("Bad magic number for file header")
+
+    return (
+        zipinfo.header_offset
+        + zipfile.sizeFileHeader
+        + fields[_FH_FILENAME_LENGTH]
+        + fields[_FH_EXTRA_FIELD_LENGTH]
+    )
+
+
+@contextlib.contextmanager
+def _map(fd: int, offset: int, length: int) -> Iterator[memoryview]:
+    start = offset - offset % mmap.ALLOCATIONGRANULARITY
+    with mmap.mmap(
+        fd, offset - start + length, offset=start, access=mmap.ACCESS_READ
+    ) as mapped:
+        with memoryview(mapped) as view:
+            with view[offset - start :] as data:
+                yield data
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, min(count, CHUNK_SIZE), offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, min(count, CHUNK_SIZE))
+
+
+_KERNEL_COPIES = [
+    copy
+    for copy, available in [
+        (_copy_file_range, hasattr(os, "copy_file_range")),
+        (_sendfile, hasattr(os, "sendfile")),
+    ]
+    if available
+]
+
+
+def _copy(src_fd: int, dst_fd: int, offset: int, data: memoryview) -> None:
+    copied = 0
+    for copy in _KERNEL_COPIES:
+        try:
+            while copied < len(data):
+                num_bytes = copy(src_fd, dst_fd, offset + copied, len(data) - copied)
+                if not num_bytes:
+                    break
+                copied += num_bytes
+        except OSError as error:
+            if error.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+
+        if copied == len(data):
+            return
+
+    # Writing directly from the memory map still avoids any copy into Python buffers.
+    while copied < len(data):
+        copied += os.write(dst_fd, data[copied:])
+
+
+def _inflate(dst_fd: int, data: memoryview) -> Tuple[int, int]:
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    crc = 0
+    size = 0
+
+    def write(chunk: bytes) -> None:
+        nonlocal crc, size
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        with memoryview(chunk) as view:
+            written = 0
+            while written < len(view):
+                written += os.write(dst_fd, view[written:])
+
+    for start in range(0, len(data), CHUNK_SIZE):
+        # The output is limited as well to keep the peak memory bounded for highly
+        # compressible members.
+        buffer = data[start : start + CHUNK_SIZE]
+        while buffer:
+            write(decompressor.decompress(buffer, CHUNK_SIZE))
+            buffer = decompressor.unconsumed_tail
+    write(decompressor.flush())
+
+    return crc, size
+
+
+def extract_member(archive: str, zipinfo: zipfile.ZipInfo, dest_path: str) -> None:
+    with open(archive, "rb") as src, open(dest_path, "wb") as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        offset = _data_offset(src_fd, zipinfo)
+        with _map(src_fd, offset, zipinfo.compress_size) as data:
+            if zipinfo.compress_type == zipfile.ZIP_STORED:
+                # Computing the checksum first also pulls the member into the page
+                # cache, which the kernel copy will read from afterwards.
+                crc, size = zlib.crc32(data), len(data)
+                _copy(src_fd, dst_fd, offset, data)
+            else:
+                crc, size = _inflate(dst_fd, data)
+
+    if size != zipinfo.file_size:
+        raise zipfile.BadZipFile(f"Bad size for file {zipinfo.filename!r}")
+    if crc != zipinfo.CRC:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for file {zipinfo.filename!r}")
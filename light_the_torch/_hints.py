@@ -0,0 +1,90 @@
+import sys
+from typing import Collection, Iterable, Set
+
+from pip._vendor.packaging.utils import canonicalize_name
+
+from . import _cb as cb
+
+# The resolver asks for the dependencies of a distribution only after it fetched its
+# metadata. Since the dependencies of the PyTorch distributions rarely change, we can
+# start fetching their index pages before that.
+DEPENDENCY_HINTS = {
+    "torch": {
+        "filelock",
+        "fsspec",
+        "jinja2",
+        "networkx",
+        "sympy",
+        "typing-extensions",
+    },
+    "torchaudio": {"torch"},
+    "torchdata": {"requests", "torch", "urllib3"},
+    "torchtext": {"numpy", "requests", "torch", "torchdata", "tqdm"},
+    "torchvision": {"numpy", "pillow", "requests", "torch"},
+    "jinja2": {"markupsafe"},
+    "requests": {"certifi", "charset-normalizer", "idna", "urllib3"},
+    "sympy": {"mpmath"},
+}
+
+# torch only depends on these on Linux and for CUDA computation backends.
+_CUDA_LIBRARIES = {
+    11: [
+        "cublas",
+        "cuda-cupti",
+        "cuda-nvrtc",
+        "cuda-runtime",
+        "cudnn",
+        "cufft",
+        "curand",
+        "cusolver",
+        "cusparse",
+        "nccl",
+        "nvtx",
+    ],
+    12: [
+        "cublas",
+        "cuda-cupti",
+        "cuda-nvrtc",
+        "cuda-runtime",
+        "cudnn",
+        "cufft",
+        "curand",
+        "cusolver",
+        "cusparse",
+        "nccl",
+        "nvjitlink",
+        "nvtx",
+    ],
+}
+
+
+def likely_dependency_closure(
+    project_names: Iterable[str],
+    computation_backends: Collection[cb.ComputationBackend],
+    *,
+    platform: str = sys.platform,
+) -> Set[str]:
+    closure: Set[str] = set()
+    stack = [canonicalize_name(project_name) for project_name in project_names]
+    while stack:
+        project_name = stack.pop()
+        if project_name in closure:
+            continue
+
+        closure.add(project_name)
+        stack.extend(DEPENDENCY_HINTS.get(project_name, ()))
+
+    if "torch" not in closure or platform != "linux":
+        return closure
+
+    for backend in computation_backends:
+        if not isinstance(backend, cb.CUDABackend):
+            continue
+
+        closure.add("triton")
+        closure.update(
+            f"nvidia-{library}-cu{backend.major}"
+            for library in _CUDA_LIBRARIES.get(backend.major, ())
+        )
+
+    return closure
@@ -0,0 +1,26 @@
+import os
+
+from pip._internal.network.cache import SafeFileCache
+from pip._vendor.cachecontrol.controller import CacheController
+
+# pip>=23.3 stores the HTTP cache in a new location and format. The old location is
+# still read by pip.
+_HTTP_CACHE_SUBDIRS = ["http-v2", "http"]
+
+
+class HTTPCache:
+    def __init__(self, cache_dir: str) -> None:
+        self._caches = [
+            SafeFileCache(os.path.join(cache_dir, subdir))
+            for subdir in _HTTP_CACHE_SUBDIRS
+        ]
+
+    def __contains__(self, url: str) -> bool:
+        # We only check for the presence of the entry instead of reading it, since
+        # for wheels it includes the whole body.
+        key = CacheController.cache_url(url.split("#", 1)[0])
+        for cache in self._caches:
+            path = cache._get_cache_path(key)
+            if os.path.exists(path) or os.path.exists(f"{path}.body"):
+                return True
+        return False
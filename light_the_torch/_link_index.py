@@ -0,0 +1,324 @@
+import bisect
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Tuple
+
+from pip._internal.exceptions import InvalidWheelFilename
+from pip._internal.models.link import Link
+from pip._internal.models.wheel import Wheel
+from pip._internal.utils.misc import ensure_dir
+from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.packaging.version import InvalidVersion, Version
+
+from ._utils import cache_subdir
+
+MAGIC = b"LTTLINK1"
+
+# magic, SHA256 digest of the page content, number of records
+_HEADER = struct.Struct("<8s32sI")
+
+# Every record consists of an (offset, length) pair per field, pointing into the
+# string table that follows the records.
+_FIELDS = [
+    "project",
+    "version",
+    "computation_backend",
+    "python_tags",
+    "abi_tags",
+    "platform_tags",
+    "url",
+    "requires_python",
+    "yanked_reason",
+    "metadata",
+]
+_RECORD = struct.Struct(f"<{2 * len(_FIELDS)}I")
+_FIELD_INDICES = {field: idx for idx, field in enumerate(_FIELDS)}
+_TAG_FIELDS = ["python_tags", "abi_tags", "platform_tags"]
+_NONE = 0xFFFFFFFF
+
+
+class InvalidLinkIndex(Exception):
+    pass
+
+
+def store_dir(cache_dir: Optional[str]) -> Optional[str]:
+    return cache_subdir(cache_dir, "ltt", "link-index")
+
+
+def _metadata(link: Link) -> Optional[str]:
+    # This is the inverse of how pip parses the data-core-metadata attribute.
+    metadata_file_data = link.metadata_file_data
+    if metadata_file_data is None:
+        return None
+    elif not metadata_file_data.hashes:
+        return "true"
+
+    name, value = next(iter(metadata_file_data.hashes.items()))
+    return f"{name}={value}"
+
+
+def _fields(link: Link) -> Optional[Tuple[Optional[str], ...]]:
+    if not link.is_wheel:
+        return None
+
+    try:
+        wheel = Wheel(link.filename)
+        version, _, computation_backend = wheel.version.partition("+")
+    except InvalidWheelFilename:
+        return None
+
+    return (
+        canonicalize_name(wheel.name),
+        version,
+        computation_backend,
+        ".".join(wheel.pyversions),
+        ".".join(wheel.abis),
+        ".".join(wheel.plats),
+        link.url,
+        link.requires_python,
+        link.yanked_reason,
+        _metadata(link),
+    )
+
+
+def _sort_key(fields):
+    project, version, *tags = fields[: _FIELD_INDICES["url"]]
+    try:
+        parsed_version = (0, Version(version))
+    except InvalidVersion:
+        parsed_version = (1, version)
+    # The projects are compared as bytes, since this is how they are looked up.
+    return (project.encode(), parsed_version, *tags)
+
+
+def compile_index(links: Iterable[Link], *, digest: bytes, path: str) -> bool:
+    records = []
+    for link in links:
+        fields = _fields(link)
+        # The index can only be queried by the information in the wheel filename.
+        # Pages with other links are parsed as usual.
+        if fields is None:
+            return False
+        records.append(fields)
+    records.sort(key=_sort_key)
+
+    strings = bytearray()
+    offsets: Dict[str, int] = {}
+    start = _HEADER.size + _RECORD.size * len(records)
+
+    def add(string: Optional[str]) -> Tuple[int, int]:
+        if string is None:
+            return 0, _NONE
+
+        # Strings like the tags repeat a lot, so we only store them once.
+        offset = offsets.get(string)
+        encoded = string.encode()
+        if offset is None:
+            offset = offsets[string] = start + len(strings)
+            strings.extend(encoded)
+        return offset, len(encoded)
+
+    packed_records = [
+        _RECORD.pack(*itertools.chain.from_iterable(map(add, fields)))
+        for fields in records
+    ]
+
+    ensure_dir(os.path.dirname(path))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, digest, len(records)))
+            file.writelines(packed_records)
+            file.write(strings)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return True
+
+
+class LinkIndex:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped.
+                raise InvalidLinkIndex(path) from None
+
+        try:
+            magic, self.digest, self._num_records = _HEADER.unpack_from(self._map)
+        except struct.error:
+            self.close()
+            raise InvalidLinkIndex(path) from None
+        if magic != MAGIC or len(self._map) < (
+            _HEADER.size + _RECORD.size * self._num_records
+        ):
+            self.close()
+            raise InvalidLinkIndex(path)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __len__(self) -> int:
+        return self._num_records
+
+    def _record(self, idx: int) -> Tuple[int, ...]:
+        return _RECORD.unpack_from(self._map, _HEADER.size + _RECORD.size * idx)
+
+    def _string(self, record: Tuple[int, ...], field: str) -> Optional[str]:
+        offset, length = self._bytes_ref(record, field)
+        if length == _NONE:
+            return None
+
+        return self._map[offset : offset + length].decode()
+
+    def _bytes_ref(self, record: Tuple[int, ...], field: str) -> Tuple[int, int]:
+        idx = 2 * _FIELD_INDICES[field]
+        return record[idx], record[idx + 1]
+
+    def _project(self, idx: int) -> bytes:
+        offset, length = self._bytes_ref(self._record(idx), "project")
+        return self._map[offset : offset + length]
+
+    def _project_range(self, project_name: str) -> range:
+        # bisect only supports a key function starting with Python 3.10.
+        projects = _LazySequence(self._project, len(self))
+        key = canonicalize_name(project_name).encode()
+        return range(
+            bisect.bisect_left(projects, key), bisect.bisect_right(projects, key)
+        )
+
+    def _is_supported(
+        self, record: Tuple[int, ...], supported_tags: Collection[Tuple[str, str, str]]
+    ) -> bool:
+        # Tags in the wheel filename can be compressed, e.g. 'py2.py3-none-any'.
+        return any(
+            tag in supported_tags
+            for tag in itertools.product(
+                *(
+                    (self._string(record, field) or "").split(".")
+                    for field in _TAG_FIELDS
+                )
+            )
+        )
+
+    def links(
+        self,
+        project_name: str,
+        *,
+        page_url: str,
+        supported_tags: Optional[Collection[Tuple[str, str, str]]] = None,
+        keep_version: Optional[Callable[[str], bool]] = None,
+    ) -> List[Link]:
+        links = []
+        # Since every string is only stored once, records with the same tags point to
+        # the same offsets. Thus, we only need to decode the tags once.
+        is_supported: Dict[Tuple[int, ...], bool] = {}
+        # Only the records of the project are decoded and only the ones that pass the
+        # filters are turned into links.
+        for idx in self._project_range(project_name):
+            record = self._record(idx)
+
+            if supported_tags is not None:
+                tag_refs = tuple(
+                    itertools.chain.from_iterable(
+                        self._bytes_ref(record, field) for field in _TAG_FIELDS
+                    )
+                )
+                supported = is_supported.get(tag_refs)
+                if supported is None:
+                    supported = is_supported[tag_refs] = self._is_supported(
+                        record, supported_tags
+                    )
+                if not supported:
+                    continue
+
+            version = self._string(record, "version") or ""
+            computation_backend = self._string(record, "computation_backend")
+            if computation_backend:
+                version = f"{version}+{computation_backend}"
+            if keep_version is not None and not keep_version(version):
+                continue
+
+            url = self._string(record, "url") or ""
+            link = Link.from_element(
+                {
+                    "href": url,
+                    "data-requires-python": self._string(record, "requires_python"),
+                    "data-yanked": self._string(record, "yanked_reason"),
+                    "data-core-metadata": self._string(record, "metadata"),
+                },
+                page_url=page_url,
+                base_url=url,
+            )
+            if link is not None:
+                links.append(link)
+        return links
+
+
+class _LazySequence:
+    def __init__(self, getter: Callable[[int], bytes], length: int) -> None:
+        self._getter = getter
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, idx: int) -> bytes:
+        return self._getter(idx)
+
+
+class LinkIndexStore:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._indices: Dict[str, LinkIndex] = {}
+
+    def path(self, url: str) -> str:
+        # Only the latest index of every page is kept.
+        return os.path.join(self.root, hashlib.sha256(url.encode()).hexdigest())
+
+    def _open(self, path: str, digest: bytes) -> Optional[LinkIndex]:
+        try:
+            index = LinkIndex(path)
+        except (FileNotFoundError, InvalidLinkIndex):
+            return None
+
+        if index.digest != digest:
+            index.close()
+            return None
+
+        return index
+
+    def open(
+        self, url: str, content: bytes, parse: Callable[[], Iterable[Link]]
+    ) -> Optional[LinkIndex]:
+        digest = hashlib.sha256(content).digest()
+
+        index = self._indices.get(url)
+        if index is not None and index.digest == digest:
+            return index
+
+        path = self.path(url)
+        index = self._open(path, digest)
+        if index is None:
+            if not compile_index(parse(), digest=digest, path=path):
+                return None
+            index = self._open(path, digest)
+            if index is None:
+                return None
+
+        previous = self._indices.pop(url, None)
+        if previous is not None:
+            previous.close()
+        self._indices[url] = index
+        return index
+
+    def close(self) -> None:
+        for index in self._indices.values():
+            index.close()
+        self._indices.clear()
@@ -0,0 +1,83 @@
+import datetime
+import posixpath
+import re
+import urllib.parse
+from typing import Callable, Optional
+
+NIGHTLY_INDEX_URL = "https://download.pytorch.org/whl/nightly/"
+
+_NIGHTLY_DATE_PATTERN = re.compile(r"\.dev(?P<date>\d{8})(\+|$)")
+_NIGHTLY_DATE_CONTENT_PATTERN = re.compile(rb"\.dev(\d{8})(?:%2B|\+|-)")
+
+
+def filename_from_url(url: str) -> str:
+    path = urllib.parse.urlsplit(url).path
+    return urllib.parse.unquote(posixpath.basename(path))
+
+
+def wheel_version(url: str) -> Optional[str]:
+    # We only extract the version from wheels, since their filenames follow a strict
+    # schema. See https://packaging.python.org/en/latest/specifications/binary-distribution-format/#file-name-convention
+    filename = filename_from_url(url)
+    if not filename.endswith(".whl"):
+        return None
+
+    parts = filename[: -len(".whl")].split("-")
+    if len(parts) not in {5, 6}:
+        return None
+
+    return parts[1]
+
+
+def nightly_date(version: str) -> Optional[str]:
+    match = _NIGHTLY_DATE_PATTERN.search(version)
+    return match["date"] if match else None
+
+
+def parse_nightly_window(string: str) -> datetime.timedelta:
+    match = re.match(r"^(?P<value>\d+)(?P<unit>[dw]?)$", string.strip().lower())
+    if match is None:
+        raise ValueError(
+            f"Unable to parse {string} into a nightly window, e.g. '7d' or '2w'"
+        )
+
+    days = int(match["value"])
+    if match["unit"] == "w":
+        days *= 7
+    return datetime.timedelta(days=days)
+
+
+def make_nightly_filter(
+    content: bytes,
+    *,
+    window: Optional[datetime.timedelta] = None,
+    latest: Optional[int] = None,
+    today: Optional[datetime.date] = None,
+) -> Optional[Callable[[str], bool]]:
+    thresholds = []
+
+    if window is not None:
+        today = today or datetime.date.today()
+        thresholds.append((today - window).strftime("%Y%m%d"))
+
+    if latest is not None:
+        # Scanning the raw content once is a lot cheaper than parsing the links, so we
+        # can determine the cutoff date without building a single link.
+        dates = sorted(
+            {date.decode() for date in _NIGHTLY_DATE_CONTENT_PATTERN.findall(content)},
+            reverse=True,
+        )
+        if len(dates) > latest:
+            thresholds.append(dates[latest - 1])
+
+    if not thresholds:
+        return None
+
+    # Dates in the YYYYMMDD format can be compared lexicographically
+    threshold = max(thresholds)
+
+    def keep(version: str) -> bool:
+        date = nightly_date(version)
+        return date is None or date >= threshold
+
+    return keep
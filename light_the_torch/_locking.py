@@ -0,0 +1,230 @@
+import contextlib
+import errno
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, Optional
+
+from pip._internal.utils.misc import ensure_dir
+
+from ._utils import cache_subdir
+
+# A lock that wasn't refreshed for this long is considered stale, e.g. because the
+# process holding it was killed or the host it runs on went down.
+STALE_AFTER = 60.0
+POLL_INTERVAL = 0.1
+
+
+class LockTimeout(Exception):
+    pass
+
+
+def locks_dir(cache_dir: Optional[str]) -> Optional[str]:
+    return cache_subdir(cache_dir, "ltt", "locks")
+
+
+def _pid_exists(pid: int) -> bool:
+    # On Windows, os.kill() terminates the process regardless of the signal. Thus, we
+    # can only rely on the modification time there.
+    if sys.platform == "win32":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # The process exists, but we are not allowed to signal it.
+        return True
+    return True
+
+
+class FileLock:
+    # Locks are acquired by hard linking a file that is unique to the owner to the lock
+    # path, since unlike O_EXCL this is atomic on NFS as well. The owner refreshes the
+    # modification time of the lock while holding it, so waiters can detect and break
+    # stale locks.
+    def __init__(
+        self,
+        path: str,
+        *,
+        stale_after: float = STALE_AFTER,
+        poll_interval: float = POLL_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+
+        self._owner: Optional[Dict[str, Any]] = None
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @property
+    def is_locked(self) -> bool:
+        return self._owner is not None
+
+    def _read_owner(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _try_acquire(self, owner: Dict[str, Any]) -> bool:
+        tmp_path = f"{self.path}.{owner['id']}"
+        with open(tmp_path, "w") as file:
+            json.dump(owner, file)
+
+        try:
+            try:
+                os.link(tmp_path, self.path)
+            except FileExistsError:
+                return False
+            except OSError as error:
+                if error.errno in {errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP}:
+                    # The file system doesn't support hard links.
+                    return self._try_acquire_exclusive(owner)
+                # On NFS the link can succeed although an error is reported. Thus, we
+                # check the link count below regardless.
+
+            try:
+                return os.stat(tmp_path).st_nlink == 2
+            except OSError:
+                return False
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+    def _try_acquire_exclusive(self, owner: Dict[str, Any]) -> bool:
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, "w") as file:
+            json.dump(owner, file)
+        return True
+
+    def _is_stale(self, stat: os.stat_result) -> bool:
+        owner = self._read_owner(self.path)
+        if (
+            owner is not None
+            and owner.get("host") == socket.gethostname()
+            and not _pid_exists(owner.get("pid", -1))
+        ):
+            return True
+
+        return time.time() - stat.st_mtime > self.stale_after
+
+    def _break_if_stale(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+
+        if not self._is_stale(stat):
+            return
+
+        # Multiple waiters might detect the stale lock at the same time. Renaming is
+        # atomic, so only one of them can break it.
+        broken_path = f"{self.path}.broken-{uuid.uuid4().hex}"
+        try:
+            os.rename(self.path, broken_path)
+        except FileNotFoundError:
+            return
+
+        try:
+            broken_stat = os.stat(broken_path)
+            if (broken_stat.st_ino, broken_stat.st_mtime) != (
+                stat.st_ino,
+                stat.st_mtime,
+            ):
+                # Another waiter broke the stale lock and acquired it in the meantime.
+                # We put it back, unless yet another one acquired it already.
+                with contextlib.suppress(OSError):
+                    os.link(broken_path, self.path)
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(broken_path)
+
+    def acquire(self, *, timeout: Optional[float] = None) -> None:
+        if self.is_locked:
+            raise RuntimeError(f"{self.path} is already locked by this instance")
+
+        ensure_dir(os.path.dirname(self.path))
+        owner = dict(
+            id=uuid.uuid4().hex,
+            host=socket.gethostname(),
+            pid=os.getpid(),
+            thread=threading.get_ident(),
+        )
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._try_acquire(owner):
+            self._break_if_stale()
+            if deadline is not None and time.monotonic() > deadline:
+                raise LockTimeout(f"Timed out waiting for {self.path}")
+            time.sleep(self.poll_interval)
+
+        self._owner = owner
+        self._stop_heartbeat.clear()
+        self._heartbeat = threading.Thread(
+            target=self._refresh, name="ltt-lock-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    def _refresh(self) -> None:
+        while not self._stop_heartbeat.wait(self.stale_after / 4):
+            if not self._owns_lock():
+                return
+
+            with contextlib.suppress(OSError):
+                os.utime(self.path)
+
+    def _owns_lock(self) -> bool:
+        owner = self._read_owner(self.path)
+        return self._owner is not None and owner == self._owner
+
+    def release(self) -> None:
+        if not self.is_locked:
+            return
+
+        self._stop_heartbeat.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+        # If the lock was broken, because it was deemed stale, it might be held by
+        # someone else by now.
+        if self._owns_lock():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+        self._owner = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class LockStore:
+    def __init__(self, root: str, **kwargs: Any) -> None:
+        self.root = root
+        self._kwargs = kwargs
+
+    def path(self, key: str) -> str:
+        return os.path.join(
+            self.root, f"{hashlib.sha256(key.encode()).hexdigest()}.lock"
+        )
+
+    @contextlib.contextmanager
+    def lock(self, key: str) -> Iterator[FileLock]:
+        with FileLock(self.path(key), **self._kwargs) as lock:
+            yield lock
@@ -0,0 +1,163 @@
+import concurrent.futures
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from pip._internal.models.link import Link, MetadataFile
+from pip._internal.utils.misc import ensure_dir
+
+from ._utils import cache_subdir
+
+# Same as pip requests the index pages with, since the validators might differ
+# between the representations.
+INDEX_ACCEPT_HEADER = ", ".join(
+    [
+        "application/vnd.pypi.simple.v1+json",
+        "application/vnd.pypi.simple.v1+html; q=0.1",
+        "text/html; q=0.01",
+    ]
+)
+
+_VALIDATOR_HEADERS = ["etag", "last-modified"]
+
+
+def memo_dir(cache_dir: Optional[str]) -> Optional[str]:
+    return cache_subdir(cache_dir, "ltt", "resolutions")
+
+
+def resolution_key(**inputs: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def validators_from_headers(headers: Mapping[str, str]) -> Optional[Dict[str, str]]:
+    validators = {name: headers[name] for name in _VALIDATOR_HEADERS if name in headers}
+    return validators or None
+
+
+def validators_from_response(response: Any) -> Optional[Dict[str, str]]:
+    # Pages that don't exist, e.g. because a project is not hosted on one of the
+    # PyTorch indices, don't contribute any links. Thus, the result stays valid as long
+    # as they still don't exist.
+    if response.status_code == 404:
+        return {"status": "404"}
+    elif response.status_code >= 400:
+        return None
+
+    return validators_from_headers(response.headers)
+
+
+@dataclasses.dataclass
+class Pin:
+    version: str
+    url: str
+    # URL of the index page the link was found on. The candidate selection relies on
+    # it for binaries without a local version specifier.
+    comes_from: str
+    # The remaining attributes of the link are needed by pip to check the hashes, to
+    # fetch only the metadata of a wheel (PEP 658), and to handle yanked files.
+    requires_python: Optional[str] = None
+    yanked_reason: Optional[str] = None
+    hashes: Dict[str, str] = dataclasses.field(default_factory=dict)
+    metadata_file_data: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_link(cls, version: str, link: Link) -> "Pin":
+        return cls(
+            version=version,
+            url=link.url,
+            comes_from=str(link.comes_from),
+            requires_python=link.requires_python,
+            yanked_reason=link.yanked_reason,
+            hashes=dict(link._hashes),
+            metadata_file_data=(
+                dataclasses.asdict(link.metadata_file_data)
+                if link.metadata_file_data is not None
+                else None
+            ),
+        )
+
+    def to_link(self) -> Link:
+        return Link(
+            self.url,
+            comes_from=self.comes_from,
+            requires_python=self.requires_python,
+            yanked_reason=self.yanked_reason,
+            metadata_file_data=(
+                MetadataFile(**self.metadata_file_data)
+                if self.metadata_file_data is not None
+                else None
+            ),
+            hashes=self.hashes,
+        )
+
+
+@dataclasses.dataclass
+class Resolution:
+    pins: Dict[str, Pin]
+    # Validators of every index page that was consulted during the resolution.
+    validators: Dict[str, Dict[str, str]]
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Resolution":
+        return cls(
+            pins={name: Pin(**pin) for name, pin in data["pins"].items()},
+            validators=data["validators"],
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+def revalidate(
+    validators: Dict[str, Dict[str, str]],
+    head: Callable[[str], Any],
+    *,
+    max_workers: int = 8,
+) -> bool:
+    # head is called with the URL of an index page and returns the current response.
+    def is_unchanged(url: str) -> bool:
+        try:
+            response = head(url)
+        except Exception:
+            return False
+
+        return validators_from_response(response) == validators[url]
+
+    if not validators:
+        return True
+
+    with concurrent.futures.ThreadPoolExecutor(
+        min(max_workers, len(validators)), thread_name_prefix="ltt-revalidation"
+    ) as executor:
+        return all(executor.map(is_unchanged, validators))
+
+
+class ResolutionMemo:
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Resolution]:
+        try:
+            with open(self.path(key)) as file:
+                return Resolution.from_json(json.load(file))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, key: str, resolution: Resolution) -> None:
+        ensure_dir(self.root)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(resolution.to_json(), file)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,241 @@
+import contextlib
+import dataclasses
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _format_size(size: Optional[int]) -> str:
+    if size is None:
+        return "n/a"
+
+    value = float(size)
+    for unit in ["B", "KiB", "MiB"]:
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+def rss() -> Optional[int]:
+    # The resident set size is only available without additional dependencies on
+    # Linux.
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclasses.dataclass
+class PhaseStats:
+    name: str
+    calls: int = 0
+    # Net traced memory that was allocated during the phase and not freed afterwards.
+    allocated: int = 0
+    peak: int = 0
+    peak_rss: Optional[int] = None
+
+
+@dataclasses.dataclass
+class _OpenPhase:
+    stats: PhaseStats
+    start: int
+    peak: int = 0
+    peak_rss: Optional[int] = None
+
+    def update_rss(self, rss: Optional[int]) -> None:
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+
+class MemoryProfiler:
+    def __init__(
+        self, *, top_allocations: int = 0, sampling_interval: float = 0.01
+    ) -> None:
+        self.top_allocations = top_allocations
+        self._sampling_interval = sampling_interval
+
+        self._stats: Dict[str, PhaseStats] = {}
+        self._open_phases: List[_OpenPhase] = []
+        self._lock = threading.Lock()
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self.allocation_sites: Dict[str, List[tracemalloc.Statistic]] = {}
+
+    @property
+    def stats(self) -> List[PhaseStats]:
+        return list(self._stats.values())
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        tracemalloc.start()
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample, name="ltt-memory-sampler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        tracemalloc.stop()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self._sampling_interval):
+            self._update_rss()
+
+    def _update_rss(self) -> None:
+        current_rss = rss()
+        with self._lock:
+            # Every open phase contains the currently active one.
+            for open_phase in self._open_phases:
+                open_phase.update_rss(current_rss)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # Phases can only be nested properly on a single thread. Allocations of other
+        # threads are still attributed to the phases that are open at that time.
+        if threading.get_ident() != self._thread_id:
+            yield
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        stats = self._stats.setdefault(name, PhaseStats(name))
+        open_phase = _OpenPhase(stats, start=current)
+        with self._lock:
+            if self._open_phases:
+                parent = self._open_phases[-1]
+                parent.peak = max(parent.peak, peak)
+            self._open_phases.append(open_phase)
+        # tracemalloc only tracks a single peak. Thus, we reset it for every phase and
+        # propagate the peak of the nested phase to its parent when it is closed.
+        tracemalloc.reset_peak()
+        self._update_rss()
+
+        try:
+            yield
+        finally:
+            self._update_rss()
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                self._open_phases.pop()
+                open_phase.peak = max(open_phase.peak, peak)
+                if self._open_phases:
+                    parent = self._open_phases[-1]
+                    parent.peak = max(parent.peak, open_phase.peak)
+                depth = len(self._open_phases)
+
+            stats.calls += 1
+            stats.allocated += current - open_phase.start
+            stats.peak = max(stats.peak, open_phase.peak)
+            if open_phase.peak_rss is not None:
+                stats.peak_rss = max(stats.peak_rss or 0, open_phase.peak_rss)
+
+            # Snapshots are expensive. Thus, we only take them for the top-level
+            # phases, i.e. the ones that are not nested into anything but the root.
+            if depth <= 1 and self.top_allocations:
+                self.allocation_sites[name] = self._allocation_sites()
+
+    def _allocation_sites(self) -> List[tracemalloc.Statistic]:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ]
+        )
+        return snapshot.statistics("lineno")[: self.top_allocations]
+
+    def summary(self) -> str:
+        header = ["Phase", "Calls", "Allocated", "Peak traced", "Peak RSS"]
+        rows = [
+            [
+                stats.name,
+                str(stats.calls),
+                _format_size(stats.allocated),
+                _format_size(stats.peak),
+                _format_size(stats.peak_rss),
+            ]
+            for stats in self._stats.values()
+        ]
+        widths = [max(map(len, column)) for column in zip(header, *rows)]
+
+        def format_row(row: List[str]) -> str:
+            name, *values = row
+            return "  ".join(
+                [
+                    name.ljust(widths[0]),
+                    *(value.rjust(width) for value, width in zip(values, widths[1:])),
+                ]
+            )
+
+        return "\n".join(
+            [
+                format_row(header),
+                "  ".join("-" * width for width in widths),
+                *map(format_row, rows),
+            ]
+        )
+
+    def allocation_sites_report(self) -> str:
+        lines = []
+        for name, statistics in self.allocation_sites.items():
+            lines.append(
+                f"Top {len(statistics)} allocation sites retained at the end of {name}:"
+            )
+            for statistic in statistics:
+                frame = statistic.traceback[0]
+                lines.append(
+                    f"  {_format_size(statistic.size):>10}  "
+                    f"{frame.filename}:{frame.lineno}"
+                )
+        return "\n".join(lines)
+
+
+_PROFILER: Optional[MemoryProfiler] = None
+
+
+@contextlib.contextmanager
+def profiling(*, top_allocations: int = 0) -> Iterator[MemoryProfiler]:
+    global _PROFILER
+
+    if tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is already tracing memory allocations")
+
+    profiler = MemoryProfiler(top_allocations=top_allocations)
+    profiler.start()
+    _PROFILER = profiler
+    try:
+        with profiler.phase("total"):
+            yield profiler
+    finally:
+        _PROFILER = None
+        profiler.stop()
+
+        report = profiler.summary()
+        if profiler.top_allocations:
+            report = f"{report}\n\n{profiler.allocation_sites_report()}"
+        # pip's logging is not configured yet if the command failed early, e.g. while
+        # parsing the options.
+        if logging.getLogger().handlers:
+            logger.info("Memory profile:\n%s", report)
+        else:
+            print(f"Memory profile:\n{report}", file=sys.stderr)
+
+
+def phase(name: str) -> contextlib.AbstractContextManager:
+    if _PROFILER is None:
+        return contextlib.nullcontext()
+
+    return _PROFILER.phase(name)
@@ -0,0 +1,73 @@
+import dataclasses
+import logging
+
+from pip._internal.network.session import CacheControlAdapter, HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PYTORCH_HOST_URL = "https://download.pytorch.org/"
+
+
+@dataclasses.dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def reused(self) -> int:
+        return self.requests - self.connections
+
+
+class _ConnectionStatsMixin:
+    def connection_stats(self) -> ConnectionStats:
+        stats = ConnectionStats()
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            stats.requests += pool.num_requests
+            stats.connections += pool.num_connections
+        return stats
+
+    def close(self) -> None:
+        # The pools are cleared when the adapter is closed, so we need to log the
+        # statistics before that.
+        stats = self.connection_stats()
+        if stats.requests:
+            logger.debug(
+                "Sent %d request(s) to %s over %d connection(s), %d of them reused",
+                stats.requests,
+                PYTORCH_HOST_URL,
+                stats.connections,
+                stats.reused,
+            )
+        super().close()
+
+
+class PyTorchHTTPAdapter(_ConnectionStatsMixin, HTTPAdapter):
+    pass
+
+
+class PyTorchCacheControlAdapter(_ConnectionStatsMixin, CacheControlAdapter):
+    pass
+
+
+def make_pytorch_adapter(secure_adapter, *, pool_size):
+    # The dedicated adapter needs to behave exactly like the one pip mounted for
+    # https://, i.e. use the same cache, retries, and SSL context. We only change
+    # how many connections are kept alive.
+    kwargs = dict(
+        max_retries=secure_adapter.max_retries,
+        pool_connections=1,
+        pool_maxsize=pool_size,
+    )
+    ssl_context = getattr(secure_adapter, "_ssl_context", None)
+    if ssl_context is not None:
+        kwargs["ssl_context"] = ssl_context
+
+    if isinstance(secure_adapter, CacheControlAdapter):
+        return PyTorchCacheControlAdapter(cache=secure_adapter.cache, **kwargs)
+    else:
+        return PyTorchHTTPAdapter(**kwargs)
@@ -1,26 +1,67 @@
 import contextlib
+import contextvars
 import dataclasses
+import datetime
 import enum
 import functools
 import itertools
+import logging
 import optparse
 import os
 import re
 import sys
 import unittest.mock
-from typing import List, Set
+from typing import List, Optional, Set
 from unittest import mock
 
 import pip._internal.cli.cmdoptions
+from pip._internal.commands import CommandInfo
+from pip._internal.exceptions import (
+    InstallationError,
+    InvalidWheelFilename,
+    NetworkConnectionError,
+)
+from pip._internal.index import package_finder
 from pip._internal.index.collector import CollectedSources
-from pip._internal.index.package_finder import CandidateEvaluator
 from pip._internal.index.sources import build_source
+from pip._internal.models.candidate import InstallationCandidate
+from pip._internal.models.link import Link
 from pip._internal.models.search_scope import SearchScope
+from pip._internal.models.wheel import Wheel
+from pip._internal.utils.misc import ensure_dir
+from pip._internal.utils.unpacking import (
+    set_extracted_file_to_default_mode_plus_executable,
+    zip_item_is_executable,
+)
+from pip._vendor.packaging.specifiers import SpecifierSet
+from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.packaging.version import InvalidVersion
+from pip._vendor.resolvelib import ResolutionImpossible
 
 import light_the_torch as ltt
 
-from . import _cb as cb
-from ._utils import apply_fn_patch
+from . import (
+    _bytecode as bytecode,
+    _cb as cb,
+    _collection as collection,
+    _compatibility as compatibility,
+    _delta as delta,
+    _extraction as extraction,
+    _hints as hints,
+    _http_cache as http_cache,
+    _link_index as link_index,
+    _links as links,
+    _locking as locking,
+    _memo as memo,
+    _memory as memory,
+    _network as network,
+    _shared_libraries as shared_libraries,
+    _slim as slim,
+    _trace as trace,
+)
+from ._utils import apply_fn_patch, apply_fn_wrapper, apply_shared_patch, cache_subdir
+
+logger = logging.getLogger(__name__)
 
 
 class Channel(enum.Enum):
@@ -83,6 +124,19 @@ THIRD_PARTY_PACKAGES = {
     "urllib3",
 }
 
+COMMANDS = {
+    "shared-libraries": CommandInfo(
+        "light_the_torch._commands",
+        "SharedLibrariesCommand",
+        "Inspect and manage the store of deduplicated shared libraries.",
+    ),
+    "switch-backend": CommandInfo(
+        "light_the_torch._commands",
+        "SwitchBackendCommand",
+        "Switch the installed PyTorch distributions to another computation backend.",
+    ),
+}
+
 
 def patch(pip_main):
     @functools.wraps(pip_main)
@@ -115,6 +169,23 @@ class LttOptions:
         default_factory=lambda: {cb.CPUBackend()}
     )
     channel: Channel = Channel.STABLE
+    consistent_computation_backend: bool = False
+    prefer_cached_wheels: bool = False
+    allow_source_builds: bool = False
+    pool_size: int = 10
+    link_collection_concurrency: Optional[int] = None
+    link_index: bool = False
+    resolution_memo: bool = False
+    cache_locking: bool = False
+    nightly_window: Optional[datetime.timedelta] = None
+    nightly_latest: Optional[int] = None
+    nightly_delta_downloads: bool = False
+    trace_file: Optional[str] = None
+    extraction_workers: int = 1
+    low_copy_extraction: bool = False
+    deduplicate_shared_libraries: bool = False
+    slim_install_patterns: Optional[List[str]] = None
+    bytecode_compilation: Optional[str] = None
 
     @staticmethod
     def computation_backend_parser_options():
@@ -139,6 +210,40 @@ class LttOptions:
                     "it takes precedence over '--cpuonly'."
                 ),
             ),
+            optparse.Option(
+                "--pytorch-consistent-computation-backend",
+                action="store_true",
+                help=(
+                    "Resolve all PyTorch distributions against a single computation "
+                    "backend. If multiple computation backends are available, the "
+                    "resolution is first attempted with the preferred one and only "
+                    "falls back to the next one if it fails. "
+                    "Without this option, the candidates of all computation backends "
+                    "are considered at the same time."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-prefer-cached-wheels",
+                action="store_true",
+                help=(
+                    "Prefer binaries of PyTorch distributions that are already in the "
+                    "pip cache over equally ranked ones, e.g. multiple nightly builds "
+                    "of the same version. The newest version compiled against the "
+                    "newest computation backend is still always preferred."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-allow-source-builds",
+                action="store_true",
+                help=(
+                    "Allow pip to fall back to source distributions of PyTorch "
+                    "distributions if no binary matches the computation backend or "
+                    "the interpreter. "
+                    "Without this option, the installation fails right away with a "
+                    "report of the available binaries instead of starting a lengthy "
+                    "source build."
+                ),
+            ),
         ]
 
     @staticmethod
@@ -153,11 +258,230 @@ class LttOptions:
             ),
         )
 
+    @staticmethod
+    def network_parser_options():
+        return [
+            optparse.Option(
+                "--pytorch-pool-size",
+                type="int",
+                help=(
+                    "Maximum number of connections to the PyTorch package indices "
+                    "that are kept alive and reused across index pages and wheel "
+                    "downloads. Defaults to 10."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-link-collection-concurrency",
+                type="int",
+                help=(
+                    "Fetch the index pages of all known dependencies concurrently "
+                    "with at most N requests per host at the same time, instead of "
+                    "one page after the other when the resolver asks for it. "
+                    "This includes all PyTorch indices of the computation backends "
+                    "as well as the PyPI fallback of PyTorch distributions. "
+                    "Disabled by default."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-cache-locking",
+                action="store_true",
+                help=(
+                    "Coordinate concurrent ltt processes that share a pip cache "
+                    "directory with file locks. Only one of them fetches an index "
+                    "page or downloads a wheel at a time, while the others wait and "
+                    "afterwards use the cached response."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-link-index",
+                action="store_true",
+                help=(
+                    "Compile the index pages of the PyTorch indices into a binary "
+                    "index in the pip cache directory. If a page didn't change since "
+                    "the last run, only the links that match the project and the "
+                    "platform are looked up from the index instead of parsing the "
+                    "whole page."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-resolution-memo",
+                action="store_true",
+                help=(
+                    "Store the result of every resolution in the pip cache directory "
+                    "together with the validators of all index pages that were "
+                    "consulted. If the same requirements are resolved again and none "
+                    "of the pages changed, which is checked with a HEAD request per "
+                    "page, the previous result is reused without fetching and "
+                    "parsing the pages."
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def nightly_parser_options():
+        return [
+            optparse.Option(
+                "--pytorch-nightly-window",
+                help=(
+                    "Only consider nightly binaries of PyTorch distributions that were "
+                    "built within the given time window, e.g. '7d' or '2w'. "
+                    "Only has an effect for '--pytorch-channel=nightly'."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-nightly-latest",
+                type="int",
+                help=(
+                    "Only consider the binaries of the latest N nightly builds of "
+                    "PyTorch distributions. "
+                    "Only has an effect for '--pytorch-channel=nightly'."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-nightly-delta-downloads",
+                action="store_true",
+                help=(
+                    "Keep the last downloaded nightly wheel of every PyTorch "
+                    "distribution in the pip cache directory. When a newer nightly is "
+                    "installed, only its members that changed are downloaded with "
+                    "range requests and the others are copied from the previous one. "
+                    "The assembled wheel is verified against the hash from the index "
+                    "and downloaded in full if it doesn't match. "
+                    "Only has an effect for '--pytorch-channel=nightly'."
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def extraction_parser_options():
+        return [
+            optparse.Option(
+                "--pytorch-extraction-workers",
+                type="int",
+                help=(
+                    "Number of threads that unpack the members of a wheel "
+                    "concurrently. Large wheels like the ones of torch or the "
+                    "nvidia-* libraries install considerably faster on multi-core "
+                    "machines with more than one worker. Defaults to 1, i.e. a serial "
+                    "extraction."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-low-copy-extraction",
+                action="store_true",
+                help=(
+                    "Unpack large wheel members from a memory-mapped archive. Stored "
+                    "members are copied by the kernel and deflated members are "
+                    "decompressed in large chunks, which reduces the CPU time and "
+                    "peak memory for multi-GB wheels."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-deduplicate-shared-libraries",
+                action="store_true",
+                help=(
+                    "Store the shared libraries of the nvidia-* distributions only "
+                    "once in a store that is shared by all environments and hard link "
+                    "them into the environment. The store is located in the pip cache "
+                    f"directory unless {shared_libraries.STORE_DIR_ENV_VAR} is set. "
+                    "Use 'ltt shared-libraries gc' to remove the shared libraries that "
+                    "are not used by any environment anymore."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-slim-install",
+                action="store_true",
+                help=(
+                    "Skip the files of PyTorch distributions that are only needed to "
+                    "build C++ extensions or to run the C++ tests, i.e. headers, CMake "
+                    "files, static libraries, and test binaries. The skipped files are "
+                    "not listed in the RECORD of the installed distribution, so "
+                    "uninstalling it still works."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-slim-exclude",
+                help=(
+                    "Comma-separated list of glob patterns of the files inside the "
+                    "wheels of PyTorch distributions that are skipped, e.g. "
+                    "'torch/include/*,torch/lib/*.a'. The patterns are matched "
+                    "against the paths inside the wheel. Defaults to "
+                    f"'{','.join(slim.DEFAULT_EXCLUDE_PATTERNS)}'. "
+                    "Only has an effect for '--pytorch-slim-install'."
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def bytecode_compilation_parser_options():
+        return [
+            optparse.Option(
+                "--pytorch-bytecode-compilation",
+                type="choice",
+                choices=["parallel", "deferred"],
+                help=(
+                    "How to compile the Python files of PyTorch distributions to "
+                    "bytecode. 'parallel' compiles them with a process pool sized to "
+                    "the machine. 'deferred' skips the compilation during the "
+                    "installation and compiles them in a detached background process "
+                    "instead. Modules that are imported before that finishes are "
+                    "compiled on first import. "
+                    "If not specified, the files are compiled serially. "
+                    "Has no effect if '--no-compile' is passed."
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def diagnostics_parser_options():
+        return [
+            optparse.Option(
+                "--pytorch-trace-file",
+                help=(
+                    "Record timing spans of the resolution, link collection, candidate "
+                    "selection, and index page fetches and write them to the given "
+                    "file in the trace event format. The file can be inspected with "
+                    "https://ui.perfetto.dev/ or chrome://tracing."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-memory-profile",
+                action="store_true",
+                help=(
+                    "Trace the memory allocations and sample the resident set size "
+                    "during the detection, link collection, candidate selection, "
+                    "resolution, and installation and print a summary of the peak "
+                    "memory of every phase at the end. "
+                    "This slows down the run considerably."
+                ),
+            ),
+            optparse.Option(
+                "--pytorch-memory-top-allocations",
+                type="int",
+                help=(
+                    "Additionally report the N allocation sites that hold the most "
+                    "memory at the end of every top-level phase. "
+                    "Only has an effect for '--pytorch-memory-profile'."
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def install_parser_options():
+        return [
+            *LttOptions.computation_backend_parser_options(),
+            *LttOptions.network_parser_options(),
+            *LttOptions.nightly_parser_options(),
+            *LttOptions.extraction_parser_options(),
+            *LttOptions.bytecode_compilation_parser_options(),
+            *LttOptions.diagnostics_parser_options(),
+        ]
+
     @staticmethod
     def _parse(argv):
         parser = PassThroughOptionParser()
 
-        for option in LttOptions.computation_backend_parser_options():
+        for option in LttOptions.install_parser_options():
             parser.add_option(option)
         parser.add_option(LttOptions.channel_parser_option())
         parser.add_option("--pre", dest="pre", action="store_true")
@@ -165,27 +489,54 @@ class LttOptions:
         opts, _ = parser.parse_args(argv)
         return opts
 
-    @classmethod
-    def from_pip_argv(cls, argv: List[str]):
-        if not argv or argv[0] != "install":
-            return cls()
-
-        opts = cls._parse(argv)
-
+    @staticmethod
+    def computation_backends_from_opts(opts) -> Set[cb.ComputationBackend]:
         if opts.pytorch_computation_backend is not None:
-            cbs = {
+            return {
                 cb.ComputationBackend.from_str(string.strip())
                 for string in opts.pytorch_computation_backend.split(",")
             }
         elif opts.cpuonly:
-            cbs = {cb.CPUBackend()}
+            return {cb.CPUBackend()}
         elif "LTT_PYTORCH_COMPUTATION_BACKEND" in os.environ:
-            cbs = {
+            return {
                 cb.ComputationBackend.from_str(string.strip())
                 for string in os.environ["LTT_PYTORCH_COMPUTATION_BACKEND"].split(",")
             }
         else:
-            cbs = cb.detect_compatible_computation_backends()
+            return cb.detect_compatible_computation_backends()
+
+    @classmethod
+    def memory_profile_from_pip_argv(cls, argv: List[str]) -> Optional[int]:
+        # The memory profiling needs to start before the options are processed, since
+        # this includes the detection of the computation backends. Thus, it is parsed
+        # separately. Returns None if it is disabled and the number of allocation sites
+        # to report otherwise.
+        if not argv or argv[0] != "install":
+            return None
+
+        opts = cls._parse(argv)
+        if not opts.pytorch_memory_profile:
+            return None
+
+        if opts.pytorch_memory_top_allocations is None:
+            return 0
+        elif opts.pytorch_memory_top_allocations < 1:
+            raise ValueError(
+                f"The number of allocation sites has to be positive, "
+                f"but got {opts.pytorch_memory_top_allocations}"
+            )
+        return opts.pytorch_memory_top_allocations
+
+    @classmethod
+    def from_pip_argv(cls, argv: List[str]):
+        if not argv or argv[0] != "install":
+            return cls()
+
+        opts = cls._parse(argv)
+
+        with memory.phase("detection"):
+            cbs = cls.computation_backends_from_opts(opts)
 
         if opts.pytorch_channel is not None:
             channel = Channel.from_str(opts.pytorch_channel)
@@ -194,29 +545,188 @@ class LttOptions:
         else:
             channel = Channel.STABLE
 
-        return cls(cbs, channel)
+        options = cls(
+            cbs,
+            channel,
+            consistent_computation_backend=opts.pytorch_consistent_computation_backend,
+            prefer_cached_wheels=opts.pytorch_prefer_cached_wheels,
+            allow_source_builds=opts.pytorch_allow_source_builds,
+        )
+        if opts.pytorch_pool_size is not None:
+            if opts.pytorch_pool_size < 1:
+                raise ValueError(
+                    f"The pool size has to be positive, "
+                    f"but got {opts.pytorch_pool_size}"
+                )
+            options.pool_size = opts.pytorch_pool_size
+        if opts.pytorch_link_collection_concurrency is not None:
+            if opts.pytorch_link_collection_concurrency < 1:
+                raise ValueError(
+                    f"The link collection concurrency has to be positive, "
+                    f"but got {opts.pytorch_link_collection_concurrency}"
+                )
+            options.link_collection_concurrency = (
+                opts.pytorch_link_collection_concurrency
+            )
+
+        if opts.pytorch_nightly_window is not None:
+            options.nightly_window = links.parse_nightly_window(
+                opts.pytorch_nightly_window
+            )
+        if opts.pytorch_nightly_latest is not None:
+            if opts.pytorch_nightly_latest < 1:
+                raise ValueError(
+                    f"The number of nightly builds has to be positive, "
+                    f"but got {opts.pytorch_nightly_latest}"
+                )
+            options.nightly_latest = opts.pytorch_nightly_latest
+        options.nightly_delta_downloads = opts.pytorch_nightly_delta_downloads
+
+        if opts.pytorch_extraction_workers is not None:
+            if opts.pytorch_extraction_workers < 1:
+                raise ValueError(
+                    f"The number of extraction workers has to be positive, "
+                    f"but got {opts.pytorch_extraction_workers}"
+                )
+            options.extraction_workers = opts.pytorch_extraction_workers
+
+        options.link_index = opts.pytorch_link_index
+        options.resolution_memo = opts.pytorch_resolution_memo
+        options.cache_locking = opts.pytorch_cache_locking
+        options.low_copy_extraction = opts.pytorch_low_copy_extraction
+        options.deduplicate_shared_libraries = opts.pytorch_deduplicate_shared_libraries
+        if opts.pytorch_slim_install:
+            options.slim_install_patterns = (
+                slim.parse_patterns(opts.pytorch_slim_exclude)
+                if opts.pytorch_slim_exclude is not None
+                else slim.DEFAULT_EXCLUDE_PATTERNS
+            )
+        options.bytecode_compilation = opts.pytorch_bytecode_compilation
+        options.trace_file = opts.pytorch_trace_file
+
+        return options
 
 
 @contextlib.contextmanager
 def apply_patches(argv):
-    options = LttOptions.from_pip_argv(argv)
+    with contextlib.ExitStack() as stack:
+        memory_top_allocations = LttOptions.memory_profile_from_pip_argv(argv)
+        if memory_top_allocations is not None:
+            stack.enter_context(
+                memory.profiling(top_allocations=memory_top_allocations)
+            )
 
-    patches = [
-        patch_cli_version(),
-        patch_cli_options(),
-        patch_link_collection_with_supply_chain_attack_mitigation(
-            options.computation_backends, options.channel
-        ),
-        patch_candidate_selection(options.computation_backends),
-    ]
+        options = LttOptions.from_pip_argv(argv)
+        patches = _patches(options)
+        if memory_top_allocations is not None:
+            # This needs to be applied last, so the phases wrap all other patches.
+            patches.append(patch_memory_profiling())
 
-    with contextlib.ExitStack() as stack:
         for patch in patches:
             stack.enter_context(patch)
 
         yield stack
 
 
+def _patches(options):
+    patches = [
+        patch_cli_version(),
+        patch_cli_commands(),
+        patch_cli_options(),
+        patch_pytorch_session(options.pool_size),
+    ]
+    if options.cache_locking:
+        # This needs to be applied before the link collection is patched, since the
+        # latter might fetch the index pages from multiple threads.
+        patches.append(patch_cache_locking())
+    if options.consistent_computation_backend:
+        # This needs to be applied before the link collection is patched, since the
+        # latter needs to wrap the former.
+        patches.append(
+            patch_backend_consistent_resolution(options.computation_backends)
+        )
+    else:
+        patches.append(patch_candidate_selection(options.computation_backends))
+    if options.prefer_cached_wheels:
+        # This needs to be applied after the candidate selection, since it breaks the
+        # ties of its sort key.
+        patches.append(patch_cache_aware_candidate_selection())
+    if not options.allow_source_builds:
+        patches.append(patch_binary_only(options.computation_backends))
+    make_version_filter = None
+    if options.channel == Channel.NIGHTLY and (
+        options.nightly_window is not None or options.nightly_latest is not None
+    ):
+        make_version_filter = make_nightly_version_filter(
+            options.nightly_window, options.nightly_latest
+        )
+    if options.link_index:
+        # The link index needs to apply the version filter itself, since both replace
+        # the parsing of the index pages.
+        patches.append(patch_link_index(make_version_filter))
+    elif make_version_filter is not None:
+        patches.append(
+            patch_nightly_link_pruning(options.nightly_window, options.nightly_latest)
+        )
+    patches.extend(
+        [
+            patch_link_collection_with_supply_chain_attack_mitigation(
+                options.computation_backends,
+                options.channel,
+                concurrency=options.link_collection_concurrency,
+            ),
+            patch_user_requirement_pruning(),
+        ]
+    )
+    if options.resolution_memo:
+        # This needs to be applied after all other patches of the resolution, since it
+        # replaces the whole link collection if the result can be reused.
+        patches.append(
+            patch_resolution_memo(
+                options.computation_backends,
+                options.channel,
+                resolution_options=dict(
+                    consistent_computation_backend=(
+                        options.consistent_computation_backend
+                    ),
+                    prefer_cached_wheels=options.prefer_cached_wheels,
+                    allow_source_builds=options.allow_source_builds,
+                    nightly_window=options.nightly_window,
+                    # The nightly window is relative to the current day.
+                    nightly_window_end=(
+                        datetime.date.today()
+                        if options.nightly_window is not None
+                        else None
+                    ),
+                    nightly_latest=options.nightly_latest,
+                ),
+            )
+        )
+    if options.channel == Channel.NIGHTLY and options.nightly_delta_downloads:
+        patches.append(patch_nightly_delta_downloads())
+    if options.low_copy_extraction:
+        # This needs to be applied before the parallel extraction, since the latter
+        # dispatches to the former.
+        patches.append(patch_low_copy_extraction())
+    if options.deduplicate_shared_libraries:
+        # This needs to be applied before the parallel extraction, since the latter
+        # dispatches to the former.
+        patches.append(patch_shared_library_deduplication())
+    if options.slim_install_patterns is not None:
+        patches.append(patch_slim_install(options.slim_install_patterns))
+    if options.extraction_workers > 1:
+        patches.append(patch_parallel_extraction(options.extraction_workers))
+    if options.bytecode_compilation is not None:
+        # This needs to be applied after the parallel extraction, so all files are
+        # written before they are compiled.
+        patches.append(patch_bytecode_compilation(options.bytecode_compilation))
+    if options.trace_file is not None:
+        # This needs to be applied last, so the spans wrap all other patches.
+        patches.append(patch_tracing(options.trace_file))
+
+    return patches
+
+
 @contextlib.contextmanager
 def patch_cli_version():
     with apply_fn_patch(
@@ -230,13 +740,33 @@ def patch_cli_version():
         yield
 
 
+@contextlib.contextmanager
+def patch_cli_commands():
+    # The commands are the same for every invocation. Thus, they are shared by all
+    # invocations that run concurrently.
+    with apply_shared_patch(
+        "commands",
+        lambda: unittest.mock.patch.dict(
+            "pip._internal.commands.commands_dict", COMMANDS
+        ),
+    ):
+        yield
+
+
 @contextlib.contextmanager
 def patch_cli_options():
     def postprocessing(input, output):
-        for option in LttOptions.computation_backend_parser_options():
+        for option in LttOptions.install_parser_options():
             input.cmd_opts.add_option(option)
 
-    index_group = pip._internal.cli.cmdoptions.index_group
+    @contextlib.contextmanager
+    def patch_index_group():
+        index_group = pip._internal.cli.cmdoptions.index_group
+        with unittest.mock.patch.dict(index_group):
+            options = index_group["options"].copy()
+            options.append(LttOptions.channel_parser_option)
+            index_group["options"] = options
+            yield
 
     with apply_fn_patch(
         "pip",
@@ -246,13 +776,40 @@ def patch_cli_options():
         "add_target_python_options",
         postprocessing=postprocessing,
     ):
-        with unittest.mock.patch.dict(index_group):
-            options = index_group["options"].copy()
-            options.append(LttOptions.channel_parser_option)
-            index_group["options"] = options
+        # The options are the same for every invocation. Thus, they are shared by all
+        # invocations that run concurrently.
+        with apply_shared_patch("index group", patch_index_group):
             yield
 
 
+@contextlib.contextmanager
+def patch_pytorch_session(pool_size):
+    def postprocessing(input, output):
+        session = input.self
+        # If the user marked the PyTorch host as trusted, pip already mounted a
+        # dedicated adapter for it that we don't want to override.
+        if network.PYTORCH_HOST_URL in session.adapters:
+            return
+
+        session.mount(
+            network.PYTORCH_HOST_URL,
+            network.make_pytorch_adapter(
+                session.adapters["https://"], pool_size=pool_size
+            ),
+        )
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "network",
+        "session",
+        "PipSession",
+        "__init__",
+        postprocessing=postprocessing,
+    ):
+        yield
+
+
 def get_index_urls(computation_backends, channel):
     if channel == Channel.STABLE:
         channel_paths = [""]
@@ -266,26 +823,45 @@ def get_index_urls(computation_backends, channel):
     ]
 
 
-@contextlib.contextmanager
-def patch_link_collection_with_supply_chain_attack_mitigation(
-    computations_backends, channel
-):
+def get_user_supplied_pinned_packages(root_reqs):
     def is_pinned(requirement):
         if requirement.req is None:
             return False
 
         return requirement.is_pinned
 
+    return {
+        requirement.name
+        for requirement in root_reqs
+        if requirement.user_supplied and is_pinned(requirement)
+    }
+
+
+def is_routed(project_name, user_supplied_pinned_packages):
+    # Third-party packages that the user pinned explicitly are still collected from
+    # the regular indices.
+    return project_name in PYTORCH_DISTRIBUTIONS or (
+        project_name in THIRD_PARTY_PACKAGES
+        and project_name not in user_supplied_pinned_packages
+    )
+
+
+@contextlib.contextmanager
+def patch_link_collection_with_supply_chain_attack_mitigation(
+    computations_backends, channel, *, concurrency=None
+):
     @contextlib.contextmanager
     def context(input):
         with patch_link_collection(
             computations_backends,
             channel,
-            {
-                requirement.name
+            get_user_supplied_pinned_packages(input.root_reqs),
+            root_project_names={
+                canonicalize_name(requirement.name)
                 for requirement in input.root_reqs
-                if requirement.user_supplied and is_pinned(requirement)
+                if requirement.req is not None and requirement.link is None
             },
+            concurrency=concurrency,
         ):
             yield
 
@@ -303,22 +879,34 @@ def patch_link_collection_with_supply_chain_attack_mitigation(
 
 
 @contextlib.contextmanager
-def patch_link_collection(computation_backends, channel, user_supplied_pinned_packages):
+def patch_link_collection(
+    computation_backends,
+    channel,
+    user_supplied_pinned_packages,
+    *,
+    root_project_names=(),
+    concurrency=None,
+):
     search_scope = SearchScope(
         find_links=[],
         index_urls=get_index_urls(computation_backends, channel),
         no_index=False,
     )
+    pypi_search_scope = SearchScope(
+        find_links=[],
+        index_urls=["https://pypi.org/simple"],
+        no_index=False,
+    )
+
+    def is_routed_project(project_name):
+        return is_routed(project_name, user_supplied_pinned_packages)
+
+    def has_pypi_fallback(project_name):
+        return project_name in PYTORCH_DISTRIBUTIONS and channel == Channel.STABLE
 
     @contextlib.contextmanager
     def context(input):
-        if not (
-            input.project_name in PYTORCH_DISTRIBUTIONS
-            or (
-                input.project_name in THIRD_PARTY_PACKAGES
-                and input.project_name not in user_supplied_pinned_packages
-            )
-        ):
+        if not is_routed_project(input.project_name):
             yield
             return
 
@@ -326,32 +914,28 @@ def patch_link_collection(computation_backends, channel, user_supplied_pinned_pa
             yield
 
     def postprocessing(input, output):
-        if input.project_name not in PYTORCH_DISTRIBUTIONS:
-            return output
-
-        if channel != Channel.STABLE:
+        if not has_pypi_fallback(input.project_name):
             return output
 
         # Some stable binaries are not hosted on the PyTorch indices. We check if this
         # is the case for the current distribution.
-        for remote_file_source in output.index_urls:
-            candidates = list(remote_file_source.page_candidates())
+        with memory.phase(f"candidate caching: {input.project_name}"):
+            for remote_file_source in output.index_urls:
+                candidates = list(remote_file_source.page_candidates())
 
-            # Cache the candidates, so `pip` doesn't has to retrieve them again later.
-            remote_file_source.page_candidates = lambda: iter(candidates)
+                # Cache the candidates, so `pip` doesn't has to retrieve them again
+                # later.
+                remote_file_source.page_candidates = lambda: iter(candidates)
 
-            # If there are any candidates on the PyTorch indices, we continue normally.
-            if candidates:
-                return output
+                # If there are any candidates on the PyTorch indices, we continue
+                # normally.
+                if candidates:
+                    return output
 
         # In case the distribution is not present on the PyTorch indices, we fall back
         # to PyPI.
         _, pypi_file_source = build_source(
-            SearchScope(
-                find_links=[],
-                index_urls=["https://pypi.org/simple"],
-                no_index=False,
-            ).get_index_urls_locations(input.project_name)[0],
+            pypi_search_scope.get_index_urls_locations(input.project_name)[0],
             candidates_from_page=input.candidates_from_page,
             page_validator=input.self.session.is_secure_origin,
             expand_dir=False,
@@ -370,37 +954,1117 @@ def patch_link_collection(computation_backends, channel, user_supplied_pinned_pa
         context=context,
         postprocessing=postprocessing,
     ):
-        yield
+        if concurrency is None:
+            yield
+            return
+
+        with patch_concurrent_link_collection(
+            # The pages of the likely dependencies of the root requirements are
+            # prefetched right away, so the resolver finds them already fetched when
+            # it gets to them.
+            hints.likely_dependency_closure(root_project_names, computation_backends),
+            concurrency=concurrency,
+            search_scope=lambda link_collector, project_name: (
+                search_scope
+                if is_routed_project(project_name)
+                else link_collector.search_scope
+            ),
+            fallback_search_scope=lambda project_name: (
+                pypi_search_scope if has_pypi_fallback(project_name) else None
+            ),
+        ):
+            yield
 
 
 @contextlib.contextmanager
-def patch_candidate_selection(computation_backends):
-    computation_backend_link_pattern = re.compile(
-        r"/(?P<computation_backend>(cpu|cu\d+|rocm([\d.]+)))/"
-    )
+def patch_concurrent_link_collection(
+    project_names, *, concurrency, search_scope, fallback_search_scope
+):
+    # search_scope is called with the link collector and the project name and returns
+    # the search scope the project is collected from. fallback_search_scope is called
+    # with the project name and returns the search scope of a fallback index that
+    # might be used if the project is not found, or None.
+    vanilla_get_index_content = None
+    link_collector = None
+    page_collector = None
+
+    def locations(names):
+        for project_name in names:
+            yield from search_scope(
+                link_collector, project_name
+            ).get_index_urls_locations(project_name)
+            fallback = fallback_search_scope(project_name)
+            if fallback is not None:
+                yield from fallback.get_index_urls_locations(project_name)
+
+    def collect_sources_preprocessing(input):
+        nonlocal link_collector, page_collector
+
+        if page_collector is None:
+            link_collector = input.self
+            page_collector = collection.PageCollector(
+                functools.partial(
+                    vanilla_get_index_content, session=link_collector.session
+                ),
+                max_per_host=concurrency,
+            )
+            # The projects that are known upfront, e.g. the root requirements, are
+            # prefetched right away, since the resolver asks for them one after the
+            # other.
+            page_collector.prefetch(
+                Link(location) for location in locations(project_names)
+            )
 
-    def extract_local_specifier(candidate):
-        local = candidate.version.local
+        page_collector.prefetch(
+            Link(location) for location in locations([input.project_name])
+        )
 
-        # Make sure that local actually is a computation backend identifier
-        if local is not None:
-            try:
-                cb.ComputationBackend.from_str(local)
-            except ValueError:
-                local = None
+    def get_dependencies_postprocessing(input, output):
+        if page_collector is None:
+            return output
 
-        if local is None:
-            match = computation_backend_link_pattern.search(candidate.link.comes_from)
-            local = match["computation_backend"] if match else "any"
+        # The pages of all dependencies of a candidate are fetched at once, rather than
+        # when the resolver gets to them.
+        page_collector.prefetch(
+            Link(location)
+            for location in locations(
+                {
+                    requirement.project_name
+                    for requirement in output
+                    if requirement.get_candidate_lookup()[1] is not None
+                }
+            )
+        )
+        return output
 
-        # Early PyTorch distributions used the "any" local specifier to indicate a
-        # pure Python binary. This was changed to no local specifier later.
+    def get_index_content_wrapper(fn):
+        nonlocal vanilla_get_index_content
+        vanilla_get_index_content = fn
+
+        def get_index_content(link, *, session):
+            if page_collector is None or session is not link_collector.session:
+                return vanilla_get_index_content(link, session=session)
+
+            return page_collector.get(link)
+
+        return get_index_content
+
+    try:
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "index",
+            "collector",
+            "LinkCollector",
+            "collect_sources",
+            preprocessing=collect_sources_preprocessing,
+        ):
+            with apply_fn_patch(
+                "pip",
+                "_internal",
+                "resolution",
+                "resolvelib",
+                "provider",
+                "PipProvider",
+                "get_dependencies",
+                postprocessing=get_dependencies_postprocessing,
+            ):
+                with apply_fn_wrapper(
+                    "pip",
+                    "_internal",
+                    "index",
+                    "collector",
+                    "_get_index_content",
+                    wrapper=get_index_content_wrapper,
+                ):
+                    yield
+    finally:
+        if page_collector is not None:
+            page_collector.close()
+
+
+@contextlib.contextmanager
+def patch_link_parsing(make_version_filter, *, open_link_index=None):
+    # make_version_filter is called with the project name and the index page. It
+    # returns None if the page should be parsed as is, or a callable that decides
+    # based on the version string of a wheel whether its link should be kept.
+    # open_link_index is called with the index page and a function that parses it
+    # without any filters. It returns None if the page should be parsed, or a link
+    # index of the page.
+    @contextlib.contextmanager
+    def context(input):
+        project_name = input.link_evaluator.project_name
+
+        def parse_links_wrapper(vanilla_parse_links):
+            def parse_links(page):
+                index = (
+                    open_link_index(page, _parse_links_unfiltered)
+                    if open_link_index is not None
+                    else None
+                )
+                if index is not None:
+                    # The index replaces the parsing of the page. Thus, it needs to
+                    # apply the filters of all other active patches as well.
+                    keep_version = _combine_version_filters(
+                        make(project_name, page) for make in _VERSION_FILTERS.get()
+                    )
+                    # The links of other projects or for other platforms are never
+                    # turned into Link objects, since pip would discard them anyway.
+                    return index.links(
+                        project_name,
+                        page_url=page.url,
+                        supported_tags={
+                            (tag.interpreter, tag.abi, tag.platform)
+                            for tag in input.link_evaluator._target_python.get_tags()
+                        },
+                        keep_version=keep_version,
+                    )
+
+                keep_version = make_version_filter(project_name, page)
+                if keep_version is None:
+                    return vanilla_parse_links(page)
+
+                # pip caches the parsed links per page. Since the filtered links
+                # depend on the filter, we can't use or populate the cache here.
+                page.cache_link_parsing = False
+
+                with patch_link_filtering(keep_version):
+                    return vanilla_parse_links(page)
+
+            return parse_links
+
+        token = _VERSION_FILTERS.set((*_VERSION_FILTERS.get(), make_version_filter))
+        try:
+            with apply_fn_wrapper(
+                "pip",
+                "_internal",
+                "index",
+                "package_finder",
+                "parse_links",
+                wrapper=parse_links_wrapper,
+            ):
+                yield
+        finally:
+            _VERSION_FILTERS.reset(token)
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "index",
+        "package_finder",
+        "PackageFinder",
+        "process_project_url",
+        context=context,
+    ):
+        yield
+
+
+# The version filters of all link parsing patches that are active for the current
+# project.
+_VERSION_FILTERS: contextvars.ContextVar[tuple] = contextvars.ContextVar(
+    "ltt_version_filters", default=()
+)
+
+
+def _combine_version_filters(keep_versions):
+    keep_versions = [keep for keep in keep_versions if keep is not None]
+    if not keep_versions:
+        return None
+
+    return lambda version: all(keep(version) for keep in keep_versions)
+
+
+def _parse_links_unfiltered(page):
+    # The patches are stored per context. Thus, running in an empty one parses the
+    # page without any of the filters, e.g. to compile the link index that is stored
+    # for the whole page.
+    return contextvars.Context().run(package_finder.parse_links, page)
+
+
+@contextlib.contextmanager
+def patch_link_filtering(keep_version):
+    def keep(url):
+        if url is None:
+            return True
+
+        version = links.wheel_version(url)
+        return version is None or keep_version(version)
+
+    # Links are filtered based on the raw URL, i.e. before the Link or any Version
+    # object is created.
+    def from_element_wrapper(vanilla_from_element):
+        def from_element(anchor_attribs, page_url, base_url):
+            if not keep(anchor_attribs.get("href")):
+                return None
+
+            return vanilla_from_element(anchor_attribs, page_url, base_url)
+
+        return from_element
+
+    def from_json_wrapper(vanilla_from_json):
+        def from_json(file_data, page_url):
+            if not keep(file_data.get("url")):
+                return None
+
+            return vanilla_from_json(file_data, page_url)
+
+        return from_json
+
+    with apply_fn_wrapper(
+        "pip",
+        "_internal",
+        "models",
+        "link",
+        "Link",
+        "from_element",
+        wrapper=from_element_wrapper,
+    ):
+        with apply_fn_wrapper(
+            "pip",
+            "_internal",
+            "models",
+            "link",
+            "Link",
+            "from_json",
+            wrapper=from_json_wrapper,
+        ):
+            yield
+
+
+def make_nightly_version_filter(window, latest):
+    def make_version_filter(project_name, page):
+        if not page.url.startswith(links.NIGHTLY_INDEX_URL):
+            return None
+
+        return links.make_nightly_filter(page.content, window=window, latest=latest)
+
+    return make_version_filter
+
+
+@contextlib.contextmanager
+def patch_nightly_link_pruning(window, latest):
+    with patch_link_parsing(make_nightly_version_filter(window, latest)):
+        yield
+
+
+@contextlib.contextmanager
+def patch_link_index(make_version_filter=None):
+    store = None
+
+    def run_preprocessing(input):
+        nonlocal store
+
+        root = link_index.store_dir(input.options.cache_dir)
+        if root is not None:
+            store = link_index.LinkIndexStore(root)
+
+    def open_link_index(page, parse_links):
+        # We only index the pages of the PyTorch indices, since they are the ones
+        # that are both large and rarely change.
+        if store is None or not page.url.startswith(network.PYTORCH_HOST_URL):
+            return None
+
+        return store.open(page.url, page.content, lambda: parse_links(page))
+
+    try:
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "commands",
+            "install",
+            "InstallCommand",
+            "run",
+            preprocessing=run_preprocessing,
+        ):
+            with patch_link_parsing(
+                make_version_filter or (lambda project_name, page: None),
+                open_link_index=open_link_index,
+            ):
+                yield
+    finally:
+        if store is not None:
+            store.close()
+
+
+def get_user_specifiers(root_reqs):
+    user_specifiers = {}
+    for requirement in root_reqs:
+        # Same as pip, we ignore requirements with markers that don't match the
+        # environment. Otherwise, mutually exclusive pins would be intersected.
+        if (
+            not requirement.user_supplied
+            or requirement.req is None
+            or not requirement.match_markers()
+        ):
+            continue
+
+        name = canonicalize_name(requirement.name)
+        specifier = requirement.req.specifier
+        if name in user_specifiers:
+            specifier &= user_specifiers[name]
+        user_specifiers[name] = specifier
+    return user_specifiers
+
+
+@contextlib.contextmanager
+def patch_user_requirement_pruning():
+    @contextlib.contextmanager
+    def context(input):
+        user_specifiers = get_user_specifiers(input.root_reqs)
+
+        with contextlib.ExitStack() as stack:
+            torch_constraints = compatibility.torch_version_constraints(user_specifiers)
+            if torch_constraints:
+                stack.enter_context(
+                    patch_incompatible_candidate_removal(torch_constraints)
+                )
+
+            pytorch_specifiers = {
+                name: specifier
+                for name, specifier in user_specifiers.items()
+                if name in PYTORCH_DISTRIBUTIONS and specifier
+            }
+            if pytorch_specifiers:
+                stack.enter_context(patch_specifier_link_pruning(pytorch_specifiers))
+
+            yield
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "resolution",
+        "resolvelib",
+        "resolver",
+        "Resolver",
+        "resolve",
+        context=context,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_specifier_link_pruning(user_specifiers):
+    def make_version_filter(project_name, page):
+        specifier = user_specifiers.get(canonicalize_name(project_name))
+        if specifier is None:
+            return None
+
+        # The same version is usually hosted for multiple Python versions and
+        # platforms. Thus, we only need to check each version string once.
+        @functools.lru_cache(maxsize=None)
+        def keep(version):
+            try:
+                return specifier.contains(version, prereleases=True)
+            except InvalidVersion:
+                return True
+
+        return keep
+
+    with patch_link_parsing(make_version_filter):
+        yield
+
+
+@contextlib.contextmanager
+def patch_incompatible_candidate_removal(torch_constraints):
+    def preprocessing(input):
+        if not input.candidates:
+            return
+
+        # At this stage all candidates have the same name.
+        name = input.candidates[0].name
+        if name not in PYTORCH_DISTRIBUTIONS:
+            return
+
+        input.candidates = [
+            candidate
+            for candidate in input.candidates
+            if compatibility.is_compatible(name, candidate.version, torch_constraints)
+        ]
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "index",
+        "package_finder",
+        "CandidateEvaluator",
+        "get_applicable_candidates",
+        preprocessing=preprocessing,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_resolution_memo(computation_backends, channel, *, resolution_options=None):
+    # resolution_options are all other options that change the result of the
+    # resolution. They are only used as part of the key.
+    store = None
+
+    def run_preprocessing(input):
+        nonlocal store
+
+        root = memo.memo_dir(input.options.cache_dir)
+        if root is not None:
+            store = memo.ResolutionMemo(root)
+
+    def resolution_key(resolver, root_reqs, check_supported_wheels):
+        factory = resolver.factory
+        finder = factory._finder
+        return memo.resolution_key(
+            ltt_version=ltt.__version__,
+            requirements=sorted(
+                repr(
+                    (
+                        str(req.req),
+                        req.link.url if req.link else None,
+                        req.constraint,
+                        req.user_supplied,
+                    )
+                )
+                for req in root_reqs
+            ),
+            computation_backends=sorted(
+                backend.local_specifier for backend in computation_backends
+            ),
+            channel=channel.name,
+            resolution_options=resolution_options or {},
+            tags=[str(tag) for tag in finder.target_python.get_tags()],
+            index_urls=finder.index_urls,
+            find_links=finder.find_links,
+            allow_all_prereleases=finder.allow_all_prereleases,
+            prefer_binary=finder.prefer_binary,
+            no_binary=sorted(finder.format_control.no_binary),
+            only_binary=sorted(finder.format_control.only_binary),
+            upgrade_strategy=resolver.upgrade_strategy,
+            ignore_dependencies=resolver.ignore_dependencies,
+            force_reinstall=factory._force_reinstall,
+            ignore_requires_python=factory._ignore_requires_python,
+            check_supported_wheels=check_supported_wheels,
+            installed=sorted(
+                f"{name}=={dist.version}"
+                for name, dist in factory._installed_dists.items()
+            ),
+        )
+
+    def head(session, url):
+        return session.head(
+            url, headers={"Accept": memo.INDEX_ACCEPT_HEADER}, allow_redirects=True
+        )
+
+    @contextlib.contextmanager
+    def replay(resolution):
+        def find_all_candidates_wrapper(vanilla_find_all_candidates):
+            def find_all_candidates(self, project_name):
+                pin = resolution.pins.get(canonicalize_name(project_name))
+                if pin is None:
+                    return vanilla_find_all_candidates(self, project_name)
+
+                return [InstallationCandidate(project_name, pin.version, pin.to_link())]
+
+            return find_all_candidates
+
+        with apply_fn_wrapper(
+            "pip",
+            "_internal",
+            "index",
+            "package_finder",
+            "PackageFinder",
+            "find_all_candidates",
+            wrapper=find_all_candidates_wrapper,
+        ):
+            yield
+
+    @contextlib.contextmanager
+    def record(validators, project_names):
+        def find_all_candidates_preprocessing(input):
+            project_names.add(canonicalize_name(input.project_name))
+
+        @contextlib.contextmanager
+        def get_simple_response_context(input):
+            try:
+                yield
+            except NetworkConnectionError as error:
+                validators[input.url] = (
+                    memo.validators_from_response(error.response)
+                    if error.response is not None
+                    else None
+                )
+                raise
+            except Exception:
+                # Pages that could not be fetched for other reasons cannot be
+                # revalidated later.
+                validators[input.url] = None
+                raise
+
+        def get_simple_response_postprocessing(input, output):
+            validators[input.url] = memo.validators_from_response(output)
+            return output
+
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "index",
+            "package_finder",
+            "PackageFinder",
+            "find_all_candidates",
+            preprocessing=find_all_candidates_preprocessing,
+        ):
+            with apply_fn_patch(
+                "pip",
+                "_internal",
+                "index",
+                "collector",
+                "_get_simple_response",
+                context=get_simple_response_context,
+                postprocessing=get_simple_response_postprocessing,
+            ):
+                yield
+
+    def pins(finder, result, project_names):
+        pins = {}
+        for candidate in result.mapping.values():
+            project_name = canonicalize_name(candidate.project_name)
+            # Candidates that were not looked up on an index, e.g. direct URL
+            # requirements, are resolved without network access anyway.
+            if project_name not in project_names or project_name in pins:
+                continue
+
+            best_candidate = finder.find_best_candidate(
+                project_name, SpecifierSet(f"=={candidate.version}")
+            ).best_candidate
+            if best_candidate is None or not isinstance(
+                best_candidate.link.comes_from, str
+            ):
+                continue
+
+            pins[project_name] = memo.Pin.from_link(
+                str(best_candidate.version), best_candidate.link
+            )
+        return pins
+
+    @contextlib.contextmanager
+    def context(input):
+        if store is None:
+            yield
+            return
+
+        resolver = input.self
+        finder = resolver.factory._finder
+        key = resolution_key(resolver, input.root_reqs, input.check_supported_wheels)
+
+        resolution = store.load(key)
+        if resolution is not None and memo.revalidate(
+            resolution.validators,
+            functools.partial(head, finder._link_collector.session),
+        ):
+            logger.info(
+                "The index pages did not change since an identical resolution. "
+                "Reusing its result."
+            )
+            with replay(resolution):
+                yield
+            return
+
+        validators = {}
+        project_names = set()
+        with record(validators, project_names):
+            yield
+
+        # Without validators for every page, we can't tell later if the result is
+        # still up-to-date.
+        if None in validators.values():
+            return
+
+        store.save(
+            key,
+            memo.Resolution(
+                pins=pins(finder, resolver._result, project_names),
+                validators=validators,
+            ),
+        )
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "commands",
+        "install",
+        "InstallCommand",
+        "run",
+        preprocessing=run_preprocessing,
+    ):
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "resolution",
+            "resolvelib",
+            "resolver",
+            "Resolver",
+            "resolve",
+            context=context,
+        ):
+            yield
+
+
+@contextlib.contextmanager
+def patch_cache_locking():
+    store = None
+
+    def run_preprocessing(input):
+        nonlocal store
+
+        root = locking.locks_dir(input.options.cache_dir)
+        if root is not None:
+            store = locking.LockStore(root)
+
+    @contextlib.contextmanager
+    def context(input):
+        # Without the HTTP cache, the waiting processes would download everything
+        # again anyway.
+        if store is None:
+            yield
+            return
+
+        # The response is completely read and thus stored in the HTTP cache before the
+        # lock is released. The waiting processes only need to revalidate it.
+        with store.lock(input.link.url_without_fragment):
+            yield
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "commands",
+        "install",
+        "InstallCommand",
+        "run",
+        preprocessing=run_preprocessing,
+    ):
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "index",
+            "collector",
+            "_get_index_content",
+            context=context,
+        ):
+            with apply_fn_patch(
+                "pip",
+                "_internal",
+                "network",
+                "download",
+                "Downloader",
+                "__call__",
+                context=context,
+            ):
+                yield
+
+
+@contextlib.contextmanager
+def patch_nightly_delta_downloads():
+    store = None
+    cache = None
+
+    def run_preprocessing(input):
+        nonlocal store, cache
+
+        root = delta.store_dir(input.options.cache_dir)
+        if root is None:
+            logger.warning(
+                "Nightly wheels are downloaded in full, since the cache is disabled."
+            )
+            return
+
+        store = delta.NightlyWheelStore(root)
+        cache = http_cache.HTTPCache(input.options.cache_dir)
+
+    def download(session, link, location, base_path):
+        filepath = os.path.join(location, link.filename)
+        try:
+            stats, content_type = delta.fetch(
+                session,
+                link.url_without_fragment,
+                base_path,
+                filepath,
+                hash_name=link.hash_name,
+                digest=link.hash,
+            )
+        except Exception as error:
+            logger.debug(
+                "Unable to download %s as delta of %s: %s", link, base_path, error
+            )
+            return None
+
+        logger.info(
+            "Downloaded %.1f of %.1f MB of %s by reusing %d of %d members of the "
+            "previous nightly",
+            stats.downloaded / 1e6,
+            stats.size / 1e6,
+            link.filename,
+            stats.reused,
+            stats.members,
+        )
+        return filepath, content_type
+
+    def call_wrapper(vanilla_call):
+        def call(self, link, location):
+            if (
+                store is None
+                or not link.is_wheel
+                or not link.url.startswith(links.NIGHTLY_INDEX_URL)
+            ):
+                return vanilla_call(self, link, location)
+
+            result = None
+            base_path = store.base(link.filename)
+            # Without a hash, we can't verify that the assembled wheel is identical.
+            # If the wheel is in the HTTP cache, pip doesn't need to download it at
+            # all.
+            if (
+                base_path is not None
+                and link.hash is not None
+                and link.url not in cache
+            ):
+                result = download(self._session, link, location, base_path)
+            if result is None:
+                result = vanilla_call(self, link, location)
+
+            store.add(link.filename, result[0])
+            return result
+
+        return call
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "commands",
+        "install",
+        "InstallCommand",
+        "run",
+        preprocessing=run_preprocessing,
+    ):
+        with apply_fn_wrapper(
+            "pip",
+            "_internal",
+            "network",
+            "download",
+            "Downloader",
+            "__call__",
+            wrapper=call_wrapper,
+        ):
+            yield
+
+
+class _FinderView:
+    # Forwards everything to the finder, but is a different object for pip's cache of
+    # the best candidates.
+    def __init__(self, finder):
+        self._finder = finder
+
+    def __getattr__(self, name):
+        return getattr(self._finder, name)
+
+
+@contextlib.contextmanager
+def patch_backend_consistent_resolution(computation_backends):
+    # The candidate selection only checks the computation backends at call time. Thus,
+    # we can patch it once and swap the computation backend for every attempt.
+    attempted_computation_backends = set()
+    finder_views = {}
+
+    def find_best_candidate_preprocessing(input):
+        # The best candidates are cached by pip per finder for the whole process.
+        # Since they depend on the computation backend, every attempt gets its own
+        # view of the finder, which pip uses as part of the cache key. Clearing the
+        # cache of pip instead would also drop the entries of concurrent invocations.
+        input.self = finder_views.setdefault(input.self, _FinderView(input.self))
+
+    def resolve_wrapper(vanilla_resolve):
+        def resolve(self, root_reqs, check_supported_wheels):
+            error = None
+            for computation_backend in sorted(computation_backends, reverse=True):
+                finder_views.clear()
+                attempted_computation_backends.clear()
+                attempted_computation_backends.add(computation_backend)
+
+                with trace.span(
+                    "resolution attempt", computation_backend=str(computation_backend)
+                ):
+                    try:
+                        return vanilla_resolve(self, root_reqs, check_supported_wheels)
+                    except InstallationError as attempt_error:
+                        if not (
+                            isinstance(attempt_error, NoMatchingBinaryError)
+                            or isinstance(attempt_error.__cause__, ResolutionImpossible)
+                        ):
+                            raise
+
+                        trace.annotate(resolution_impossible=True)
+                        logger.info(
+                            "Unable to resolve the requirements with computation "
+                            "backend %s. Falling back to the next one.",
+                            computation_backend,
+                        )
+                        if error is None:
+                            error = attempt_error
+
+            # We re-raise the error of the preferred computation backend, since it is
+            # likely the most relevant one for the user.
+            raise error
+
+        return resolve
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "index",
+        "package_finder",
+        "PackageFinder",
+        "find_best_candidate",
+        preprocessing=find_best_candidate_preprocessing,
+    ):
+        with patch_candidate_selection(
+            attempted_computation_backends, allow_backend_agnostic=True
+        ):
+            with apply_fn_wrapper(
+                "pip",
+                "_internal",
+                "resolution",
+                "resolvelib",
+                "resolver",
+                "Resolver",
+                "resolve",
+                wrapper=resolve_wrapper,
+            ):
+                yield
+
+
+@contextlib.contextmanager
+def patch_cache_aware_candidate_selection():
+    cache = None
+
+    def run_preprocessing(input):
+        nonlocal cache
+
+        cache_dir = cache_subdir(input.options.cache_dir)
+        if cache_dir is not None:
+            cache = http_cache.HTTPCache(cache_dir)
+
+    def is_cached(candidate):
+        return not candidate.link.is_yanked and candidate.link.url in cache
+
+    def sort_key_wrapper(vanilla_sort_key):
+        def sort_key(candidate_evaluator, candidate):
+            key = vanilla_sort_key(candidate_evaluator, candidate)
+            if cache is None or candidate.name not in PYTORCH_DISTRIBUTIONS:
+                return key
+
+            # The cache only breaks ties between equally ranked candidates, e.g.
+            # multiple nightly builds of the same version. Thus, a newer binary is
+            # still preferred, even if an older one is already in the cache.
+            return key, is_cached(candidate)
+
+        return sort_key
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "commands",
+        "install",
+        "InstallCommand",
+        "run",
+        preprocessing=run_preprocessing,
+    ):
+        with apply_fn_wrapper(
+            "pip",
+            "_internal",
+            "index",
+            "package_finder",
+            "CandidateEvaluator",
+            "_sort_key",
+            wrapper=sort_key_wrapper,
+        ):
+            yield
+
+
+class NoMatchingBinaryError(InstallationError):
+    pass
+
+
+class _SourceBuildRequired(Exception):
+    def __init__(self, sdists, wheels):
+        super().__init__()
+        self.sdists = sdists
+        self.wheels = wheels
+
+
+def no_matching_binary_report(
+    finder, project_name, computation_backends, sdists, wheels, *, max_binaries=20
+):
+    canonical_name = canonicalize_name(project_name)
+
+    binaries = {}
+    # pip only keeps the reason why a link was skipped for the debug log.
+    for link, _, detail in finder._logged_links:
+        if not link.is_wheel:
+            continue
+
+        try:
+            name = Wheel(link.filename).name
+        except InvalidWheelFilename:
+            continue
+
+        if canonicalize_name(name) == canonical_name:
+            binaries[link.filename] = detail
+    for candidate in wheels:
+        binaries.setdefault(
+            candidate.link.filename,
+            "not applicable for the requested computation backends or versions",
+        )
+
+    lines = [
+        f"No binary of {project_name} matches this environment and building "
+        f"PyTorch distributions from source is disabled.",
+        f"Requested computation backends: "
+        f"{', '.join(str(backend) for backend in sorted(computation_backends))}",
+        f"Supported tags: "
+        f"{', '.join(str(tag) for tag in finder.target_python.get_tags()[:3])}, ...",
+        f"Source distributions that would have been built: "
+        f"{', '.join(str(candidate.version) for candidate in sdists)}",
+    ]
+    if binaries:
+        lines.append("Binaries on the indices:")
+        lines.extend(
+            f"  {filename}: {detail}"
+            for filename, detail in sorted(binaries.items())[:max_binaries]
+        )
+        if len(binaries) > max_binaries:
+            lines.append(f"  ... and {len(binaries) - max_binaries} more")
+    else:
+        lines.append("There are no binaries on the indices.")
+    lines.append("Pass --pytorch-allow-source-builds to build from source anyway.")
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def patch_binary_only(computation_backends):
+    @contextlib.contextmanager
+    def resolve_context(input):
+        format_control = input.self.factory._finder.format_control
+
+        def is_binary_only(project_name):
+            # Projects that the user restricted to source distributions, e.g. with
+            # --no-binary, are built from source as requested.
+            return (
+                project_name in PYTORCH_DISTRIBUTIONS
+                and "binary"
+                in format_control.get_allowed_formats(canonicalize_name(project_name))
+            )
+
+        with patch_source_distribution_exclusion(is_binary_only, computation_backends):
+            yield
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "resolution",
+        "resolvelib",
+        "resolver",
+        "Resolver",
+        "resolve",
+        context=resolve_context,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_source_distribution_exclusion(is_binary_only, computation_backends):
+    def get_applicable_candidates_wrapper(vanilla_get_applicable_candidates):
+        def get_applicable_candidates(candidate_evaluator, candidates):
+            # At this stage all candidates have the same name.
+            if not candidates or not is_binary_only(candidates[0].name):
+                return vanilla_get_applicable_candidates(
+                    candidate_evaluator, candidates
+                )
+
+            wheels = [candidate for candidate in candidates if candidate.link.is_wheel]
+            applicable = vanilla_get_applicable_candidates(candidate_evaluator, wheels)
+            if applicable or len(wheels) == len(candidates):
+                return applicable
+
+            # We only fail if pip would have built one of the source distributions.
+            sdists = vanilla_get_applicable_candidates(
+                candidate_evaluator,
+                [candidate for candidate in candidates if not candidate.link.is_wheel],
+            )
+            if sdists:
+                raise _SourceBuildRequired(sdists, wheels)
+
+            return applicable
+
+        return get_applicable_candidates
+
+    @contextlib.contextmanager
+    def find_best_candidate_context(input):
+        try:
+            yield
+        except _SourceBuildRequired as error:
+            raise NoMatchingBinaryError(
+                no_matching_binary_report(
+                    input.self,
+                    input.project_name,
+                    computation_backends,
+                    error.sdists,
+                    error.wheels,
+                )
+            ) from None
+
+    with apply_fn_wrapper(
+        "pip",
+        "_internal",
+        "index",
+        "package_finder",
+        "CandidateEvaluator",
+        "get_applicable_candidates",
+        wrapper=get_applicable_candidates_wrapper,
+    ):
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "index",
+            "package_finder",
+            "PackageFinder",
+            "find_best_candidate",
+            context=find_best_candidate_context,
+        ):
+            yield
+
+
+@contextlib.contextmanager
+def patch_candidate_selection(computation_backends, *, allow_backend_agnostic=False):
+    computation_backend_link_pattern = re.compile(
+        r"/(?P<computation_backend>(cpu|cu\d+|rocm([\d.]+)))/"
+    )
+
+    def extract_local_specifier(candidate, *, default="cpu"):
+        local = candidate.version.local
+
+        # Make sure that local actually is a computation backend identifier
+        if local is not None:
+            try:
+                cb.ComputationBackend.from_str(local)
+            except ValueError:
+                local = None
+
+        if local is None:
+            match = computation_backend_link_pattern.search(candidate.link.comes_from)
+            local = match["computation_backend"] if match else "any"
+
+        # Early PyTorch distributions used the "any" local specifier to indicate a
+        # pure Python binary. This was changed to no local specifier later.
         # Setting this to "cpu" is technically not correct as it will exclude this
         # binary if a non-CPU backend is requested. Still, this is probably the
         # right thing to do, since the user requested a specific backend and
         # although this binary will work with it, it was not compiled against it.
         if local == "any":
-            local = "cpu"
+            local = default
 
         return local
 
@@ -417,25 +2081,36 @@ def patch_candidate_selection(computation_backends):
             # return without changes.
             return
 
+        # If requested, candidates that don't carry any information about the
+        # computation backend, e.g. pure Python distributions that are only hosted on
+        # PyPI, are compatible with every computation backend.
+        default = None if allow_backend_agnostic else "cpu"
+        candidates = list(itertools.chain([candidate], candidates))
         input.candidates = [
             candidate
-            for candidate in itertools.chain([candidate], candidates)
-            if extract_local_specifier(candidate) in computation_backends
+            for candidate in candidates
+            if (local := extract_local_specifier(candidate, default=default)) is None
+            or local in computation_backends
         ]
+        trace.annotate(
+            candidates_before_backend_filtering=len(candidates),
+            candidates_after_backend_filtering=len(input.candidates),
+        )
 
-    vanilla_sort_key = CandidateEvaluator._sort_key
-
-    def patched_sort_key(candidate_evaluator, candidate):
-        # At this stage all candidates have the same name. Thus, we don't need to
-        # mirror the exact key structure that the vanilla sort keys have.
-        return (
-            vanilla_sort_key(candidate_evaluator, candidate)
-            if candidate.name not in PYTORCH_DISTRIBUTIONS
-            else (
-                cb.ComputationBackend.from_str(extract_local_specifier(candidate)),
-                candidate.version.base_version,
+    def sort_key_wrapper(vanilla_sort_key):
+        def sort_key(candidate_evaluator, candidate):
+            # At this stage all candidates have the same name. Thus, we don't need to
+            # mirror the exact key structure that the vanilla sort keys have.
+            return (
+                vanilla_sort_key(candidate_evaluator, candidate)
+                if candidate.name not in PYTORCH_DISTRIBUTIONS
+                else (
+                    cb.ComputationBackend.from_str(extract_local_specifier(candidate)),
+                    candidate.version.base_version,
+                )
             )
-        )
+
+        return sort_key
 
     with apply_fn_patch(
         "pip",
@@ -446,7 +2121,568 @@ def patch_candidate_selection(computation_backends):
         "get_applicable_candidates",
         preprocessing=preprocessing,
     ):
-        with unittest.mock.patch.object(
-            CandidateEvaluator, "_sort_key", new=patched_sort_key
+        with apply_fn_wrapper(
+            "pip",
+            "_internal",
+            "index",
+            "package_finder",
+            "CandidateEvaluator",
+            "_sort_key",
+            wrapper=sort_key_wrapper,
+        ):
+            yield
+
+
+@contextlib.contextmanager
+def patch_parallel_extraction(max_workers):
+    # pip installs the wheels one after another and rolls back a failed installation
+    # per requirement. Thus, we only parallelize the extraction of the members within
+    # a single wheel.
+    @contextlib.contextmanager
+    def context(input):
+        with contextlib.ExitStack() as stack:
+            extractor = stack.enter_context(extraction.ParallelExtractor(max_workers))
+
+            def save_wrapper(vanilla_save):
+                def save(file):
+                    # pip fixes the shebang of scripts right after they are saved.
+                    # Since there are only a few of them, we save them synchronously.
+                    if extraction.is_script_path(file.src_record_path):
+                        vanilla_save(file)
+                        return
+
+                    extractor.submit(
+                        functools.partial(vanilla_save, file), file.dest_path
+                    )
+
+                return save
+
+            def barrier(fn):
+                def wrapper(*args, **kwargs):
+                    extractor.wait()
+                    return fn(*args, **kwargs)
+
+                return wrapper
+
+            stack.enter_context(
+                apply_fn_wrapper(
+                    "pip",
+                    "_internal",
+                    "operations",
+                    "install",
+                    "wheel",
+                    "ZipBackedFile",
+                    "save",
+                    wrapper=save_wrapper,
+                )
+            )
+            # After all members are saved, pip compiles the installed Python files and
+            # generates the scripts. Both of these steps are guarded by a barrier, so
+            # all members are written before they are accessed.
+            for name in ["captured_stdout", "PipScriptMaker"]:
+                stack.enter_context(
+                    apply_fn_wrapper(
+                        "pip",
+                        "_internal",
+                        "operations",
+                        "install",
+                        "wheel",
+                        name,
+                        wrapper=barrier,
+                    )
+                )
+
+            yield
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "operations",
+        "install",
+        "wheel",
+        "_install_wheel",
+        context=context,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_low_copy_extraction():
+    def save_wrapper(vanilla_save):
+        def save(file):
+            zipinfo = file._getinfo()
+            if not extraction.supports_low_copy_extraction(zipinfo):
+                vanilla_save(file)
+                return
+
+            # This mirrors the vanilla implementation with the exception of how the
+            # contents of the member are copied.
+            ensure_dir(os.path.dirname(file.dest_path))
+            if os.path.exists(file.dest_path):
+                os.unlink(file.dest_path)
+
+            extraction.extract_member(file._zip_file.filename, zipinfo, file.dest_path)
+
+            if zip_item_is_executable(zipinfo):
+                set_extracted_file_to_default_mode_plus_executable(file.dest_path)
+
+        return save
+
+    with apply_fn_wrapper(
+        "pip",
+        "_internal",
+        "operations",
+        "install",
+        "wheel",
+        "ZipBackedFile",
+        "save",
+        wrapper=save_wrapper,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_shared_library_deduplication():
+    store = None
+    digests = {}
+
+    def run_preprocessing(input):
+        nonlocal store
+
+        root = shared_libraries.store_dir(input.options.cache_dir)
+        if root is None:
+            logger.warning(
+                "Shared libraries are not deduplicated, since the cache is disabled. "
+                "Set %s to use a different location for the store.",
+                shared_libraries.STORE_DIR_ENV_VAR,
+            )
+            return
+
+        store = shared_libraries.SharedLibraryStore(root)
+
+    @contextlib.contextmanager
+    def context(input):
+        # Besides the ones we route to the PyTorch indices, this also includes the
+        # nvidia-* distributions for newer CUDA versions that are hosted on PyPI.
+        if store is None or not canonicalize_name(input.name).startswith("nvidia-"):
+            yield
+            return
+
+        # The digests are looked up by archive, since the members might be saved from
+        # other threads.
+        digests[input.wheel_zip] = shared_libraries.read_record_digests(
+            input.wheel_zip, input.name
+        )
+        try:
+            yield
+        finally:
+            del digests[input.wheel_zip]
+
+    def save_wrapper(vanilla_save):
+        def save(file):
+            digest = (
+                digests.get(file._zip_file, {}).get(file.src_record_path)
+                if shared_libraries.is_shared_library(file.src_record_path)
+                else None
+            )
+            if digest is None:
+                vanilla_save(file)
+                return
+
+            ensure_dir(os.path.dirname(file.dest_path))
+            if os.path.exists(file.dest_path):
+                os.unlink(file.dest_path)
+
+            if store.link(digest, file.dest_path):
+                return
+
+            zipinfo = file._getinfo()
+            with file._zip_file.open(zipinfo) as src:
+                added = store.add(
+                    digest, src, executable=zip_item_is_executable(zipinfo)
+                )
+            if not (added and store.link(digest, file.dest_path)):
+                vanilla_save(file)
+
+        return save
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(
+            apply_fn_patch(
+                "pip",
+                "_internal",
+                "commands",
+                "install",
+                "InstallCommand",
+                "run",
+                preprocessing=run_preprocessing,
+            )
+        )
+        stack.enter_context(
+            apply_fn_patch(
+                "pip",
+                "_internal",
+                "operations",
+                "install",
+                "wheel",
+                "_install_wheel",
+                context=context,
+            )
+        )
+        stack.enter_context(
+            apply_fn_wrapper(
+                "pip",
+                "_internal",
+                "operations",
+                "install",
+                "wheel",
+                "ZipBackedFile",
+                "save",
+                wrapper=save_wrapper,
+            )
+        )
+        yield
+
+
+@contextlib.contextmanager
+def patch_slim_install(patterns):
+    @contextlib.contextmanager
+    def context(input):
+        if canonicalize_name(input.name) not in PYTORCH_DISTRIBUTIONS:
+            yield
+            return
+
+        wheel_zip = slim.SlimZipFile(input.wheel_zip, patterns)
+        if not wheel_zip.excluded:
+            yield
+            return
+
+        input.wheel_zip = wheel_zip
+        excluded = {info.filename for info in wheel_zip.excluded}
+
+        # pip copies the rows of the RECORD file inside the wheel for all files that
+        # it didn't install itself. Thus, we need to remove the excluded files, so
+        # the installed RECORD only lists files that actually exist.
+        def preprocessing(input):
+            input.old_csv_rows = [
+                row for row in input.old_csv_rows if row[0] not in excluded
+            ]
+
+        with apply_fn_patch(
+            "pip",
+            "_internal",
+            "operations",
+            "install",
+            "wheel",
+            "get_csv_rows_for_installed",
+            preprocessing=preprocessing,
+        ):
+            yield
+
+        logger.info(
+            "Skipped %d file(s) with %.1f MB of %s that match the slim install profile",
+            len(wheel_zip.excluded),
+            sum(info.file_size for info in wheel_zip.excluded) / 1e6,
+            input.name,
+        )
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "operations",
+        "install",
+        "wheel",
+        "_install_wheel",
+        context=context,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_bytecode_compilation(mode):
+    @contextlib.contextmanager
+    def context(input):
+        if not (
+            input.pycompile and canonicalize_name(input.name) in PYTORCH_DISTRIBUTIONS
+        ):
+            yield
+            return
+
+        with contextlib.ExitStack() as stack:
+            source_paths = []
+
+            def save_postprocessing(input, output):
+                if input.self.dest_path.endswith(".py"):
+                    source_paths.append(os.path.normpath(input.self.dest_path))
+                return output
+
+            stack.enter_context(
+                apply_fn_patch(
+                    "pip",
+                    "_internal",
+                    "operations",
+                    "install",
+                    "wheel",
+                    "ZipBackedFile",
+                    "save",
+                    postprocessing=save_postprocessing,
+                )
+            )
+
+            if mode == "parallel":
+                stack.enter_context(patch_parallel_compilation(source_paths))
+                yield
+            else:  # mode == "deferred"
+                input.pycompile = False
+                marker_paths = stack.enter_context(
+                    patch_deferred_compilation(source_paths)
+                )
+                yield
+                # The compilation is only spawned after the installation succeeded.
+                for marker_path in marker_paths:
+                    bytecode.spawn_deferred_compilation(marker_path)
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "operations",
+        "install",
+        "wheel",
+        "_install_wheel",
+        context=context,
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def patch_parallel_compilation(source_paths):
+    # pip compiles the installed files one by one right after they are saved and
+    # records the ones that succeeded. We compile all of them up front and let pip
+    # only pick up the results.
+    compiled = set()
+
+    def captured_stdout_preprocessing(input):
+        compiled.update(bytecode.compile_files(source_paths))
+
+    def compile_file_wrapper(vanilla_compile_file):
+        def compile_file(fullname, *args, **kwargs):
+            if os.path.normpath(fullname) in compiled:
+                return True
+
+            return vanilla_compile_file(fullname, *args, **kwargs)
+
+        return compile_file
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "operations",
+        "install",
+        "wheel",
+        "captured_stdout",
+        preprocessing=captured_stdout_preprocessing,
+    ):
+        with apply_fn_wrapper(
+            "pip",
+            "_internal",
+            "operations",
+            "install",
+            "wheel",
+            "compileall",
+            "compile_file",
+            wrapper=compile_file_wrapper,
         ):
             yield
+
+
+@contextlib.contextmanager
+def patch_deferred_compilation(source_paths):
+    # The marker needs to be part of the RECORD, so it is removed in case the
+    # distribution is uninstalled before the deferred compilation finished.
+    marker_paths = []
+
+    def get_csv_rows_for_installed(input):
+        if not source_paths:
+            return
+
+        info_dir = next(
+            os.path.dirname(src)
+            for src in input.installed
+            if re.fullmatch(r"[^/]+\.dist-info/METADATA", src)
+        )
+        marker_path = os.path.join(
+            input.lib_dir, info_dir, bytecode.DEFERRED_MARKER_FILE
+        )
+        bytecode.write_deferred_marker(marker_path, source_paths)
+        input.generated.append(marker_path)
+        marker_paths.append(marker_path)
+
+    with apply_fn_patch(
+        "pip",
+        "_internal",
+        "operations",
+        "install",
+        "wheel",
+        "get_csv_rows_for_installed",
+        preprocessing=get_csv_rows_for_installed,
+    ):
+        yield marker_paths
+
+
+@contextlib.contextmanager
+def apply_span_patch(*parts, name, input_args=None, output_args=None):
+    @contextlib.contextmanager
+    def context(input):
+        with trace.span(name, **(input_args(input) if input_args else {})) as span:
+            # The span is recorded when it is closed, but its arguments can still be
+            # updated until the trace is exported.
+            input.__span__ = span
+            yield
+
+    def postprocessing(input, output):
+        if output_args:
+            input.__span__.args.update(output_args(input, output))
+        return output
+
+    with apply_fn_patch(*parts, context=context, postprocessing=postprocessing):
+        yield
+
+
+@contextlib.contextmanager
+def patch_tracing(path):
+    def source_urls(sources):
+        return [
+            source.link.url
+            for source in sources
+            if source is not None and source.link is not None
+        ]
+
+    def collect_sources_output_args(input, output):
+        index_urls = source_urls(output.index_urls)
+        # At this point the search scope is already restored. Thus, we can detect if
+        # the link collection was rerouted by comparing it with the used index URLs.
+        vanilla_index_urls = input.self.search_scope.get_index_urls_locations(
+            input.project_name
+        )
+        return dict(
+            rerouted=index_urls != vanilla_index_urls,
+            index_urls=index_urls,
+        )
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(trace.tracing(path))
+        for patch in [
+            apply_span_patch(
+                "pip",
+                "_internal",
+                "resolution",
+                "resolvelib",
+                "resolver",
+                "Resolver",
+                "resolve",
+                name="Resolver.resolve",
+                input_args=lambda input: dict(
+                    root_reqs=[str(req) for req in input.root_reqs]
+                ),
+            ),
+            apply_span_patch(
+                "pip",
+                "_internal",
+                "index",
+                "collector",
+                "LinkCollector",
+                "collect_sources",
+                name="LinkCollector.collect_sources",
+                input_args=lambda input: dict(project_name=input.project_name),
+                output_args=collect_sources_output_args,
+            ),
+            apply_span_patch(
+                "pip",
+                "_internal",
+                "index",
+                "package_finder",
+                "CandidateEvaluator",
+                "get_applicable_candidates",
+                name="CandidateEvaluator.get_applicable_candidates",
+                input_args=lambda input: dict(candidates=len(input.candidates)),
+                output_args=lambda input, output: dict(applicable=len(output)),
+            ),
+            apply_span_patch(
+                "pip",
+                "_internal",
+                "index",
+                "collector",
+                "_get_index_content",
+                name="fetch index page",
+                input_args=lambda input: dict(url=input.link.url),
+                output_args=lambda input, output: dict(found=output is not None),
+            ),
+        ]:
+            stack.enter_context(patch)
+
+        yield
+
+
+@contextlib.contextmanager
+def apply_phase_patch(*parts, name):
+    # name is called with the input and returns the name of the phase.
+    @contextlib.contextmanager
+    def context(input):
+        with memory.phase(name(input)):
+            yield
+
+    with apply_fn_patch(*parts, context=context):
+        yield
+
+
+@contextlib.contextmanager
+def patch_memory_profiling():
+    def candidate_selection_name(input):
+        names = {candidate.name for candidate in input.candidates}
+        if len(names) != 1:
+            return "candidate selection"
+
+        return f"candidate selection: {names.pop()}"
+
+    with contextlib.ExitStack() as stack:
+        for patch in [
+            apply_phase_patch(
+                "pip",
+                "_internal",
+                "resolution",
+                "resolvelib",
+                "resolver",
+                "Resolver",
+                "resolve",
+                name=lambda input: "resolution",
+            ),
+            apply_phase_patch(
+                "pip",
+                "_internal",
+                "index",
+                "package_finder",
+                "PackageFinder",
+                "find_all_candidates",
+                name=lambda input: f"link collection: {input.project_name}",
+            ),
+            apply_phase_patch(
+                "pip",
+                "_internal",
+                "index",
+                "package_finder",
+                "CandidateEvaluator",
+                "get_applicable_candidates",
+                name=candidate_selection_name,
+            ),
+            apply_phase_patch(
+                "pip",
+                "_internal",
+                "commands",
+                "install",
+                "install_given_reqs",
+                name=lambda input: "installation",
+            ),
+        ]:
+            stack.enter_context(patch)
+
+        yield
@@ -0,0 +1,118 @@
+import base64
+import csv
+import errno
+import hashlib
+import io
+import os
+import re
+import tempfile
+from typing import BinaryIO, Dict, List, Optional
+from zipfile import ZipFile
+
+from pip._internal.utils.misc import ensure_dir
+from pip._internal.utils.wheel import parse_wheel
+
+from ._utils import cache_subdir
+
+STORE_DIR_ENV_VAR = "LTT_SHARED_LIBRARY_STORE"
+CHUNK_SIZE = 1024 * 1024
+
+_SHARED_LIBRARY_PATTERN = re.compile(r"\.so(\.\d+)*$")
+
+# Hard links are not possible across file systems or beyond the link limit of the
+# file system. In these cases the files are installed without deduplication.
+_UNSUPPORTED_LINK_ERRNOS = {errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOTSUP}
+
+
+def store_dir(cache_dir: Optional[str]) -> Optional[str]:
+    if STORE_DIR_ENV_VAR in os.environ:
+        return os.environ[STORE_DIR_ENV_VAR]
+
+    return cache_subdir(cache_dir, "ltt", "shared-libraries")
+
+
+def is_shared_library(record_path: str) -> bool:
+    return _SHARED_LIBRARY_PATTERN.search(record_path) is not None
+
+
+def read_record_digests(wheel_zip: ZipFile, name: str) -> Dict[str, str]:
+    info_dir, _ = parse_wheel(wheel_zip, name)
+    record = wheel_zip.read(f"{info_dir}/RECORD").decode()
+
+    digests = {}
+    for row in csv.reader(io.StringIO(record)):
+        if len(row) < 2:
+            continue
+
+        path, hash = row[:2]
+        algorithm, _, digest = hash.partition("=")
+        if algorithm == "sha256" and digest:
+            digests[path] = digest
+    return digests
+
+
+def _file_mode(executable: bool) -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return (0o777 if executable else 0o666) & ~umask
+
+
+class SharedLibraryStore:
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        # The digests are URL-safe base64 encoded as in the RECORD file and thus can
+        # be used as file names.
+        return os.path.join(self.root, "sha256", digest[:2], digest)
+
+    def link(self, digest: str, dest_path: str) -> bool:
+        try:
+            os.link(self.path(digest), dest_path)
+        except FileNotFoundError:
+            return False
+        except OSError as error:
+            if error.errno not in _UNSUPPORTED_LINK_ERRNOS:
+                raise
+            return False
+        return True
+
+    def add(self, digest: str, src: BinaryIO, *, executable: bool = False) -> bool:
+        path = self.path(digest)
+        ensure_dir(os.path.dirname(path))
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            hash = hashlib.sha256()
+            with os.fdopen(fd, "wb") as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    hash.update(chunk)
+                    dst.write(chunk)
+
+            # We never add a file to the store that doesn't match its digest, since
+            # it would be linked into every environment that requests this digest.
+            if base64.urlsafe_b64encode(hash.digest()).rstrip(b"=").decode() != (
+                digest
+            ):
+                return False
+
+            os.chmod(tmp_path, _file_mode(executable))
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                # Another installation added the same file concurrently.
+                pass
+            return True
+        finally:
+            os.remove(tmp_path)
+
+    def unreferenced(self) -> List[str]:
+        # Every environment that uses a file holds a hard link to it. Thus, a file
+        # with a single link is only referenced by the store itself.
+        paths = []
+        for root, _, files in os.walk(os.path.join(self.root, "sha256")):
+            for file in files:
+                path = os.path.join(root, file)
+                if not file.startswith(".tmp-") and os.stat(path).st_nlink == 1:
+                    paths.append(path)
+        return sorted(paths)
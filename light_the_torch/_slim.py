@@ -0,0 +1,55 @@
+import fnmatch
+from typing import Any, List, Sequence
+from zipfile import ZipFile, ZipInfo
+
+# Files of the PyTorch distributions that are only needed to build C++ extensions or
+# to run the C++ test suites, but not to use them from Python.
+DEFAULT_EXCLUDE_PATTERNS = [
+    "torch/include/*",
+    "torch/share/cmake/*",
+    "torch/lib/*.a",
+    "torch/lib/*.lib",
+    "torch/bin/test_*",
+    "torch/test/*",
+]
+
+
+def parse_patterns(string: str) -> List[str]:
+    patterns = [pattern.strip() for pattern in string.split(",") if pattern.strip()]
+    if not patterns:
+        raise ValueError(
+            f"Unable to parse {string} into a comma-separated list of patterns, "
+            f"e.g. 'torch/include/*,torch/lib/*.a'"
+        )
+    return patterns
+
+
+def is_excluded(record_path: str, patterns: Sequence[str]) -> bool:
+    # The metadata is needed by pip itself and thus is never excluded.
+    if record_path.split("/", 1)[0].endswith(".dist-info"):
+        return False
+
+    return any(fnmatch.fnmatchcase(record_path, pattern) for pattern in patterns)
+
+
+class SlimZipFile:
+    # Proxy for the archive of a wheel that hides the excluded members from pip. All
+    # other attributes are passed through, so members can still be read and opened.
+    def __init__(self, zip_file: ZipFile, patterns: Sequence[str]) -> None:
+        self._zip_file = zip_file
+        self.excluded: List[ZipInfo] = []
+        self._infos: List[ZipInfo] = []
+        for info in zip_file.infolist():
+            if is_excluded(info.filename, patterns):
+                self.excluded.append(info)
+            else:
+                self._infos.append(info)
+
+    def infolist(self) -> List[ZipInfo]:
+        return list(self._infos)
+
+    def namelist(self) -> List[str]:
+        return [info.filename for info in self._infos]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._zip_file, name)
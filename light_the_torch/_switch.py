@@ -0,0 +1,84 @@
+from typing import Iterable, List, Optional, Set
+
+from pip._internal.metadata import BaseDistribution
+from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.packaging.version import Version
+
+from . import _cb as cb
+from ._patch import Channel, PYTORCH_DISTRIBUTIONS
+
+
+def installed_computation_backend(version: Version) -> Optional[cb.ComputationBackend]:
+    if version.local is None:
+        return None
+
+    try:
+        return cb.ComputationBackend.from_str(version.local)
+    except ValueError:
+        return None
+
+
+def _replaced_distributions(
+    distributions: Iterable[BaseDistribution],
+    computation_backend: cb.ComputationBackend,
+) -> List[BaseDistribution]:
+    replaced = []
+    for distribution in distributions:
+        if distribution.canonical_name not in PYTORCH_DISTRIBUTIONS:
+            continue
+
+        # Distributions without a computation backend, e.g. pure Python ones, work
+        # with every computation backend and thus don't need to be replaced.
+        installed = installed_computation_backend(distribution.version)
+        if installed is None or installed == computation_backend:
+            continue
+
+        replaced.append(distribution)
+    return replaced
+
+
+def plan_backend_switch(
+    distributions: Iterable[BaseDistribution],
+    computation_backend: cb.ComputationBackend,
+) -> List[str]:
+    # Pinning the local specifier makes sure that only this distribution is replaced,
+    # while all of its dependencies are kept if they are still satisfied. The public
+    # version keeps the pre-release and dev segments of test and nightly builds.
+    return sorted(
+        f"{distribution.canonical_name}=="
+        f"{distribution.version.public}+{computation_backend}"
+        for distribution in _replaced_distributions(distributions, computation_backend)
+    )
+
+
+def installed_channel(
+    distributions: Iterable[BaseDistribution],
+    computation_backend: cb.ComputationBackend,
+) -> Channel:
+    # The replacements are only available from the channel the installed
+    # distributions came from.
+    versions = [
+        distribution.version
+        for distribution in _replaced_distributions(distributions, computation_backend)
+    ]
+    if any(version.is_devrelease for version in versions):
+        return Channel.NIGHTLY
+    elif any(version.is_prerelease for version in versions):
+        return Channel.TEST
+    else:
+        return Channel.STABLE
+
+
+def obsolete_distributions(
+    previous: Iterable[str], distributions: Iterable[BaseDistribution]
+) -> List[str]:
+    distributions = list(distributions)
+    installed = {distribution.canonical_name for distribution in distributions}
+    required: Set[str] = set()
+    for distribution in distributions:
+        required.update(
+            canonicalize_name(requirement.name)
+            for requirement in distribution.iter_dependencies()
+        )
+
+    return sorted(set(previous) & installed - required)
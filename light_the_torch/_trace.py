@@ -0,0 +1,115 @@
+import contextlib
+import contextvars
+import dataclasses
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    args: Dict[str, Any]
+    thread_id: int
+    start: int
+    end: Optional[int] = None
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self._spans: List[Span] = []
+        self._local = threading.local()
+
+    def _open_spans(self) -> List[Span]:
+        try:
+            return self._local.open_spans
+        except AttributeError:
+            open_spans = self._local.open_spans = []
+            return open_spans
+
+    @property
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Span]:
+        span = Span(
+            name, args, thread_id=threading.get_ident(), start=time.perf_counter_ns()
+        )
+        self._spans.append(span)
+        open_spans = self._open_spans()
+        open_spans.append(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.args["error"] = type(error).__name__
+            raise
+        finally:
+            span.end = time.perf_counter_ns()
+            open_spans.pop()
+
+    def annotate(self, **args: Any) -> None:
+        # Annotations are added to the innermost open span of the current thread.
+        open_spans = self._open_spans()
+        if open_spans:
+            open_spans[-1].args.update(args)
+
+    def to_trace_events(self) -> Dict[str, Any]:
+        # See https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+        # for the specification of the trace event format. It can be loaded by
+        # https://ui.perfetto.dev/ and chrome://tracing.
+        pid = os.getpid()
+        events = [
+            dict(
+                name=span.name,
+                cat="ltt",
+                ph="X",
+                pid=pid,
+                tid=span.thread_id,
+                ts=span.start / 1e3,
+                dur=((span.end or time.perf_counter_ns()) - span.start) / 1e3,
+                args=span.args,
+            )
+            for span in self._spans
+        ]
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def export(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_trace_events(), file, default=str)
+
+
+# The tracer is stored per context, so concurrent invocations record separate traces.
+_TRACER: contextvars.ContextVar[Optional[Tracer]] = contextvars.ContextVar(
+    "ltt_tracer", default=None
+)
+
+
+@contextlib.contextmanager
+def tracing(path: Optional[str] = None) -> Iterator[Tracer]:
+    tracer = Tracer()
+    token = _TRACER.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _TRACER.reset(token)
+        if path is not None:
+            tracer.export(path)
+
+
+def span(name: str, **args: Any) -> contextlib.AbstractContextManager:
+    tracer = _TRACER.get()
+    if tracer is None:
+        return contextlib.nullcontext()
+
+    return tracer.span(name, **args)
+
+
+def annotate(**args: Any) -> None:
+    tracer = _TRACER.get()
+    if tracer is None:
+        return
+
+    tracer.annotate(**args)
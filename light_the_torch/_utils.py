@@ -1,10 +1,13 @@
 import contextlib
+import contextvars
 import functools
 import importlib
 
 import importlib.metadata as importlib_metadata
 import inspect
-import itertools
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
 
 from unittest import mock
 
@@ -60,27 +63,105 @@ class Input(dict):
                 kwargs[param.name] = param.default
         return cls(fn, kwargs)
 
-    def to_call_args(self):
-        params = iter(inspect.signature(self.__fn__).parameters.values())
+    def to_call_args(self, args, kwargs):
+        # The arguments are returned in the same form as they were originally passed,
+        # since the next function might be the wrapper of another patch that uses
+        # different names for the positional parameters. Parameters that were not
+        # passed are only forwarded if they were changed from their default.
+        params = list(inspect.signature(self.__fn__).parameters.values())
+        named = [
+            param
+            for param in params
+            if param.kind
+            not in {inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD}
+        ]
+
+        call_args = tuple(self[param.name] for param in named[: len(args)])
+        call_args += tuple(args[len(named) :])
+
+        call_kwargs = dict()
+        for param in named[len(args) :]:
+            if param.name not in self:
+                continue
+
+            value = self[param.name]
+            if param.name in kwargs or value is not param.default:
+                call_kwargs[param.name] = value
+        names = {param.name for param in named}
+        for name, value in kwargs.items():
+            if name not in names:
+                call_kwargs[name] = self.get(name, value)
+
+        return call_args, call_kwargs
+
+
+# The patches are not applied to the patched objects directly, but stored per context.
+# The patched objects are replaced by a dispatcher once, which looks up the patches of
+# the current context at call time. Thus, multiple invocations with different patches
+# can run concurrently in different threads of the same process. Threads that should
+# see the patches of the thread that spawned them need to run in a copy of its
+# context, see contextvars.copy_context().
+_PATCHES: contextvars.ContextVar[Dict[str, Callable]] = contextvars.ContextVar(
+    "ltt_patches", default={}
+)
+_DISPATCHERS: Dict[str, List[Any]] = {}
+_SHARED_PATCHES: Dict[str, List[Any]] = {}
+_LOCK = threading.Lock()
 
-        args = []
-        for param in params:
-            if param.kind != inspect.Parameter.POSITIONAL_ONLY:
-                break
 
-            args.append(self[param.name])
-        else:
-            return (), dict()
-        args = tuple(args)
+@contextlib.contextmanager
+def _dispatcher(target):
+    with _LOCK:
+        entry = _DISPATCHERS.get(target)
+        if entry is None:
+            fn = import_obj(target)
+
+            # Objects like classes can be patched as well. Thus, we don't copy their
+            # attributes.
+            @functools.wraps(fn, updated=())
+            def dispatch(*args, **kwargs):
+                return _PATCHES.get().get(target, fn)(*args, **kwargs)
+
+            # pip caches the results of some methods that we patch.
+            for name in ["cache_info", "cache_clear"]:
+                if hasattr(fn, name):
+                    setattr(dispatch, name, getattr(fn, name))
+
+            patcher = mock.patch(target, new=dispatch)
+            patcher.start()
+            entry = _DISPATCHERS[target] = [fn, patcher, 0]
+        entry[2] += 1
+
+    try:
+        yield entry[0]
+    finally:
+        with _LOCK:
+            entry[2] -= 1
+            if not entry[2]:
+                entry[1].stop()
+                del _DISPATCHERS[target]
 
-        kwargs = dict()
-        sentinel = object()
-        for param in itertools.chain([param], params):
-            kwarg = self.get(param.name, sentinel)
-            if kwarg is not sentinel:
-                kwargs[param.name] = kwarg
 
-        return args, kwargs
+@contextlib.contextmanager
+def _apply_wrapper(target, wrapper):
+    with _dispatcher(target) as vanilla:
+        patches = _PATCHES.get()
+        token = _PATCHES.set(
+            {**patches, target: wrapper(patches.get(target, vanilla), vanilla)}
+        )
+        try:
+            yield
+        finally:
+            _PATCHES.reset(token)
+
+
+@contextlib.contextmanager
+def apply_fn_wrapper(*parts, wrapper):
+    # wrapper is called with the function that would be called without this patch
+    # and returns the function that is called instead. Patches that are applied later
+    # wrap the ones that are applied earlier.
+    with _apply_wrapper(".".join(parts), lambda fn, vanilla: wrapper(fn)):
+        yield
 
 
 @contextlib.contextmanager
@@ -90,21 +171,54 @@ def apply_fn_patch(
     context=contextlib.nullcontext,
     postprocessing=lambda input, output: output,
 ):
-    target = ".".join(parts)
-    fn = import_obj(target)
-
-    @functools.wraps(fn)
-    def new(*args, **kwargs):
-        input = Input.from_call_args(fn, *args, **kwargs)
+    def wrapper(fn, vanilla):
+        @functools.wraps(vanilla)
+        def new(*args, **kwargs):
+            # The arguments are always bound to the signature of the unpatched
+            # function, since the wrappers of other patches might not preserve it.
+            input = Input.from_call_args(vanilla, *args, **kwargs)
+
+            preprocessing(input)
+            with context(input):
+                args, kwargs = input.to_call_args(args, kwargs)
+                output = fn(*args, **kwargs)
+            return postprocessing(input, output)
+
+        return new
+
+    with _apply_wrapper(".".join(parts), wrapper):
+        yield
 
-        preprocessing(input)
-        with context(input):
-            args, kwargs = input.to_call_args()
-            output = fn(*args, **kwargs)
-        return postprocessing(input, output)
 
-    with mock.patch(target, new=new):
+@contextlib.contextmanager
+def apply_shared_patch(key, patch):
+    # Patches that are the same for every invocation, e.g. additional CLI commands, are
+    # applied by the first and reverted by the last of all concurrent invocations.
+    # patch is called without arguments and returns a context manager.
+    with _LOCK:
+        entry = _SHARED_PATCHES.get(key)
+        if entry is None:
+            stack = contextlib.ExitStack()
+            stack.enter_context(patch())
+            entry = _SHARED_PATCHES[key] = [stack, 0]
+        entry[1] += 1
+
+    try:
         yield
+    finally:
+        with _LOCK:
+            entry[1] -= 1
+            if not entry[1]:
+                entry[0].close()
+                del _SHARED_PATCHES[key]
+
+
+def cache_subdir(cache_dir: Optional[str], *parts: str) -> Optional[str]:
+    # pip sets the cache directory to False if the cache is disabled.
+    if not cache_dir:
+        return None
+
+    return os.path.join(cache_dir, *parts)
 
 
 def import_obj(target: str):
@@ -0,0 +1,268 @@
+import argparse
+import contextlib
+import json
+import pathlib
+import platform
+import random
+import sys
+import timeit
+from unittest import mock
+
+from light_the_torch import _cb as cb
+from light_the_torch._utils import apply_fn_patch, import_obj
+from pip._vendor.packaging.version import Version
+
+HERE = pathlib.Path(__file__).parent
+PROJECT_ROOT = HERE.parent
+
+DEFAULT_BASELINE = PROJECT_ROOT / ".benchmarks" / "baseline.json"
+DEFAULT_THRESHOLD = 0.1
+
+# All inputs are generated from a fixed seed to make the numbers comparable between
+# runs.
+SEED = 0
+NUM_LOCAL_SPECIFIERS = 100_000
+NUM_BACKENDS = 10_000
+NUM_CALLS = 10_000
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    # Each benchmark is a factory that performs all setup and returns the function to
+    # be timed. The factory may also return a context manager to be active while
+    # timing.
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def local_specifiers(num):
+    rng = random.Random(SEED)
+    strings = []
+    for _ in range(num):
+        kind = rng.choice(["cpu", "cuda", "rocm"])
+        if kind == "cpu":
+            strings.append("cpu")
+        elif kind == "cuda":
+            major, minor = rng.randint(9, 12), rng.randint(0, 8)
+            strings.append(
+                rng.choice(
+                    [f"cu{major}{minor}", f"cu{major}.{minor}", f"cuda{major}{minor}"]
+                )
+            )
+        else:
+            parts = [rng.randint(4, 6), rng.randint(0, 7)]
+            if rng.random() < 0.5:
+                parts.append(rng.randint(0, 3))
+            strings.append(f"rocm{'.'.join(str(part) for part in parts)}")
+    return strings
+
+
+@benchmark
+def computation_backend_from_str():
+    strings = local_specifiers(NUM_LOCAL_SPECIFIERS)
+
+    def run():
+        for string in strings:
+            cb.ComputationBackend.from_str(string)
+
+    return run, None
+
+
+@benchmark
+def computation_backend_ordering():
+    rng = random.Random(SEED)
+    backends = [
+        (
+            cb.CPUBackend()
+            if rng.random() < 0.1
+            else cb.CUDABackend(rng.randint(9, 12), rng.randint(0, 8))
+        )
+        for _ in range(NUM_BACKENDS)
+    ]
+
+    def run():
+        sorted(backends)
+
+    return run, None
+
+
+@benchmark
+def detect_compatible_cuda_backends():
+    rng = random.Random(SEED)
+    driver_versions = [
+        Version(f"{rng.randint(370, 560)}.{rng.randint(0, 99)}")
+        for _ in range(NUM_CALLS)
+    ]
+    driver_version = iter([])
+
+    def next_driver_version():
+        nonlocal driver_version
+        try:
+            return next(driver_version)
+        except StopIteration:
+            driver_version = iter(driver_versions)
+            return next(driver_version)
+
+    def run():
+        for _ in range(NUM_CALLS):
+            cb._detect_compatible_cuda_backends()
+
+    @contextlib.contextmanager
+    def context():
+        with mock.patch(
+            "light_the_torch._cb._detect_nvidia_driver_version",
+            new=next_driver_version,
+        ):
+            with mock.patch("light_the_torch._cb.platform.system", new=lambda: "Linux"):
+                with mock.patch(
+                    "light_the_torch._cb._detect_nvidia_compute_capabilities",
+                    new=lambda: frozenset({Version("8.6")}),
+                ):
+                    yield
+
+    return run, context
+
+
+def noop(a, b=None):
+    return a
+
+
+@benchmark
+def apply_fn_patch_call_overhead():
+    def run():
+        for i in range(NUM_CALLS):
+            noop(i, b=i)
+
+    def context():
+        return apply_fn_patch(
+            __name__,
+            "noop",
+            preprocessing=lambda input: None,
+            postprocessing=lambda input, output: output,
+        )
+
+    return run, context
+
+
+@benchmark
+def import_obj_nested_attribute():
+    target = "pip._internal.index.package_finder.CandidateEvaluator.get_applicable_candidates"
+
+    def run():
+        for _ in range(NUM_CALLS // 10):
+            import_obj(target)
+
+    return run, None
+
+
+def measure(factory, *, repeat):
+    run, context = factory()
+    with context() if context is not None else contextlib.nullcontext():
+        timer = timeit.Timer(run)
+        # The minimum is the most stable estimate, since all noise only ever makes a
+        # run slower.
+        return min(timer.repeat(repeat=repeat, number=1))
+
+
+def load_baseline(path):
+    if not path.exists():
+        return None
+
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def save_baseline(path, results):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(
+            dict(
+                python=sys.version,
+                platform=platform.platform(),
+                results=results,
+            ),
+            file,
+            indent=2,
+        )
+        file.write("\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Runs the microbenchmarks of ltt.")
+    parser.add_argument(
+        "--baseline",
+        type=pathlib.Path,
+        default=DEFAULT_BASELINE,
+        help="Path to the baseline file.",
+    )
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="Store the results as new baseline instead of comparing against it.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=(
+            "Relative slowdown compared to the baseline that is tolerated before a "
+            f"benchmark is considered a regression. Defaults to {DEFAULT_THRESHOLD}."
+        ),
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=7,
+        help="Number of times each benchmark is repeated.",
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help="Names of the benchmarks to run. Defaults to all.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    names = args.benchmarks or list(BENCHMARKS.keys())
+    unknown = set(names) - BENCHMARKS.keys()
+    if unknown:
+        raise SystemExit(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {name: measure(BENCHMARKS[name], repeat=args.repeat) for name in names}
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        baseline = None
+    else:
+        baseline = load_baseline(args.baseline)
+
+    regressions = []
+    width = max(len(name) for name in names)
+    for name, seconds in results.items():
+        line = f"{name:<{width}}  {seconds * 1e3:10.3f} ms"
+        if baseline is not None and name in baseline:
+            ratio = seconds / baseline[name]
+            line += f"  {ratio:6.2f}x baseline"
+            if ratio > 1 + args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        print(f"Stored baseline in {args.baseline}")
+    elif baseline is None:
+        print(f"No baseline found at {args.baseline}. Run with --save to create one.")
+
+    if regressions:
+        raise SystemExit(
+            f"{len(regressions)} benchmark(s) regressed by more than "
+            f"{args.threshold:.0%}: {', '.join(regressions)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+import argparse
+import contextlib
+import dataclasses
+import hashlib
+import http.server
+import io
+import json
+import pathlib
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import zipfile
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+from light_the_torch._cli import main as ltt_main
+from pip._vendor.requests.adapters import HTTPAdapter
+from pip._vendor.urllib3.response import HTTPResponse
+
+# The cassette is a ZIP archive with an index of all interactions and the response
+# bodies stored by their digest. Pages and metadata that are requested multiple
+# times are only stored once.
+INDEX_NAME = "interactions.json"
+BODIES_DIR = "bodies"
+
+# These headers describe the connection rather than the response and are set by the
+# replay server itself.
+_HOP_BY_HOP_HEADERS = {
+    "connection",
+    "content-length",
+    "keep-alive",
+    "proxy-connection",
+    "transfer-encoding",
+}
+
+_CHUNK_SIZE = 64 * 1024
+
+
+@dataclasses.dataclass
+class Interaction:
+    method: str
+    url: str
+    # Ranged reads of the same URL are separate interactions.
+    range: Optional[str]
+    status: int
+    reason: str
+    headers: List[Tuple[str, str]]
+    digest: str
+
+    @property
+    def key(self):
+        return self.method, self.url, self.range
+
+
+class Cassette:
+    def __init__(self) -> None:
+        self.interactions: Dict[Tuple[str, str, Optional[str]], List[Interaction]] = {}
+        self.bodies: Dict[str, bytes] = {}
+        self._replayed: Dict[Tuple[str, str, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(interactions) for interactions in self.interactions.values())
+
+    def add(self, request, response: HTTPResponse, body: bytes) -> None:
+        digest = hashlib.sha256(body).hexdigest()
+        interaction = Interaction(
+            method=request.method,
+            url=request.url,
+            range=request.headers.get("Range"),
+            status=response.status,
+            reason=response.reason or "",
+            headers=[
+                (name, value)
+                for name, value in response.headers.items()
+                if name.lower() not in _HOP_BY_HOP_HEADERS
+            ],
+            digest=digest,
+        )
+        with self._lock:
+            self.bodies[digest] = body
+            self.interactions.setdefault(interaction.key, []).append(interaction)
+
+    def replay(
+        self, method: str, url: str, range: Optional[str]
+    ) -> Optional[Tuple[Interaction, bytes]]:
+        key = method, url, range
+        with self._lock:
+            interactions = self.interactions.get(key)
+            if not interactions:
+                return None
+
+            # Repeated requests are answered in the recorded order. Once all recorded
+            # responses are used up, the last one is repeated.
+            idx = self._replayed.get(key, 0)
+            self._replayed[key] = idx + 1
+        interaction = interactions[min(idx, len(interactions) - 1)]
+        return interaction, self.bodies[interaction.digest]
+
+    def save(self, path: pathlib.Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as file:
+            file.writestr(
+                INDEX_NAME,
+                json.dumps(
+                    [
+                        dataclasses.asdict(interaction)
+                        for interactions in self.interactions.values()
+                        for interaction in interactions
+                    ],
+                    indent=2,
+                ),
+            )
+            for digest, body in self.bodies.items():
+                file.writestr(f"{BODIES_DIR}/{digest}", body)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "Cassette":
+        cassette = cls()
+        with zipfile.ZipFile(path) as file:
+            for data in json.loads(file.read(INDEX_NAME)):
+                data["headers"] = [tuple(header) for header in data["headers"]]
+                interaction = Interaction(**data)
+                cassette.interactions.setdefault(interaction.key, []).append(
+                    interaction
+                )
+                if interaction.digest not in cassette.bodies:
+                    cassette.bodies[interaction.digest] = file.read(
+                        f"{BODIES_DIR}/{interaction.digest}"
+                    )
+        return cassette
+
+
+@contextlib.contextmanager
+def recording(cassette):
+    # All HTTP(S) traffic of pip goes through the send method of the adapters below
+    # the cache. Thus, only requests that actually hit the network are recorded.
+    vanilla_send = HTTPAdapter.send
+
+    def send(self, request, *args, **kwargs):
+        response = vanilla_send(self, request, *args, **kwargs)
+
+        # The body is recorded as is, i.e. still compressed if the server sent it
+        # compressed, to replay realistic transfer sizes.
+        raw = response.raw
+        body = raw.read(decode_content=False)
+        cassette.add(request, raw, body)
+
+        response.raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers=raw.headers,
+            status=raw.status,
+            reason=raw.reason,
+            preload_content=False,
+            decode_content=raw.decode_content,
+        )
+        return response
+
+    with mock.patch.object(HTTPAdapter, "send", new=send):
+        yield cassette
+
+
+class ReplayServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        *,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), ReplayHandler)
+        self.cassette = cassette
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.misses: List[Tuple[str, str, Optional[str]]] = []
+
+    def local_url(self, url: str) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{urllib.parse.quote(url, safe='')}"
+
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: ReplayServer
+
+    def do_GET(self):
+        self._replay(send_body=True)
+
+    def do_HEAD(self):
+        self._replay(send_body=False)
+
+    def _replay(self, *, send_body):
+        url = urllib.parse.unquote(self.path[1:])
+        range = self.headers.get("Range")
+
+        time.sleep(self.server.latency)
+
+        replay = self.server.cassette.replay(self.command, url, range)
+        if replay is None:
+            self.server.misses.append((self.command, url, range))
+            self.send_error(404, "Not recorded in the cassette")
+            return
+
+        interaction, body = replay
+        self.send_response_only(interaction.status, interaction.reason)
+        for name, value in interaction.headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if send_body:
+            self._send_body(body)
+
+    def _send_body(self, body):
+        bandwidth = self.server.bandwidth
+        if bandwidth is None:
+            self.wfile.write(body)
+            return
+
+        start = time.monotonic()
+        for offset in range(0, len(body), _CHUNK_SIZE):
+            chunk = body[offset : offset + _CHUNK_SIZE]
+            self.wfile.write(chunk)
+            # The delay is computed from the total instead of per chunk to not
+            # accumulate the time it takes to write the chunks.
+            delay = start + (offset + len(chunk)) / bandwidth - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def replaying(cassette, *, latency=0.0, bandwidth=None):
+    server = ReplayServer(cassette, latency=latency, bandwidth=bandwidth)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    vanilla_send = HTTPAdapter.send
+
+    def send(self, request, *args, **kwargs):
+        local_request = request.copy()
+        local_request.url = server.local_url(request.url)
+        # The replay server is local and thus must never be reached through a proxy.
+        kwargs["proxies"] = {}
+
+        response = vanilla_send(self, local_request, *args, **kwargs)
+
+        # pip resolves relative links on the index pages against the URL of the
+        # response. Thus, it has to look like the response of the original server.
+        response.url = request.url
+        response.request = request
+        return response
+
+    try:
+        with mock.patch.object(HTTPAdapter, "send", new=send):
+            yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def parse_bandwidth(string: str) -> float:
+    match = re.fullmatch(r"(?P<value>\d+(\.\d+)?)(?P<unit>[KMG]?)", string.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(
+            f"Bandwidth has to be a number of bytes per second with an optional K, M, "
+            f"or G suffix, e.g. '10M', but got '{string}'"
+        )
+
+    exponent = " KMG".index(match["unit"] or " ")
+    return float(match["value"]) * 1024**exponent
+
+
+def record(args):
+    argv = args.argv
+    # Without the cache, every interaction hits the network and thus is recorded.
+    if "--no-cache-dir" not in argv:
+        argv = [*argv, "--no-cache-dir"]
+
+    cassette = Cassette()
+    with recording(cassette):
+        status = ltt_main(argv)
+
+    cassette.save(args.cassette)
+    print(
+        f"Recorded {len(cassette)} interaction(s) with "
+        f"{sum(map(len, cassette.bodies.values())) / 1024**2:.1f} MiB of unique "
+        f"response bodies to {args.cassette}",
+        file=sys.stderr,
+    )
+    return status
+
+
+def replay(args):
+    cassette = Cassette.load(args.cassette)
+
+    with replaying(
+        cassette, latency=args.latency / 1e3, bandwidth=args.bandwidth
+    ) as server:
+        start = time.perf_counter()
+        status = ltt_main(args.argv)
+        elapsed = time.perf_counter() - start
+
+    if server.misses:
+        print(
+            f"{len(server.misses)} request(s) were not recorded in the cassette:",
+            file=sys.stderr,
+        )
+        for method, url, range in server.misses:
+            print(f"  {method} {url}{f' ({range})' if range else ''}", file=sys.stderr)
+    print(f"Replayed ltt {' '.join(args.argv)} in {elapsed:.3f} s", file=sys.stderr)
+    return status
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Records the HTTP interactions of an ltt command into a cassette and "
+            "replays them offline from a local server."
+        )
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser(
+        "record", help="Runs an ltt command and records all of its HTTP interactions."
+    )
+    record_parser.set_defaults(fn=record)
+
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="Runs an ltt command against the interactions recorded in a cassette.",
+    )
+    replay_parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Latency in milliseconds that is added to every request. Defaults to 0.",
+    )
+    replay_parser.add_argument(
+        "--bandwidth",
+        type=parse_bandwidth,
+        help=(
+            "Bandwidth of every connection in bytes per second with an optional K, M, "
+            "or G suffix, e.g. '10M'. Defaults to unlimited."
+        ),
+    )
+    replay_parser.set_defaults(fn=replay)
+
+    for subparser in [record_parser, replay_parser]:
+        subparser.add_argument(
+            "cassette", type=pathlib.Path, help="Path to the cassette."
+        )
+        subparser.add_argument(
+            "argv",
+            nargs=argparse.REMAINDER,
+            help="Arguments of the ltt command, e.g. 'install --dry-run torch'.",
+        )
+
+    args = parser.parse_args()
+    if args.argv[:1] == ["--"]:
+        args.argv = args.argv[1:]
+    if not args.argv:
+        parser.error("No ltt command given")
+    return args
+
+
+def main():
+    args = parse_args()
+    raise SystemExit(args.fn(args))
+
+
+if __name__ == "__main__":
+    main()
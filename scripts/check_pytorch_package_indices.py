@@ -50,14 +50,17 @@ INDEX_URLS = sorted(
 
 def main():
     available = set()
-    for url in tqdm.tqdm(INDEX_URLS):
-        response = requests.get(url)
-        if not response.ok:
-            continue
+    # All index URLs live on the same host. Thus, we use a single session to keep the
+    # connection alive rather than paying for a new TLS handshake on every request.
+    with requests.Session() as session:
+        for url in tqdm.tqdm(INDEX_URLS):
+            response = session.get(url)
+            if not response.ok:
+                continue
 
-        soup = BeautifulSoup(response.text, features="html.parser")
+            soup = BeautifulSoup(response.text, features="html.parser")
 
-        available.update(tag.string for tag in soup.find_all(name="a"))
+            available.update(tag.string for tag in soup.find_all(name="a"))
     available = available - EXCLUDED_PYTORCH_PACKAGES
 
     print(
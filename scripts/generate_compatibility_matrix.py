@@ -0,0 +1,86 @@
+import json
+import pathlib
+
+import requests
+import tqdm
+
+from light_the_torch._compatibility import COMPATIBILITY_MATRIX_FILE
+from pip._vendor.packaging.requirements import InvalidRequirement, Requirement
+from pip._vendor.packaging.version import InvalidVersion, Version
+
+HERE = pathlib.Path(__file__).parent
+PACKAGE_ROOT = HERE.parent / "light_the_torch"
+
+DISTRIBUTIONS = [
+    "torchaudio",
+    "torchtext",
+    "torchvision",
+]
+
+MINIMUM_TORCH_VERSION = Version("1.7")
+
+
+def get_required_torch_version(session, name, version):
+    response = session.get(f"https://pypi.org/pypi/{name}/{version}/json")
+    if not response.ok:
+        return None
+
+    for requirement_string in response.json()["info"]["requires_dist"] or []:
+        try:
+            requirement = Requirement(requirement_string)
+        except InvalidRequirement:
+            continue
+
+        if requirement.name != "torch" or requirement.marker is not None:
+            continue
+
+        specs = list(requirement.specifier)
+        if len(specs) != 1 or specs[0].operator != "==":
+            return None
+
+        return Version(specs[0].version).base_version
+
+    return None
+
+
+def get_versions(session, name):
+    response = session.get(f"https://pypi.org/pypi/{name}/json")
+    response.raise_for_status()
+
+    versions = []
+    for version_string, files in response.json()["releases"].items():
+        try:
+            version = Version(version_string)
+        except InvalidVersion:
+            continue
+
+        if version.is_prerelease or not files:
+            continue
+
+        versions.append(version)
+
+    return sorted(versions)
+
+
+def main():
+    matrix = {}
+    with requests.Session() as session:
+        for name in DISTRIBUTIONS:
+            compatible_versions = {}
+            for version in tqdm.tqdm(get_versions(session, name), desc=name):
+                torch_version = get_required_torch_version(session, name, version)
+                if torch_version is None or Version(torch_version) < (
+                    MINIMUM_TORCH_VERSION
+                ):
+                    continue
+
+                compatible_versions[str(version)] = torch_version
+            matrix[name] = compatible_versions
+
+    with open(PACKAGE_ROOT / COMPATIBILITY_MATRIX_FILE, "w") as file:
+        json.dump(matrix, file, indent=2)
+        file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import http.server
+import importlib.util
+import pathlib
+import threading
+
+import pytest
+
+from pip._vendor import requests
+
+SCRIPT = pathlib.Path(__file__).parents[1] / "scripts" / "cassette.py"
+
+
+@pytest.fixture(scope="module")
+def cassette():
+    spec = importlib.util.spec_from_file_location("cassette", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", f'"{len(self.server.requests)}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.files = {"/simple/torch/": b"<a href='torch.whl'>torch.whl</a>"}
+    server.requests = []
+    host, port = server.server_address[:2]
+    server.url = lambda path: f"http://{host}:{port}{path}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_roundtrip(tmp_path, cassette, server):
+    url = server.url("/simple/torch/")
+    recorded = cassette.Cassette()
+    with cassette.recording(recorded):
+        responses = [requests.get(url) for _ in range(2)]
+    assert len(recorded) == 2
+
+    path = tmp_path / "cassette.zip"
+    recorded.save(path)
+    loaded = cassette.Cassette.load(path)
+    # The bodies are stored by their digest.
+    assert len(loaded) == 2
+    assert len(loaded.bodies) == 1
+
+    server.requests.clear()
+    with cassette.replaying(loaded) as replay_server:
+        replayed = [requests.get(url) for _ in range(3)]
+
+    assert not server.requests
+    assert not replay_server.misses
+    for response, expected in zip(replayed, [*responses, responses[-1]]):
+        assert response.url == url
+        assert response.status_code == expected.status_code
+        assert response.content == expected.content
+        # Repeated requests are answered in the recorded order.
+        assert response.headers["ETag"] == expected.headers["ETag"]
+
+
+def test_replay_miss(cassette, server):
+    url = server.url("/simple/torchvision/")
+
+    with cassette.replaying(cassette.Cassette()) as replay_server:
+        response = requests.get(url)
+
+    assert response.status_code == 404
+    assert replay_server.misses == [("GET", url, None)]
+    assert not server.requests
@@ -106,7 +106,27 @@ def test_version(set_argv, option):
     [
         "--pytorch-computation-backend",
         "--cpuonly",
+        "--pytorch-consistent-computation-backend",
+        "--pytorch-prefer-cached-wheels",
+        "--pytorch-allow-source-builds",
         "--pytorch-channel",
+        "--pytorch-pool-size",
+        "--pytorch-link-collection-concurrency",
+        "--pytorch-cache-locking",
+        "--pytorch-link-index",
+        "--pytorch-resolution-memo",
+        "--pytorch-nightly-window",
+        "--pytorch-nightly-latest",
+        "--pytorch-nightly-delta-downloads",
+        "--pytorch-extraction-workers",
+        "--pytorch-low-copy-extraction",
+        "--pytorch-bytecode-compilation",
+        "--pytorch-deduplicate-shared-libraries",
+        "--pytorch-slim-install",
+        "--pytorch-slim-exclude",
+        "--pytorch-trace-file",
+        "--pytorch-memory-profile",
+        "--pytorch-memory-top-allocations",
     ],
 )
 def test_ltt_options_smoke(set_argv, option):
@@ -116,6 +136,14 @@ def test_ltt_options_smoke(set_argv, option):
         main()
 
 
+@pytest.mark.parametrize("command", ["shared-libraries", "switch-backend"])
+def test_ltt_commands_smoke(set_argv, command):
+    set_argv("--help")
+
+    with exits(check_out=command):
+        main()
+
+
 def test_pytorch_channel_values(set_argv):
     set_argv("install", "--help")
 
@@ -0,0 +1,106 @@
+import collections
+import contextvars
+import threading
+import time
+
+import pytest
+
+from light_the_torch._collection import PageCollector
+from pip._internal.models.link import Link
+
+
+def make_link(host, project_name):
+    return Link(f"https://{host}/simple/{project_name}/")
+
+
+def test_prefetch():
+    fetched = collections.Counter()
+
+    def fetch(link):
+        fetched[link.url] += 1
+        return link.url
+
+    links = [make_link("pypi.org", project_name) for project_name in "abc"]
+
+    with PageCollector(fetch, max_per_host=2) as collector:
+        collector.prefetch(links)
+        collector.prefetch(links)
+
+        for link in links:
+            assert collector.get(link) == link.url
+
+        # Pages that were already collected are not fetched again by a prefetch.
+        collector.prefetch(links)
+
+    assert fetched == {link.url: 1 for link in links}
+
+
+def test_get_without_prefetch():
+    link = make_link("pypi.org", "foo")
+
+    with PageCollector(lambda link: link.url, max_per_host=1) as collector:
+        assert collector.get(link) == link.url
+
+
+def test_max_per_host():
+    lock = threading.Lock()
+    active = collections.Counter()
+    max_active = collections.Counter()
+
+    def fetch(link):
+        with lock:
+            active[link.netloc] += 1
+            max_active[link.netloc] = max(max_active[link.netloc], active[link.netloc])
+        time.sleep(0.01)
+        with lock:
+            active[link.netloc] -= 1
+
+    hosts = ["download.pytorch.org", "pypi.org"]
+    links = [
+        make_link(host, project_name) for host in hosts for project_name in "abcdef"
+    ]
+
+    with PageCollector(fetch, max_per_host=2) as collector:
+        collector.prefetch(links)
+        for link in links:
+            collector.get(link)
+
+    assert max_active == {host: 2 for host in hosts}
+
+
+def test_error():
+    class FetchError(Exception):
+        pass
+
+    def fetch(link):
+        raise FetchError
+
+    link = make_link("pypi.org", "foo")
+
+    with PageCollector(fetch, max_per_host=1) as collector:
+        collector.prefetch([link])
+
+        with pytest.raises(FetchError):
+            collector.get(link)
+
+
+def test_close_pending():
+    event = threading.Event()
+
+    def fetch(link):
+        event.wait(1)
+
+    collector = PageCollector(fetch, max_per_host=1)
+    collector.prefetch(make_link("pypi.org", project_name) for project_name in "abc")
+
+    event.set()
+    collector.close()
+
+
+def test_context():
+    # The pages are fetched in the context of the caller.
+    var = contextvars.ContextVar("var", default=None)
+    var.set("foo")
+
+    with PageCollector(lambda link: var.get(), max_per_host=1) as collector:
+        assert collector.get(make_link("pypi.org", "foo")) == "foo"
@@ -0,0 +1,73 @@
+import pytest
+
+from light_the_torch import _compatibility as compatibility
+from pip._vendor.packaging.specifiers import SpecifierSet
+from pip._vendor.packaging.version import Version
+
+
+def test_matrix_smoke():
+    matrix = compatibility.load_compatibility_matrix()
+
+    assert matrix["torchvision"]["0.16.0"] == "2.1.0"
+    for versions in matrix.values():
+        for version, torch_version in versions.items():
+            Version(version)
+            Version(torch_version)
+
+
+@pytest.mark.parametrize(
+    ("user_specifiers", "expected"),
+    [
+        pytest.param({"torch": ">=2"}, [">=2"], id="torch"),
+        pytest.param({"torch": "==2.1.0+cu121"}, [], id="torch-local"),
+        pytest.param({"torch": "==2.1.0rc1"}, [], id="torch-rc"),
+        pytest.param({"torch": "==2.2.0.dev20231010"}, [], id="torch-dev"),
+        pytest.param({"torchvision": "==0.16.0"}, ["==2.1.0"], id="pinned"),
+        pytest.param({"torchvision": ">=0.16"}, [], id="unpinned"),
+        pytest.param({"torchvision": "==0.16.*"}, [], id="wildcard"),
+        pytest.param({"torchvision": "==1000.0"}, [], id="unknown"),
+        pytest.param({"numpy": "==1.26.0"}, [], id="other"),
+    ],
+)
+def test_torch_version_constraints(user_specifiers, expected):
+    constraints = compatibility.torch_version_constraints(
+        {name: SpecifierSet(specifier) for name, specifier in user_specifiers.items()}
+    )
+
+    assert constraints == [SpecifierSet(specifier) for specifier in expected]
+
+
+@pytest.mark.parametrize(
+    ("name", "version", "compatible"),
+    [
+        ("torch", "2.1.0+cu121", True),
+        ("torch", "2.0.1+cu118", False),
+        ("torchvision", "0.16.2+cu121", True),
+        ("torchvision", "0.15.2+cu118", False),
+        ("torchaudio", "2.1.0rc1", True),
+        ("torchvision", "1000.0", True),
+        ("torchdata", "0.7.0", True),
+    ],
+)
+def test_is_compatible(name, version, compatible):
+    torch_constraints = [SpecifierSet(">=2.1,<2.2")]
+
+    assert (
+        compatibility.is_compatible(name, Version(version), torch_constraints)
+        is compatible
+    )
+
+
+@pytest.mark.parametrize(
+    ("specifier", "version"),
+    [
+        pytest.param("==2.1.0rc1", "2.1.0rc1+cu121", id="rc"),
+        pytest.param("==2.2.0.dev20231010", "2.2.0.dev20231010+cu121", id="dev"),
+    ],
+)
+def test_is_compatible_pre_release_pin(specifier, version):
+    torch_constraints = compatibility.torch_version_constraints(
+        {"torch": SpecifierSet(specifier)}
+    )
+
+    assert compatibility.is_compatible("torch", Version(version), torch_constraints)
@@ -5,6 +5,7 @@ from types import SimpleNamespace
 import pytest
 
 from light_the_torch import _cb as cb
+from pip._vendor.packaging.version import Version
 
 try:
     subprocess.check_call(
@@ -194,6 +195,12 @@ def cuda_backends_params():
 
 
 class TestDetectCompatibleComputationBackends:
+    @pytest.fixture(autouse=True)
+    def clear_compute_capabilities_cache(self):
+        cb._detect_nvidia_compute_capabilities.cache_clear()
+        yield
+        cb._detect_nvidia_compute_capabilities.cache_clear()
+
     def test_no_nvidia_driver(self, mocker):
         mocker.patch(
             "light_the_torch._cb.subprocess.run",
@@ -217,6 +224,86 @@ class TestDetectCompatibleComputationBackends:
         backends = cb.detect_compatible_computation_backends()
         assert backends == {cb.CPUBackend(), *compatible_cuda_backends}
 
+    @pytest.mark.parametrize(
+        ("compute_capabilities", "compatible_cuda_backends"),
+        [
+            pytest.param(
+                ["8.9"],
+                {cb.CUDABackend(11, 8), cb.CUDABackend(12, 1)},
+                id="ada",
+            ),
+            pytest.param(["9.0"], {cb.CUDABackend(11, 8)}, id="hopper"),
+            pytest.param(["3.7"], {cb.CUDABackend(11, 8)}, id="kepler"),
+            pytest.param(["3.7", "9.0"], {cb.CUDABackend(11, 8)}, id="mixed"),
+            pytest.param(
+                ["12.0"],
+                {cb.CUDABackend(11, 7), cb.CUDABackend(11, 8), cb.CUDABackend(12, 1)},
+                id="unsupported",
+            ),
+            pytest.param(
+                [],
+                {cb.CUDABackend(11, 7), cb.CUDABackend(11, 8), cb.CUDABackend(12, 1)},
+                id="unknown",
+            ),
+        ],
+    )
+    def test_compute_capability(
+        self, mocker, compute_capabilities, compatible_cuda_backends
+    ):
+        mocker.patch("light_the_torch._cb.platform.system", return_value="Linux")
+        mocker.patch.dict(
+            cb._MINIMUM_DRIVER_VERSIONS,
+            {
+                "Linux": {
+                    Version("12.1"): Version("525.60.13"),
+                    Version("11.8"): Version("450.80.02"),
+                    Version("11.7"): Version("450.80.02"),
+                }
+            },
+        )
+        mocker.patch.dict(
+            cb._SASS_ARCHITECTURES,
+            {
+                Version("12.1"): [Version("5.0"), Version("8.0"), Version("8.6")],
+                Version("11.8"): [Version("3.7"), Version("8.6"), Version("9.0")],
+                Version("11.7"): [Version("5.0"), Version("7.0")],
+            },
+        )
+
+        def run(cmd, **kwargs):
+            (query,) = [arg for arg in cmd if arg.startswith("--query-gpu")]
+            if query == "--query-gpu=driver_version":
+                stdout = "driver_version\n535.104.05"
+            else:
+                stdout = "\n".join(["compute_cap", *compute_capabilities])
+            return SimpleNamespace(stdout=stdout)
+
+        mocker.patch("light_the_torch._cb.subprocess.run", side_effect=run)
+
+        backends = cb.detect_compatible_computation_backends()
+        assert backends == {cb.CPUBackend(), *compatible_cuda_backends}
+
+    def test_compute_capability_unsupported_driver(self, mocker):
+        def run(cmd, **kwargs):
+            if "--query-gpu=compute_cap" in cmd:
+                raise subprocess.CalledProcessError(2, cmd)
+            return SimpleNamespace(stdout="driver_version\n535.104.05")
+
+        mocker.patch("light_the_torch._cb.subprocess.run", side_effect=run)
+
+        assert not cb._detect_nvidia_compute_capabilities()
+
+    def test_compute_capability_probed_once(self, mocker):
+        run = mocker.patch(
+            "light_the_torch._cb.subprocess.run",
+            return_value=SimpleNamespace(stdout="compute_cap\n8.9"),
+        )
+
+        for _ in range(3):
+            assert cb._detect_nvidia_compute_capabilities() == {Version("8.9")}
+
+        run.assert_called_once()
+
     @skip_if_nvidia_driver_unavailable
     def test_cuda_backend(self):
         backend_types = {
@@ -0,0 +1,205 @@
+import hashlib
+import http.server
+import io
+import os
+import random
+import re
+import threading
+import zipfile
+
+import pytest
+
+from light_the_torch._delta import (
+    coalesce,
+    DeltaError,
+    fetch,
+    NightlyWheelStore,
+    Segment,
+    store_dir,
+)
+from pip._vendor import requests
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match is None or not self.server.support_ranges:
+            self._send(200, body)
+            return
+
+        start, end = match.groups()
+        if not start:
+            start = max(len(body) - int(end), 0)
+            end = len(body)
+        else:
+            start = int(start)
+            end = int(end) + 1 if end else len(body)
+        self._send(
+            206,
+            body[start:end],
+            {"Content-Range": f"bytes {start}-{end - 1}/{len(body)}"},
+        )
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    server.files = {}
+    server.support_ranges = True
+    server.sent = 0
+    host, port = server.server_address[:2]
+    server.url = lambda path: f"http://{host}:{port}{path}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def make_wheel(members, *, date_time):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as file:
+        for name, content in members.items():
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            file.writestr(info, content)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def wheels():
+    rng = random.Random(0)
+
+    def random_bytes(size):
+        return bytes(rng.getrandbits(8) for _ in range(size))
+
+    members = {
+        "torch/__init__.py": b"import torch._C\n" * 100,
+        "torch/lib/libtorch_cpu.so": random_bytes(512 * 1024),
+        "torch/lib/libtorch_cuda.so": random_bytes(512 * 1024),
+        "torch/version.py": b"__version__ = '2.3.0.dev20240101'\n",
+    }
+    base = make_wheel(members, date_time=(2024, 1, 1, 0, 0, 0))
+
+    members["torch/lib/libtorch_cuda.so"] = random_bytes(512 * 1024)
+    members["torch/version.py"] = b"__version__ = '2.3.0.dev20240102'\n"
+    members["torch/_dynamo/__init__.py"] = b"\n"
+    new = make_wheel(members, date_time=(2024, 1, 2, 0, 0, 0))
+
+    return base, new
+
+
+def test_store_dir():
+    assert store_dir(False) is None
+    assert store_dir("foo") == os.path.join("foo", "ltt", "nightly-wheels")
+
+
+def test_store(tmp_path):
+    store = NightlyWheelStore(str(tmp_path / "store"))
+    filename = "torch-2.3.0.dev20240101+cu121-cp311-cp311-linux_x86_64.whl"
+    assert store.base(filename) is None
+
+    path = tmp_path / filename
+    path.write_bytes(b"foo")
+    store.add(filename, str(path))
+
+    base = store.base("torch-2.3.0.dev20240102+cu121-cp311-cp311-linux_x86_64.whl")
+    assert base is not None
+    with open(base, "rb") as file:
+        assert file.read() == b"foo"
+    assert (
+        store.base("torch-2.3.0.dev20240102+cpu-cp311-cp311-linux_x86_64.whl") is None
+    )
+
+
+def test_coalesce():
+    segments = [
+        Segment(0, 10),
+        Segment(10, 20, data=b"foo"),
+        Segment(20, 30),
+        Segment(30, 1000, base_offset=0),
+        Segment(1000, 1010),
+    ]
+
+    assert coalesce(segments, max_gap=10) == [[0, 30], [1000, 1010]]
+
+
+class TestFetch:
+    def fetch(self, server, tmp_path, base, new, *, digest=None):
+        server.files["/torch.whl"] = new
+        base_path = tmp_path / "base.whl"
+        base_path.write_bytes(base)
+        dest_path = tmp_path / "torch.whl"
+
+        stats, _ = fetch(
+            requests.Session(),
+            server.url("/torch.whl"),
+            str(base_path),
+            str(dest_path),
+            hash_name="sha256",
+            digest=digest or hashlib.sha256(new).hexdigest(),
+            tail_size=1024,
+            max_gap=1024,
+        )
+        return stats, dest_path
+
+    def test_fetch(self, server, tmp_path, wheels):
+        base, new = wheels
+
+        stats, dest_path = self.fetch(server, tmp_path, base, new)
+
+        assert dest_path.read_bytes() == new
+        assert stats.size == len(new)
+        assert (stats.members, stats.reused) == (5, 2)
+        assert stats.downloaded == server.sent
+        assert stats.downloaded < 0.6 * len(new)
+
+    def test_unchanged(self, server, tmp_path, wheels):
+        _, new = wheels
+
+        stats, dest_path = self.fetch(server, tmp_path, new, new)
+
+        assert dest_path.read_bytes() == new
+        assert stats.reused == stats.members
+        assert stats.downloaded < 0.01 * len(new)
+
+    def test_digest_mismatch(self, server, tmp_path, wheels):
+        base, new = wheels
+
+        with pytest.raises(DeltaError):
+            self.fetch(server, tmp_path, base, new, digest="0" * 64)
+
+        assert not (tmp_path / "torch.whl").exists()
+
+    def test_no_range_support(self, server, tmp_path, wheels):
+        server.support_ranges = False
+        base, new = wheels
+
+        with pytest.raises(DeltaError):
+            self.fetch(server, tmp_path, base, new)
+
+        assert not (tmp_path / "torch.whl").exists()
@@ -0,0 +1,30 @@
+import pytest
+
+from light_the_torch import _cb as cb
+from light_the_torch._hints import likely_dependency_closure
+
+
+def test_transitive():
+    closure = likely_dependency_closure(
+        ["torchvision"], {cb.CPUBackend()}, platform="linux"
+    )
+
+    assert {"torchvision", "torch", "sympy", "mpmath", "urllib3"} <= closure
+    assert "triton" not in closure
+    assert not any(project_name.startswith("nvidia-") for project_name in closure)
+
+
+def test_unknown():
+    assert likely_dependency_closure(["Foo_Bar"], {cb.CPUBackend()}) == {"foo-bar"}
+
+
+@pytest.mark.parametrize(
+    ("platform", "cuda_dependencies"), [("linux", True), ("win32", False)]
+)
+def test_cuda(platform, cuda_dependencies):
+    closure = likely_dependency_closure(
+        ["torch"], {cb.CUDABackend(12, 1), cb.CPUBackend()}, platform=platform
+    )
+
+    assert ("nvidia-cublas-cu12" in closure) is cuda_dependencies
+    assert ("triton" in closure) is cuda_dependencies
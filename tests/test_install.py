@@ -0,0 +1,471 @@
+import base64
+import contextlib
+import csv
+import hashlib
+import io
+import os
+import pathlib
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from light_the_torch import (
+    _bytecode as bytecode,
+    _extraction as extraction,
+    _patch,
+    _shared_libraries as shared_libraries,
+    _slim as slim,
+)
+from light_the_torch._cli import main
+from pip._internal.commands.install import InstallCommand
+from pip._internal.models.scheme import Scheme
+from pip._internal.operations.install.wheel import install_wheel
+
+
+def make_wheel(path, files, *, name="foo", version="1.0"):
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        **files,
+        f"{dist_info}/METADATA": (
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+        ).encode(),
+        f"{dist_info}/WHEEL": (
+            b"Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n"
+        ),
+    }
+
+    record = io.StringIO()
+    writer = csv.writer(record)
+    for member, content in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b"=")
+        writer.writerow([member, f"sha256={digest.decode()}", len(content)])
+    writer.writerow([f"{dist_info}/RECORD", "", ""])
+
+    wheel_path = path / f"{name}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel_path, "w") as wheel:
+        for member, content in files.items():
+            compress_type = (
+                zipfile.ZIP_STORED if member.endswith(".so") else zipfile.ZIP_DEFLATED
+            )
+            wheel.writestr(member, content, compress_type=compress_type)
+        wheel.writestr(f"{dist_info}/RECORD", record.getvalue())
+    return wheel_path
+
+
+@pytest.fixture
+def wheel(tmp_path):
+    files = {f"foo/module{idx}.py": f"VALUE = {idx}\n".encode() for idx in range(50)}
+    files["foo/_C.so"] = os.urandom(extraction.LOW_COPY_THRESHOLD)
+    files["foo/_data.bin"] = bytes(4 * extraction.LOW_COPY_THRESHOLD)
+    files["foo-1.0.data/scripts/foo"] = b"#!python\nprint('foo')\n"
+    files["foo-1.0.data/data/share/foo.txt"] = b"foo\n"
+    return make_wheel(tmp_path, files)
+
+
+def install(wheel_path, root, *, name="foo", pycompile=True):
+    scheme = Scheme(
+        **{
+            key: str(root / key)
+            for key in ["platlib", "purelib", "headers", "scripts", "data"]
+        }
+    )
+    install_wheel(name, str(wheel_path), scheme, name, pycompile=pycompile)
+
+
+def read_tree(root):
+    return {
+        path.relative_to(root): path.read_bytes()
+        for path in pathlib.Path(root).rglob("*")
+        if path.is_file()
+    }
+
+
+def normalize_record(root, tree):
+    (record_path,) = [path for path in tree if path.name == "RECORD"]
+    return sorted(tree[record_path].decode().replace(str(root), "<root>").splitlines())
+
+
+@pytest.mark.parametrize(
+    "patches",
+    [
+        pytest.param(
+            lambda: [_patch.patch_parallel_extraction(4)], id="parallel_extraction"
+        ),
+        pytest.param(
+            lambda: [_patch.patch_low_copy_extraction()], id="low_copy_extraction"
+        ),
+        pytest.param(
+            lambda: [
+                _patch.patch_low_copy_extraction(),
+                _patch.patch_parallel_extraction(4),
+            ],
+            id="parallel_low_copy_extraction",
+        ),
+    ],
+)
+def test_extraction(tmp_path, wheel, patches):
+    vanilla_root = tmp_path / "vanilla"
+    install(wheel, vanilla_root)
+
+    root = tmp_path / "patched"
+    with contextlib.ExitStack() as stack:
+        for patch in patches():
+            stack.enter_context(patch)
+        install(wheel, root)
+
+    vanilla_tree = read_tree(vanilla_root)
+    tree = read_tree(root)
+
+    assert tree.keys() == vanilla_tree.keys()
+    assert any(path.suffix == ".pyc" for path in tree)
+    assert normalize_record(root, tree) == normalize_record(vanilla_root, vanilla_tree)
+    assert all(
+        (root / path).stat().st_mode == (vanilla_root / path).stat().st_mode
+        for path in tree
+    )
+
+
+class TestParallelExtractor:
+    def test_same_destination(self):
+        written = []
+
+        with extraction.ParallelExtractor(4) as extractor:
+            for idx in range(10):
+                extractor.submit(lambda idx=idx: written.append(idx), "foo")
+
+        assert written == list(range(10))
+
+    def test_error(self):
+        def save():
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            with extraction.ParallelExtractor(2) as extractor:
+                extractor.submit(save, "foo")
+
+
+class TestExtractMember:
+    @pytest.fixture(autouse=True)
+    def small_chunks(self, mocker):
+        # This makes sure the members are processed in multiple chunks.
+        mocker.patch.object(extraction, "CHUNK_SIZE", 1000)
+
+    @pytest.mark.parametrize(
+        "compress_type", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]
+    )
+    def test_roundtrip(self, tmp_path, compress_type):
+        content = os.urandom(10_000) + bytes(100_000)
+        archive = tmp_path / "archive.zip"
+        with zipfile.ZipFile(archive, "w") as file:
+            file.writestr("padding", os.urandom(5_000), compress_type=compress_type)
+            file.writestr("member", content, compress_type=compress_type)
+            zipinfo = file.getinfo("member")
+
+        dest_path = tmp_path / "member"
+        extraction.extract_member(str(archive), zipinfo, str(dest_path))
+
+        assert dest_path.read_bytes() == content
+
+    def test_no_kernel_copy(self, tmp_path, mocker):
+        mocker.patch.object(extraction, "_KERNEL_COPIES", [])
+        content = os.urandom(10_000)
+        archive = tmp_path / "archive.zip"
+        with zipfile.ZipFile(archive, "w") as file:
+            file.writestr("member", content)
+            zipinfo = file.getinfo("member")
+
+        dest_path = tmp_path / "member"
+        extraction.extract_member(str(archive), zipinfo, str(dest_path))
+
+        assert dest_path.read_bytes() == content
+
+    def test_bad_crc(self, tmp_path):
+        archive = tmp_path / "archive.zip"
+        with zipfile.ZipFile(archive, "w") as file:
+            file.writestr("member", b"foo")
+            zipinfo = file.getinfo("member")
+        zipinfo.CRC ^= 1
+
+        with pytest.raises(zipfile.BadZipFile, match="CRC"):
+            extraction.extract_member(str(archive), zipinfo, str(tmp_path / "member"))
+
+
+class TestBytecodeCompilation:
+    @pytest.fixture
+    def torch_wheel(self, tmp_path):
+        files = {
+            f"torch/module{idx}.py": f"VALUE = {idx}\n".encode() for idx in range(20)
+        }
+        files["torch/broken.py"] = b"def\n"
+        files["torch/lib/libtorch.so"] = os.urandom(extraction.LOW_COPY_THRESHOLD)
+        return make_wheel(tmp_path, files, name="torch", version="2.1.0")
+
+    def test_parallel(self, tmp_path, torch_wheel):
+        vanilla_root = tmp_path / "vanilla"
+        install(torch_wheel, vanilla_root, name="torch")
+
+        root = tmp_path / "patched"
+        with _patch.patch_bytecode_compilation("parallel"):
+            install(torch_wheel, root, name="torch")
+
+        vanilla_tree = read_tree(vanilla_root)
+        tree = read_tree(root)
+
+        assert tree.keys() == vanilla_tree.keys()
+        assert sum(path.suffix == ".pyc" for path in tree) == 20
+        assert normalize_record(root, tree) == normalize_record(
+            vanilla_root, vanilla_tree
+        )
+
+    def test_deferred(self, tmp_path, mocker, torch_wheel):
+        spawn = mocker.patch.object(bytecode, "spawn_deferred_compilation")
+
+        root = tmp_path / "patched"
+        with _patch.patch_bytecode_compilation("deferred"):
+            install(torch_wheel, root, name="torch")
+
+        tree = read_tree(root)
+        assert not any(path.suffix == ".pyc" for path in tree)
+
+        (marker_path,) = [
+            path for path in tree if path.name == bytecode.DEFERRED_MARKER_FILE
+        ]
+        assert any(
+            line.startswith(f"{marker_path.parent.name}/{marker_path.name},")
+            for line in normalize_record(root, tree)
+        )
+        spawn.assert_called_once_with(str(root / marker_path))
+
+        bytecode.main([str(root / marker_path)])
+
+        tree = read_tree(root)
+        assert sum(path.suffix == ".pyc" for path in tree) == 20
+        assert not (root / marker_path).exists()
+
+    @pytest.mark.parametrize("mode", ["parallel", "deferred"])
+    @pytest.mark.parametrize(
+        "patches",
+        [
+            pytest.param(
+                lambda: [_patch.patch_low_copy_extraction()], id="low_copy_extraction"
+            ),
+            pytest.param(
+                lambda: [_patch.patch_shared_library_deduplication()],
+                id="shared_library_deduplication",
+            ),
+            pytest.param(
+                lambda: [_patch.patch_parallel_extraction(4)], id="parallel_extraction"
+            ),
+            pytest.param(
+                lambda: [_patch.patch_slim_install(slim.DEFAULT_EXCLUDE_PATTERNS)],
+                id="slim_install",
+            ),
+            pytest.param(
+                # This is the order in which the patches are applied by ltt.
+                lambda: [
+                    _patch.patch_low_copy_extraction(),
+                    _patch.patch_shared_library_deduplication(),
+                    _patch.patch_slim_install(slim.DEFAULT_EXCLUDE_PATTERNS),
+                    _patch.patch_parallel_extraction(4),
+                ],
+                id="all",
+            ),
+        ],
+    )
+    def test_extraction_patches(self, tmp_path, mocker, torch_wheel, mode, patches):
+        mocker.patch.object(bytecode, "spawn_deferred_compilation")
+
+        vanilla_root = tmp_path / "vanilla"
+        install(torch_wheel, vanilla_root, name="torch")
+
+        root = tmp_path / "patched"
+        with contextlib.ExitStack() as stack:
+            for patch in patches():
+                stack.enter_context(patch)
+            stack.enter_context(_patch.patch_bytecode_compilation(mode))
+            install(torch_wheel, root, name="torch")
+
+        if mode == "deferred":
+            (marker_path,) = root.rglob(bytecode.DEFERRED_MARKER_FILE)
+            bytecode.main([str(marker_path)])
+
+        vanilla_tree = read_tree(vanilla_root)
+        tree = read_tree(root)
+
+        assert tree.keys() == vanilla_tree.keys()
+        assert sum(path.suffix == ".pyc" for path in tree) == 20
+        assert all(
+            tree[path] == vanilla_tree[path]
+            for path in tree
+            if path.suffix != ".pyc" and path.name != "RECORD"
+        )
+
+    def test_non_pytorch_distribution(self, tmp_path, mocker, wheel):
+        compile_files = mocker.spy(bytecode, "compile_files")
+
+        with _patch.patch_bytecode_compilation("parallel"):
+            install(wheel, tmp_path / "patched")
+
+        compile_files.assert_not_called()
+
+    def test_no_compile(self, tmp_path, mocker, torch_wheel):
+        spawn = mocker.patch.object(bytecode, "spawn_deferred_compilation")
+
+        root = tmp_path / "patched"
+        with _patch.patch_bytecode_compilation("deferred"):
+            install(torch_wheel, root, name="torch", pycompile=False)
+
+        spawn.assert_not_called()
+        assert not any(
+            path.name == bytecode.DEFERRED_MARKER_FILE for path in read_tree(root)
+        )
+
+
+class TestSharedLibraryDeduplication:
+    @pytest.fixture
+    def store_dir(self, tmp_path, monkeypatch):
+        store_dir = tmp_path / "store"
+        monkeypatch.setenv(shared_libraries.STORE_DIR_ENV_VAR, str(store_dir))
+        return store_dir
+
+    @pytest.fixture
+    def nvidia_wheel(self, tmp_path):
+        files = {
+            "nvidia/__init__.py": b"",
+            "nvidia/cublas/lib/libcublas.so.11": os.urandom(10_000),
+        }
+        return make_wheel(tmp_path, files, name="nvidia-cublas-cu11", version="11.10")
+
+    def install(self, mocker, wheel_path, roots):
+        def run(self, options, args):
+            for root in roots:
+                install(wheel_path, root, name="nvidia-cublas-cu11")
+
+        mocker.patch.object(InstallCommand, "run", run)
+
+        with _patch.patch_shared_library_deduplication():
+            InstallCommand.run(None, SimpleNamespace(cache_dir=None), [])
+
+    def test_deduplication(self, tmp_path, mocker, store_dir, nvidia_wheel):
+        vanilla_root = tmp_path / "vanilla"
+        install(nvidia_wheel, vanilla_root, name="nvidia-cublas-cu11")
+
+        roots = [tmp_path / "env1", tmp_path / "env2"]
+        self.install(mocker, nvidia_wheel, roots)
+
+        vanilla_tree = read_tree(vanilla_root)
+        library = next(path for path in vanilla_tree if path.name.startswith("lib"))
+        for root in roots:
+            tree = read_tree(root)
+            assert tree.keys() == vanilla_tree.keys()
+            assert tree[library] == vanilla_tree[library]
+            assert normalize_record(root, tree) == normalize_record(
+                vanilla_root, vanilla_tree
+            )
+
+        (stored,) = [path for path in store_dir.rglob("*") if path.is_file()]
+        assert stored.stat().st_nlink == 3
+        assert {(root / library).stat().st_ino for root in roots} == {
+            stored.stat().st_ino
+        }
+
+    def test_digest_mismatch(self, tmp_path, mocker, store_dir, nvidia_wheel):
+        mocker.patch.object(
+            shared_libraries,
+            "read_record_digests",
+            lambda wheel_zip, name: {"nvidia/cublas/lib/libcublas.so.11": "foo"},
+        )
+
+        root = tmp_path / "env"
+        self.install(mocker, nvidia_wheel, [root])
+
+        assert not any(path.is_file() for path in store_dir.rglob("*"))
+        assert any(path.name == "libcublas.so.11" for path in read_tree(root))
+
+    def test_gc(self, tmp_path, mocker, store_dir, nvidia_wheel):
+        roots = [tmp_path / "env1", tmp_path / "env2"]
+        self.install(mocker, nvidia_wheel, roots)
+        (stored,) = [path for path in store_dir.rglob("*") if path.is_file()]
+
+        store = shared_libraries.SharedLibraryStore(str(store_dir))
+        for root in roots:
+            assert not store.unreferenced()
+            (library,) = root.rglob("libcublas.so.11")
+            library.unlink()
+
+        assert store.unreferenced() == [str(stored)]
+
+        assert main(["shared-libraries", "gc", "--dry-run"]) == 0
+        assert stored.exists()
+
+        assert main(["shared-libraries", "gc"]) == 0
+        assert not stored.exists()
+
+
+class TestSlimInstall:
+    @pytest.fixture
+    def torch_wheel(self, tmp_path):
+        files = {
+            "torch/__init__.py": b"",
+            "torch/include/torch.h": b"#pragma once\n",
+            "torch/lib/libtorch.a": os.urandom(1_000),
+            "torch/lib/libtorch.so": os.urandom(extraction.LOW_COPY_THRESHOLD),
+        }
+        return make_wheel(tmp_path, files, name="torch", version="2.1.0")
+
+    @pytest.mark.parametrize(
+        "patches",
+        [
+            pytest.param(lambda: [], id="serial_extraction"),
+            pytest.param(
+                lambda: [
+                    _patch.patch_low_copy_extraction(),
+                    _patch.patch_parallel_extraction(4),
+                ],
+                id="parallel_low_copy_extraction",
+            ),
+        ],
+    )
+    def test_slim_install(self, tmp_path, torch_wheel, patches):
+        vanilla_root = tmp_path / "vanilla"
+        install(torch_wheel, vanilla_root, name="torch")
+
+        root = tmp_path / "patched"
+        with contextlib.ExitStack() as stack:
+            for patch in patches():
+                stack.enter_context(patch)
+            stack.enter_context(
+                _patch.patch_slim_install(["torch/include/*", "torch/lib/*.a"])
+            )
+            install(torch_wheel, root, name="torch")
+
+        vanilla_tree = read_tree(vanilla_root)
+        tree = read_tree(root)
+
+        excluded = {
+            path for path in vanilla_tree if path.name in {"torch.h", "libtorch.a"}
+        }
+        assert len(excluded) == 2
+        assert tree.keys() == vanilla_tree.keys() - excluded
+
+        # Every file in the RECORD needs to exist, so the distribution can be
+        # uninstalled.
+        record = normalize_record(root, tree)
+        purelib = pathlib.Path("purelib")
+        assert {purelib / line.split(",")[0] for line in record} == set(tree)
+        assert record == [
+            line
+            for line in normalize_record(vanilla_root, vanilla_tree)
+            if purelib / line.split(",")[0] not in excluded
+        ]
+
+    def test_non_pytorch_distribution(self, tmp_path, wheel):
+        vanilla_root = tmp_path / "vanilla"
+        install(wheel, vanilla_root)
+
+        root = tmp_path / "patched"
+        with _patch.patch_slim_install(["foo/*"]):
+            install(wheel, root)
+
+        assert read_tree(root).keys() == read_tree(vanilla_root).keys()
@@ -0,0 +1,130 @@
+import pytest
+
+from light_the_torch._link_index import (
+    compile_index,
+    InvalidLinkIndex,
+    LinkIndex,
+    LinkIndexStore,
+)
+from pip._internal.models.link import Link, MetadataFile
+
+PAGE_URL = "https://download.pytorch.org/whl/cu121/torch/"
+
+
+def make_link(filename, **kwargs):
+    return Link(
+        f"https://download.pytorch.org/whl/cu121/{filename}#sha256=abc",
+        comes_from=PAGE_URL,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def links():
+    return [
+        make_link("torch-2.1.0%2Bcu121-cp311-cp311-linux_x86_64.whl"),
+        make_link(
+            "torch-2.0.1%2Bcu121-cp311-cp311-linux_x86_64.whl",
+            requires_python=">=3.8",
+            yanked_reason="broken",
+            metadata_file_data=MetadataFile({"sha256": "def"}),
+        ),
+        make_link("torch-2.1.0%2Bcu121-cp310-cp310-linux_x86_64.whl"),
+        make_link("torch-2.1.0-cp311-none-macosx_11_0_arm64.whl"),
+        make_link("torchvision-0.16.0%2Bcu121-cp311-cp311-linux_x86_64.whl"),
+    ]
+
+
+@pytest.fixture
+def index(tmp_path, links):
+    path = str(tmp_path / "index")
+    assert compile_index(links, digest=b"\0" * 32, path=path)
+
+    index = LinkIndex(path)
+    yield index
+    index.close()
+
+
+def test_roundtrip(index, links):
+    assert len(index) == len(links)
+
+    actual = index.links("torch", page_url=PAGE_URL)
+
+    assert sorted(link.url for link in actual) == sorted(
+        link.url for link in links if link.filename.startswith("torch-")
+    )
+    yanked = next(link for link in actual if link.is_yanked)
+    assert yanked.requires_python == ">=3.8"
+    assert yanked.yanked_reason == "broken"
+    assert yanked.metadata_file_data == MetadataFile({"sha256": "def"})
+    assert yanked.hash == "abc"
+
+
+def test_sorted(index):
+    assert [link.filename for link in index.links("torch", page_url=PAGE_URL)] == [
+        "torch-2.0.1+cu121-cp311-cp311-linux_x86_64.whl",
+        "torch-2.1.0-cp311-none-macosx_11_0_arm64.whl",
+        "torch-2.1.0+cu121-cp310-cp310-linux_x86_64.whl",
+        "torch-2.1.0+cu121-cp311-cp311-linux_x86_64.whl",
+    ]
+
+
+def test_filter(index):
+    actual = index.links(
+        "torch",
+        page_url=PAGE_URL,
+        supported_tags={("cp311", "cp311", "linux_x86_64")},
+        keep_version=lambda version: version.startswith("2.1"),
+    )
+
+    assert [link.filename for link in actual] == [
+        "torch-2.1.0+cu121-cp311-cp311-linux_x86_64.whl"
+    ]
+
+
+def test_unknown_project(index):
+    assert index.links("foo", page_url=PAGE_URL) == []
+
+
+def test_no_wheel(tmp_path, links):
+    path = str(tmp_path / "index")
+
+    assert not compile_index(
+        [*links, make_link("torch-2.1.0.tar.gz")], digest=b"\0" * 32, path=path
+    )
+    assert not (tmp_path / "index").exists()
+
+
+def test_invalid(tmp_path):
+    path = tmp_path / "index"
+    path.write_bytes(b"foo")
+
+    with pytest.raises(InvalidLinkIndex):
+        LinkIndex(str(path))
+
+
+def test_store(tmp_path, links):
+    parsed = []
+
+    def parse():
+        parsed.append(True)
+        return links
+
+    store = LinkIndexStore(str(tmp_path))
+    try:
+        index = store.open(PAGE_URL, b"content", parse)
+        assert len(index) == len(links)
+        assert store.open(PAGE_URL, b"content", parse) is index
+    finally:
+        store.close()
+
+    store = LinkIndexStore(str(tmp_path))
+    try:
+        store.open(PAGE_URL, b"content", parse)
+        assert len(parsed) == 1
+
+        # A changed page invalidates the index.
+        store.open(PAGE_URL, b"changed content", parse)
+        assert len(parsed) == 2
+    finally:
+        store.close()
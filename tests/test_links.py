@@ -0,0 +1,79 @@
+import datetime
+
+import pytest
+
+from light_the_torch import _links as links
+
+
+@pytest.mark.parametrize(
+    ("url", "version"),
+    [
+        (
+            "https://download.pytorch.org/whl/cu121/torch-2.1.0%2Bcu121-cp311-cp311-linux_x86_64.whl#sha256=abc",
+            "2.1.0+cu121",
+        ),
+        ("/whl/torchvision-0.16.0-1-cp311-cp311-win_amd64.whl", "0.16.0"),
+        ("https://files.pythonhosted.org/torch-2.1.0.tar.gz", None),
+        ("https://example.com/not-a-wheel.whl", None),
+    ],
+)
+def test_wheel_version(url, version):
+    assert links.wheel_version(url) == version
+
+
+@pytest.mark.parametrize(
+    ("version", "date"),
+    [
+        ("2.2.0.dev20231010+cu121", "20231010"),
+        ("2.2.0.dev20231010", "20231010"),
+        ("2.1.0+cu121", None),
+        ("2.2.0.dev1", None),
+    ],
+)
+def test_nightly_date(version, date):
+    assert links.nightly_date(version) == date
+
+
+@pytest.mark.parametrize(
+    ("string", "days"), [("7d", 7), ("7", 7), ("2w", 14), (" 3D ", 3)]
+)
+def test_parse_nightly_window(string, days):
+    assert links.parse_nightly_window(string) == datetime.timedelta(days=days)
+
+
+@pytest.mark.parametrize("string", ["", "d", "7m", "-1d"])
+def test_parse_nightly_window_invalid(string):
+    with pytest.raises(ValueError):
+        links.parse_nightly_window(string)
+
+
+NIGHTLY_CONTENT = b"\n".join(
+    f'<a href="/whl/nightly/cu121/torch-2.2.0.dev{date}%2Bcu121-cp311-cp311-linux_x86_64.whl">'.encode()
+    for date in ["20231001", "20231005", "20231008", "20231010"]
+)
+
+
+class TestMakeNightlyFilter:
+    def test_no_filter(self):
+        assert links.make_nightly_filter(NIGHTLY_CONTENT) is None
+
+    def test_window(self):
+        keep = links.make_nightly_filter(
+            NIGHTLY_CONTENT,
+            window=datetime.timedelta(days=3),
+            today=datetime.date(2023, 10, 10),
+        )
+
+        assert keep("2.2.0.dev20231008+cu121")
+        assert not keep("2.2.0.dev20231005+cu121")
+        assert keep("2.1.0+cu121")
+
+    def test_latest(self):
+        keep = links.make_nightly_filter(NIGHTLY_CONTENT, latest=2)
+
+        assert keep("2.2.0.dev20231010+cu121")
+        assert keep("2.2.0.dev20231008+cu121")
+        assert not keep("2.2.0.dev20231005+cu121")
+
+    def test_latest_more_than_available(self):
+        assert links.make_nightly_filter(NIGHTLY_CONTENT, latest=10) is None
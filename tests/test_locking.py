@@ -0,0 +1,129 @@
+import functools
+import http.server
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from light_the_torch._locking import FileLock, LockStore, LockTimeout
+
+
+def write_lock(path, *, host, pid, mtime=None):
+    with open(path, "w") as file:
+        json.dump(dict(id="foo", host=host, pid=pid, thread=0), file)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_acquire_release(tmp_path):
+    path = str(tmp_path / "foo.lock")
+
+    with FileLock(path) as lock:
+        assert lock.is_locked
+        assert os.path.exists(path)
+
+    assert not lock.is_locked
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_timeout(tmp_path):
+    path = str(tmp_path / "foo.lock")
+    write_lock(path, host="other-host", pid=1)
+
+    with pytest.raises(LockTimeout):
+        FileLock(path, poll_interval=0.01).acquire(timeout=0.1)
+
+
+def test_stale_dead_process(tmp_path):
+    process = multiprocessing.get_context("spawn").Process(target=time.sleep, args=(0,))
+    process.start()
+    process.join()
+
+    path = str(tmp_path / "foo.lock")
+    write_lock(path, host=socket.gethostname(), pid=process.pid)
+
+    with FileLock(path, poll_interval=0.01) as lock:
+        assert lock.is_locked
+
+
+def test_stale_mtime(tmp_path):
+    path = str(tmp_path / "foo.lock")
+    write_lock(path, host="other-host", pid=1, mtime=time.time() - 10)
+
+    lock = FileLock(path, stale_after=5, poll_interval=0.01)
+    lock.acquire(timeout=1)
+    lock.release()
+
+
+def test_release_broken(tmp_path):
+    path = str(tmp_path / "foo.lock")
+
+    lock = FileLock(path)
+    lock.acquire()
+    # Simulate that the lock was deemed stale and was acquired by someone else.
+    os.remove(path)
+    write_lock(path, host="other-host", pid=1)
+    lock.release()
+
+    assert os.path.exists(path)
+
+
+class CountingHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        # Give the other processes a chance to fetch concurrently.
+        time.sleep(0.2)
+        content = b"content"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch_once(locks_dir, cache_dir, url):
+    cache_path = os.path.join(cache_dir, "content")
+    with LockStore(locks_dir, poll_interval=0.01).lock(url):
+        if not os.path.exists(cache_path):
+            with urllib.request.urlopen(url) as response:
+                content = response.read()
+            with open(cache_path, "wb") as file:
+                file.write(content)
+
+    with open(cache_path, "rb") as file:
+        return file.read()
+
+
+def test_single_flight(tmp_path, server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/torch/"
+    locks_dir = str(tmp_path / "locks")
+    cache_dir = str(tmp_path)
+
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        results = pool.map(
+            functools.partial(fetch_once, locks_dir, cache_dir), [url] * 4
+        )
+
+    assert results == [b"content"] * 4
+    assert server.requests == 1
@@ -0,0 +1,158 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from light_the_torch._memo import (
+    memo_dir,
+    Pin,
+    Resolution,
+    resolution_key,
+    ResolutionMemo,
+    revalidate,
+    validators_from_headers,
+    validators_from_response,
+)
+from pip._internal.models.link import Link
+
+
+def test_memo_dir():
+    assert memo_dir(False) is None
+    assert memo_dir("foo") == os.path.join("foo", "ltt", "resolutions")
+
+
+def test_resolution_key():
+    key = resolution_key(requirements=["torch"], channel="STABLE")
+
+    assert key == resolution_key(channel="STABLE", requirements=["torch"])
+    assert key != resolution_key(requirements=["torch"], channel="NIGHTLY")
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected"),
+    [
+        ({"etag": '"foo"', "content-type": "text/html"}, {"etag": '"foo"'}),
+        (
+            {"etag": '"foo"', "last-modified": "bar"},
+            {"etag": '"foo"', "last-modified": "bar"},
+        ),
+        ({"content-type": "text/html"}, None),
+    ],
+)
+def test_validators_from_headers(headers, expected):
+    assert validators_from_headers(headers) == expected
+
+
+@pytest.mark.parametrize(
+    ("status_code", "expected"),
+    [(200, {"etag": '"foo"'}), (404, {"status": "404"}), (500, None)],
+)
+def test_validators_from_response(status_code, expected):
+    response = SimpleNamespace(status_code=status_code, headers={"etag": '"foo"'})
+
+    assert validators_from_response(response) == expected
+
+
+def make_response(status_code=200, **headers):
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def make_resolution():
+    page_url = "https://download.pytorch.org/whl/cpu/torch/"
+    return Resolution(
+        pins={
+            "torch": Pin(
+                version="2.1.0+cpu",
+                url="https://download.pytorch.org/whl/cpu/torch-2.1.0%2Bcpu.whl",
+                comes_from=page_url,
+            )
+        },
+        validators={page_url: {"etag": '"foo"'}},
+    )
+
+
+def test_pin_link_roundtrip():
+    link = Link.from_json(
+        {
+            "filename": "filelock-3.13.1-py3-none-any.whl",
+            "url": "https://files.pythonhosted.org/filelock-3.13.1-py3-none-any.whl",
+            "hashes": {"sha256": "foo"},
+            "requires-python": ">=3.8",
+            "yanked": "broken",
+            "core-metadata": {"sha256": "bar"},
+        },
+        page_url="https://pypi.org/simple/filelock/",
+    )
+
+    pin = Resolution.from_json(
+        json.loads(
+            json.dumps(
+                Resolution(
+                    pins={"filelock": Pin.from_link("3.13.1", link)}, validators={}
+                ).to_json()
+            )
+        )
+    ).pins["filelock"]
+    replayed = pin.to_link()
+
+    assert replayed.url == link.url
+    assert replayed.comes_from == "https://pypi.org/simple/filelock/"
+    assert replayed.as_hashes() == link.as_hashes()
+    assert replayed.requires_python == ">=3.8"
+    assert replayed.yanked_reason == "broken"
+    assert replayed.metadata_file_data == link.metadata_file_data
+
+
+def test_memo_roundtrip(tmp_path):
+    memo = ResolutionMemo(str(tmp_path / "resolutions"))
+    resolution = make_resolution()
+
+    assert memo.load("foo") is None
+
+    memo.save("foo", resolution)
+
+    assert memo.load("foo") == resolution
+    assert os.listdir(memo.root) == ["foo.json"]
+
+
+def test_memo_corrupted(tmp_path):
+    memo = ResolutionMemo(str(tmp_path))
+    with open(memo.path("foo"), "w") as file:
+        file.write("{")
+
+    assert memo.load("foo") is None
+
+
+class TestRevalidate:
+    def test_unchanged(self):
+        resolution = make_resolution()
+
+        assert revalidate(
+            resolution.validators, lambda url: make_response(etag='"foo"')
+        )
+
+    def test_changed(self):
+        resolution = make_resolution()
+
+        assert not revalidate(
+            resolution.validators, lambda url: make_response(etag='"bar"')
+        )
+
+    def test_not_found(self):
+        validators = {"https://download.pytorch.org/whl/cpu/foo/": {"status": "404"}}
+
+        assert revalidate(validators, lambda url: make_response(404))
+        assert not revalidate(validators, lambda url: make_response(etag='"foo"'))
+
+    def test_error(self):
+        def head(url):
+            raise OSError
+
+        assert not revalidate(make_resolution().validators, head)
+
+    def test_no_pages(self):
+        def head(url):
+            raise AssertionError
+
+        assert revalidate({}, head)
@@ -0,0 +1,83 @@
+import logging
+
+import pytest
+
+from light_the_torch import _memory as memory
+
+
+def allocate(size):
+    return bytearray(size)
+
+
+@pytest.fixture
+def profiler():
+    profiler = memory.MemoryProfiler(top_allocations=3)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+
+def test_phases(profiler):
+    size = 8 * 1024 * 1024
+
+    with profiler.phase("outer"):
+        with profiler.phase("inner"):
+            data = allocate(size)
+            del data
+        with profiler.phase("other"):
+            pass
+
+    stats = {stats.name: stats for stats in profiler.stats}
+    assert list(stats) == ["outer", "inner", "other"]
+    assert stats["inner"].peak >= size
+    assert stats["outer"].peak >= stats["inner"].peak
+    assert stats["other"].peak < size
+    assert stats["inner"].allocated < size
+
+
+def test_calls(profiler):
+    for _ in range(3):
+        with profiler.phase("phase"):
+            pass
+
+    (stats,) = profiler.stats
+    assert stats.calls == 3
+
+
+def test_allocation_sites(profiler):
+    size = 8 * 1024 * 1024
+
+    with profiler.phase("outer"):
+        data = allocate(size)
+
+    assert data
+    (statistic, *_) = profiler.allocation_sites["outer"]
+    assert statistic.size >= size
+    assert __file__ in profiler.allocation_sites_report()
+
+
+def test_summary(profiler):
+    with profiler.phase("detection"):
+        pass
+
+    summary = profiler.summary()
+
+    assert "Peak traced" in summary
+    assert "detection" in summary
+
+
+def test_profiling(caplog):
+    caplog.set_level(logging.INFO)
+
+    with memory.profiling():
+        with memory.phase("detection"):
+            pass
+
+    assert "detection" in caplog.text
+
+
+def test_phase_without_profiling():
+    with memory.phase("detection"):
+        pass
@@ -0,0 +1,64 @@
+import http.server
+import threading
+
+import pytest
+
+from light_the_torch import _network as network
+from pip._internal.network.session import CacheControlAdapter, HTTPAdapter
+from pip._vendor import requests
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ltt"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize(
+    ("secure_adapter", "adapter_type"),
+    [
+        pytest.param(HTTPAdapter(), network.PyTorchHTTPAdapter, id="http"),
+        pytest.param(
+            CacheControlAdapter(), network.PyTorchCacheControlAdapter, id="cache"
+        ),
+    ],
+)
+def test_make_pytorch_adapter(secure_adapter, adapter_type):
+    adapter = network.make_pytorch_adapter(secure_adapter, pool_size=3)
+
+    assert isinstance(adapter, adapter_type)
+    assert adapter._pool_maxsize == 3
+
+
+def test_connection_stats(server_url):
+    adapter = network.make_pytorch_adapter(HTTPAdapter(), pool_size=1)
+
+    with requests.Session() as session:
+        session.mount(server_url, adapter)
+        for _ in range(3):
+            session.get(server_url).raise_for_status()
+
+        stats = adapter.connection_stats()
+
+    assert stats == network.ConnectionStats(requests=3, connections=1)
+    assert stats.reused == 2
@@ -0,0 +1,940 @@
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from light_the_torch import _cb as cb, _patch
+from light_the_torch._delta import DeltaError
+from light_the_torch._link_index import LinkIndexStore
+from light_the_torch._locking import LockStore
+from light_the_torch._utils import apply_fn_patch
+from pip._internal.commands.install import InstallCommand
+from pip._internal.exceptions import InstallationError, NetworkConnectionError
+from pip._internal.index import collector
+from pip._internal.index.collector import IndexContent, LinkCollector
+from pip._internal.index.package_finder import (
+    CandidateEvaluator,
+    LinkType,
+    PackageFinder,
+)
+from pip._internal.models.format_control import FormatControl
+from pip._internal.models.link import Link
+from pip._internal.models.search_scope import SearchScope
+from pip._internal.models.target_python import TargetPython
+from pip._internal.network.cache import SafeFileCache
+from pip._internal.network.download import Downloader
+from pip._internal.resolution.resolvelib.resolver import Resolver
+from pip._vendor.cachecontrol.controller import CacheController
+from pip._vendor.packaging.requirements import Requirement
+from pip._vendor.packaging.specifiers import SpecifierSet
+from pip._vendor.packaging.version import Version
+from pip._vendor.resolvelib import ResolutionImpossible
+
+
+def make_candidate(
+    name, version, *, index_url="https://pypi.org/simple", is_wheel=True
+):
+    filename = (
+        f"{name}-{version}-py3-none-any.whl" if is_wheel else f"{name}-{version}.tar.gz"
+    )
+    return SimpleNamespace(
+        name=name,
+        version=Version(version),
+        link=SimpleNamespace(
+            comes_from=f"{index_url}/{name}/",
+            url=f"{index_url}/{filename}",
+            filename=filename,
+            is_wheel=is_wheel,
+            is_yanked=False,
+        ),
+    )
+
+
+def pytorch_index_url(computation_backend):
+    return f"https://download.pytorch.org/whl/{computation_backend}"
+
+
+@pytest.fixture
+def vanilla_candidate_selection(mocker):
+    mocker.patch.object(
+        CandidateEvaluator,
+        "get_applicable_candidates",
+        lambda self, candidates: candidates,
+    )
+
+
+def get_applicable_candidates(candidates):
+    return CandidateEvaluator.get_applicable_candidates(None, candidates)
+
+
+class TestCandidateSelection:
+    def test_computation_backend_filtering(self, vanilla_candidate_selection):
+        candidates = [
+            make_candidate("torch", "2.1.0+cpu"),
+            make_candidate("torch", "2.1.0+cu118"),
+            make_candidate("torch", "2.1.0+cu121"),
+        ]
+
+        with _patch.patch_candidate_selection({cb.CUDABackend(12, 1)}):
+            applicable = get_applicable_candidates(candidates)
+
+        assert applicable == [candidates[-1]]
+
+    def test_non_pytorch_distribution(self, vanilla_candidate_selection):
+        candidates = [make_candidate("numpy", "1.26.0")]
+
+        with _patch.patch_candidate_selection({cb.CUDABackend(12, 1)}):
+            applicable = get_applicable_candidates(candidates)
+
+        assert applicable == candidates
+
+    @pytest.mark.parametrize("allow_backend_agnostic", [True, False])
+    def test_backend_agnostic(
+        self, vanilla_candidate_selection, allow_backend_agnostic
+    ):
+        candidates = [make_candidate("torchserve", "0.9.0")]
+
+        with _patch.patch_candidate_selection(
+            {cb.CUDABackend(12, 1)}, allow_backend_agnostic=allow_backend_agnostic
+        ):
+            applicable = get_applicable_candidates(candidates)
+
+        assert bool(applicable) is allow_backend_agnostic
+
+    def test_concurrent(self, vanilla_candidate_selection):
+        candidates = [
+            make_candidate("torch", "2.1.0+cpu"),
+            make_candidate("torch", "2.1.0+cu121"),
+        ]
+        barrier = threading.Barrier(2)
+        applicable = {}
+
+        def select(computation_backend):
+            with _patch.patch_candidate_selection({computation_backend}):
+                # Both selections are patched at the same time.
+                barrier.wait()
+                applicable[computation_backend] = get_applicable_candidates(candidates)
+                barrier.wait()
+
+        computation_backends = [cb.CPUBackend(), cb.CUDABackend(12, 1)]
+        threads = [
+            threading.Thread(target=select, args=(computation_backend,))
+            for computation_backend in computation_backends
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert applicable == {
+            computation_backend: [candidate]
+            for computation_backend, candidate in zip(computation_backends, candidates)
+        }
+
+
+def test_incompatible_candidate_removal(vanilla_candidate_selection):
+    candidates = [
+        make_candidate("torchvision", "0.15.2+cu118"),
+        make_candidate("torchvision", "0.16.0+cu118"),
+    ]
+
+    with _patch.patch_incompatible_candidate_removal([SpecifierSet("==2.1.0")]):
+        applicable = get_applicable_candidates(candidates)
+
+    assert applicable == [candidates[-1]]
+
+
+class TestCacheAwareCandidateSelection:
+    @pytest.fixture
+    def candidates(self):
+        index_url = pytorch_index_url("cu121")
+        return [
+            make_candidate("torch", "2.1.1+cu121", index_url=index_url),
+            make_candidate("torch", "2.2.0.dev20231010+cu121", index_url=index_url),
+            make_candidate("torch", "2.2.0.dev20231011+cu121", index_url=index_url),
+        ]
+
+    @pytest.fixture
+    def sorted_candidate_selection(self, mocker):
+        mocker.patch.object(
+            CandidateEvaluator,
+            "get_applicable_candidates",
+            lambda self, candidates: sorted(
+                candidates,
+                key=lambda candidate: CandidateEvaluator._sort_key(self, candidate),
+            ),
+        )
+
+    def cache(self, cache_dir, candidate):
+        key = CacheController.cache_url(candidate.link.url)
+        SafeFileCache(str(cache_dir / "http")).set(key, b"")
+
+    def get_applicable_candidates(self, mocker, cache_dir, candidates):
+        mocker.patch.object(
+            InstallCommand,
+            "run",
+            lambda self, options, args: get_applicable_candidates(candidates),
+        )
+
+        with _patch.patch_candidate_selection({cb.CUDABackend(12, 1)}):
+            with _patch.patch_cache_aware_candidate_selection():
+                return InstallCommand.run(
+                    None, SimpleNamespace(cache_dir=cache_dir), []
+                )
+
+    def test_prefer_cached(
+        self, tmp_path, mocker, sorted_candidate_selection, candidates
+    ):
+        self.cache(tmp_path, candidates[1])
+
+        applicable = self.get_applicable_candidates(mocker, str(tmp_path), candidates)
+
+        assert applicable == [candidates[0], candidates[2], candidates[1]]
+
+    def test_newer_uncached(self, tmp_path, mocker, sorted_candidate_selection):
+        index_url = pytorch_index_url("cu121")
+        candidates = [
+            make_candidate("torch", "2.1.1+cu121", index_url=index_url),
+            make_candidate("torch", "2.1.2+cu121", index_url=index_url),
+        ]
+        self.cache(tmp_path, candidates[0])
+
+        applicable = self.get_applicable_candidates(mocker, str(tmp_path), candidates)
+
+        assert applicable == candidates
+
+    def test_cache_disabled(self, mocker, sorted_candidate_selection, candidates):
+        applicable = self.get_applicable_candidates(mocker, False, candidates)
+
+        assert applicable == candidates
+
+
+def test_cache_locking(tmp_path, mocker):
+    url = "https://download.pytorch.org/whl/cu121/torch/"
+    lock_path = LockStore(str(tmp_path / "ltt" / "locks")).path(url)
+
+    def get_index_content(link, *, session):
+        return os.path.exists(lock_path)
+
+    mocker.patch(
+        "pip._internal.index.collector._get_index_content", new=get_index_content
+    )
+    mocker.patch.object(
+        InstallCommand,
+        "run",
+        lambda self, options, args: collector._get_index_content(
+            Link(url), session=None
+        ),
+    )
+
+    with _patch.patch_cache_locking():
+        locked = InstallCommand.run(None, SimpleNamespace(cache_dir=str(tmp_path)), [])
+
+    assert locked
+    assert not os.path.exists(lock_path)
+
+
+def test_link_collection_third_party_package(mocker):
+    mocker.patch.object(
+        LinkCollector,
+        "collect_sources",
+        lambda self, project_name, candidates_from_page: self.search_scope,
+    )
+    link_collector = SimpleNamespace(search_scope=SearchScope([], [], False))
+
+    with _patch.patch_link_collection(
+        {cb.CPUBackend()},
+        _patch.Channel.STABLE,
+        _patch.get_user_supplied_pinned_packages([]),
+    ):
+        search_scope = LinkCollector.collect_sources(
+            link_collector, "filelock", candidates_from_page=None
+        )
+
+    assert search_scope.index_urls == [pytorch_index_url("cpu")]
+
+
+class TestBinaryOnly:
+    @pytest.fixture
+    def source_distribution_exclusion(self, vanilla_candidate_selection):
+        return _patch.patch_source_distribution_exclusion(
+            lambda project_name: project_name in _patch.PYTORCH_DISTRIBUTIONS,
+            {cb.CPUBackend()},
+        )
+
+    def test_sdist_exclusion(self, source_distribution_exclusion):
+        candidates = [
+            make_candidate("torch", "2.1.0+cpu"),
+            make_candidate("torch", "2.2.0", is_wheel=False),
+        ]
+
+        with source_distribution_exclusion:
+            applicable = get_applicable_candidates(candidates)
+
+        assert applicable == candidates[:1]
+
+    def test_non_pytorch_distribution(self, source_distribution_exclusion):
+        candidates = [make_candidate("numpy", "1.26.0", is_wheel=False)]
+
+        with source_distribution_exclusion:
+            applicable = get_applicable_candidates(candidates)
+
+        assert applicable == candidates
+
+    @pytest.fixture
+    def resolve(self, mocker, vanilla_candidate_selection):
+        def resolve(candidates, *, no_binary=()):
+            mocker.patch.object(
+                Resolver,
+                "resolve",
+                lambda self, root_reqs, check_supported_wheels: (
+                    get_applicable_candidates(candidates)
+                ),
+            )
+            resolver = SimpleNamespace(
+                factory=SimpleNamespace(
+                    _finder=SimpleNamespace(
+                        format_control=FormatControl(no_binary=set(no_binary))
+                    )
+                )
+            )
+            with _patch.patch_binary_only({cb.CPUBackend()}):
+                return Resolver.resolve(resolver, [], True)
+
+        return resolve
+
+    @pytest.mark.parametrize(
+        "candidates",
+        [
+            pytest.param([make_candidate("filelock", "3.13.1")], id="wheel"),
+            pytest.param([make_candidate("lit", "15.0.7", is_wheel=False)], id="sdist"),
+        ],
+    )
+    def test_third_party_package(self, resolve, candidates):
+        assert resolve(candidates) == candidates
+
+    def test_pytorch_distribution(self, resolve):
+        candidates = [
+            make_candidate("torch", "2.1.0+cpu"),
+            make_candidate("torch", "2.2.0", is_wheel=False),
+        ]
+
+        assert resolve(candidates) == candidates[:1]
+
+    def test_no_binary(self, resolve):
+        candidates = [make_candidate("torch", "2.2.0", is_wheel=False)]
+
+        assert resolve(candidates, no_binary={"torch"}) == candidates
+
+    def test_no_matching_binary(self, mocker, source_distribution_exclusion):
+        candidates = [make_candidate("torchcsprng", "0.3.0", is_wheel=False)]
+        link = Link(
+            f"{pytorch_index_url('cu118')}/"
+            "torchcsprng-0.3.0%2Bcu118-cp310-cp310-linux_x86_64.whl"
+        )
+        finder = SimpleNamespace(
+            _logged_links={(link, LinkType.platform_mismatch, "incompatible tags")},
+            target_python=TargetPython(),
+        )
+
+        mocker.patch.object(
+            PackageFinder,
+            "find_best_candidate",
+            lambda self, project_name, specifier=None, hashes=None: (
+                get_applicable_candidates(candidates)
+            ),
+        )
+
+        with source_distribution_exclusion:
+            with pytest.raises(_patch.NoMatchingBinaryError) as info:
+                PackageFinder.find_best_candidate(finder, "torchcsprng")
+
+        report = str(info.value)
+        assert "No binary of torchcsprng" in report
+        assert "Requested computation backends: cpu" in report
+        assert "would have been built: 0.3.0" in report
+        assert (
+            "torchcsprng-0.3.0+cu118-cp310-cp310-linux_x86_64.whl: incompatible tags"
+            in report
+        )
+
+
+class TestResolutionMemo:
+    @pytest.fixture
+    def resolve(self, mocker):
+        page_url = f"{pytorch_index_url('cpu')}/torch/"
+        pages = {page_url: SimpleNamespace(status_code=200, headers={"etag": '"foo"'})}
+        heads = []
+        finder = SimpleNamespace(
+            target_python=TargetPython(),
+            index_urls=[pytorch_index_url("cpu")],
+            find_links=[],
+            allow_all_prereleases=False,
+            prefer_binary=False,
+            format_control=SimpleNamespace(no_binary=set(), only_binary=set()),
+            find_best_candidate=lambda project_name, specifier: SimpleNamespace(
+                best_candidate=SimpleNamespace(
+                    version=Version("2.1.0+cpu"),
+                    link=Link(
+                        f"{pytorch_index_url('cpu')}/"
+                        "torch-2.1.0%2Bcpu-cp311-cp311-linux_x86_64.whl#sha256=foo",
+                        comes_from=page_url,
+                        requires_python=">=3.8",
+                    ),
+                )
+            ),
+            _link_collector=SimpleNamespace(
+                session=SimpleNamespace(
+                    head=lambda url, **kwargs: heads.append(url) or pages[url]
+                )
+            ),
+        )
+        resolver = SimpleNamespace(
+            factory=SimpleNamespace(
+                _finder=finder,
+                _force_reinstall=False,
+                _ignore_requires_python=False,
+                _installed_dists={},
+            ),
+            upgrade_strategy="to-satisfy-only",
+            ignore_dependencies=False,
+        )
+
+        def get_simple_response(url, session):
+            response = pages[url]
+            if response.status_code >= 400:
+                raise NetworkConnectionError("", response=response)
+            return response
+
+        def find_all_candidates(self, project_name):
+            # pip skips the pages that could not be fetched.
+            for url in pages:
+                try:
+                    collector._get_simple_response(url, None)
+                except NetworkConnectionError:
+                    pass
+            return []
+
+        mocker.patch(
+            "pip._internal.index.collector._get_simple_response", get_simple_response
+        )
+        mocker.patch.object(PackageFinder, "find_all_candidates", find_all_candidates)
+
+        def vanilla_resolve(self, root_reqs, check_supported_wheels):
+            candidates = PackageFinder.find_all_candidates(finder, "torch")
+            self._result = SimpleNamespace(
+                mapping={
+                    "torch": SimpleNamespace(
+                        project_name="torch", version=Version("2.1.0+cpu")
+                    )
+                }
+            )
+            return candidates
+
+        mocker.patch.object(Resolver, "resolve", vanilla_resolve)
+
+        def resolve(cache_dir, **resolution_options):
+            with _patch.patch_resolution_memo(
+                {cb.CPUBackend()},
+                _patch.Channel.STABLE,
+                resolution_options=resolution_options,
+            ):
+                InstallCommand.run(None, SimpleNamespace(cache_dir=cache_dir), [])
+                return Resolver.resolve(resolver, [], True)
+
+        mocker.patch.object(InstallCommand, "run", lambda self, options, args: None)
+        resolve.heads = heads
+        resolve.pages = pages
+        resolve.page_url = page_url
+        return resolve
+
+    def test_replay(self, tmp_path, resolve):
+        assert resolve(str(tmp_path)) == []
+        assert not resolve.heads
+
+        candidates = resolve(str(tmp_path))
+
+        assert resolve.heads == [resolve.page_url]
+        assert [str(candidate.version) for candidate in candidates] == ["2.1.0+cpu"]
+        assert candidates[0].link.comes_from == resolve.page_url
+        assert candidates[0].link.hash == "foo"
+        assert candidates[0].link.requires_python == ">=3.8"
+
+    @pytest.mark.parametrize(("status_code", "memoized"), [(404, True), (500, False)])
+    def test_unavailable_page(self, tmp_path, resolve, status_code, memoized):
+        url = f"{pytorch_index_url('cu121')}/torch/"
+        resolve.pages[url] = SimpleNamespace(status_code=status_code, headers={})
+
+        assert resolve(str(tmp_path)) == []
+        candidates = resolve(str(tmp_path))
+
+        if memoized:
+            assert set(resolve.heads) == {resolve.page_url, url}
+            assert [str(candidate.version) for candidate in candidates] == ["2.1.0+cpu"]
+        else:
+            assert not resolve.heads
+            assert candidates == []
+
+    def test_resolution_options(self, tmp_path, resolve):
+        assert resolve(str(tmp_path), allow_source_builds=False) == []
+
+        # A different value of an option that changes the result is not a hit.
+        assert resolve(str(tmp_path), allow_source_builds=True) == []
+        assert not resolve.heads
+
+        resolve(str(tmp_path), allow_source_builds=True)
+        assert resolve.heads == [resolve.page_url]
+
+    def test_no_cache(self, resolve):
+        assert resolve(False) == []
+        assert resolve(False) == []
+        assert not resolve.heads
+
+
+class TestNightlyDeltaDownloads:
+    @pytest.fixture
+    def download(self, mocker, tmp_path):
+        downloaded = []
+
+        def vanilla_call(self, link, location):
+            downloaded.append(link.filename)
+            path = os.path.join(location, link.filename)
+            with open(path, "w") as file:
+                file.write(link.filename)
+            return path, ""
+
+        mocker.patch.object(Downloader, "__call__", vanilla_call)
+        mocker.patch.object(InstallCommand, "run", lambda self, options, args: None)
+
+        def download(filename, *, cache_dir=str(tmp_path / "cache")):
+            location = tmp_path / "download"
+            location.mkdir(exist_ok=True)
+            link = Link(
+                f"https://download.pytorch.org/whl/nightly/cu121/{filename}"
+                f"#sha256={'0' * 64}"
+            )
+            with _patch.patch_nightly_delta_downloads():
+                InstallCommand.run(None, SimpleNamespace(cache_dir=cache_dir), [])
+                return Downloader(None, "off")(link, str(location))
+
+        download.downloaded = downloaded
+        return download
+
+    def test_delta(self, mocker, download):
+        def delta_fetch(session, url, base_path, dest_path, **kwargs):
+            with open(dest_path, "w") as file:
+                file.write(os.path.basename(dest_path))
+            return SimpleNamespace(size=2, downloaded=1, members=2, reused=1), ""
+
+        fetch = mocker.patch("light_the_torch._delta.fetch", side_effect=delta_fetch)
+
+        download("torch-2.3.0.dev20240101+cu121-cp311-cp311-linux_x86_64.whl")
+        fetch.assert_not_called()
+
+        filename = "torch-2.3.0.dev20240102+cu121-cp311-cp311-linux_x86_64.whl"
+        path, _ = download(filename)
+
+        fetch.assert_called_once()
+        _, _, base_path, dest_path = fetch.call_args.args
+        assert dest_path == path
+        # The base is replaced by the new wheel for the next run.
+        with open(base_path) as file:
+            assert file.read() == filename
+        assert download.downloaded == [
+            "torch-2.3.0.dev20240101+cu121-cp311-cp311-linux_x86_64.whl"
+        ]
+
+    def test_fallback(self, mocker, download):
+        mocker.patch("light_the_torch._delta.fetch", side_effect=DeltaError)
+
+        download("torch-2.3.0.dev20240101+cu121-cp311-cp311-linux_x86_64.whl")
+        download("torch-2.3.0.dev20240102+cu121-cp311-cp311-linux_x86_64.whl")
+
+        assert len(download.downloaded) == 2
+
+    def test_no_cache(self, mocker, download):
+        fetch = mocker.patch("light_the_torch._delta.fetch")
+
+        for date in ["20240101", "20240102"]:
+            download(
+                f"torch-2.3.0.dev{date}+cu121-cp311-cp311-linux_x86_64.whl",
+                cache_dir=False,
+            )
+
+        fetch.assert_not_called()
+        assert len(download.downloaded) == 2
+
+
+class TestConcurrentLinkCollection:
+    @pytest.fixture
+    def fetched(self, mocker):
+        fetched = {}
+
+        def get_index_content(link, *, session):
+            fetched.setdefault(link.url, threading.Event()).set()
+            return link.url
+
+        mocker.patch(
+            "pip._internal.index.collector._get_index_content",
+            new=get_index_content,
+        )
+        return fetched
+
+    def test_prefetch(self, fetched):
+        search_scope = SearchScope(
+            find_links=[], index_urls=["https://pypi.org/simple"], no_index=False
+        )
+        link_collector = LinkCollector(
+            session=SimpleNamespace(is_secure_origin=lambda link: True),
+            search_scope=search_scope,
+        )
+        urls = {
+            project_name: f"https://pypi.org/simple/{project_name}/"
+            for project_name in ["foo", "bar"]
+        }
+        for url in urls.values():
+            fetched[url] = threading.Event()
+
+        with _patch.patch_concurrent_link_collection(
+            ["bar"],
+            concurrency=2,
+            search_scope=lambda link_collector, project_name: search_scope,
+            fallback_search_scope=lambda project_name: None,
+        ):
+            link_collector.collect_sources("foo", candidates_from_page=None)
+
+            # The page of the root requirement is fetched before pip asks for it.
+            assert fetched[urls["bar"]].wait(5)
+
+            for url in urls.values():
+                assert link_collector.fetch_response(Link(url)) == url
+
+
+class TestBackendConsistentResolution:
+    @pytest.fixture
+    def resolve(self, mocker, vanilla_candidate_selection):
+        candidates = [
+            make_candidate("torch", "2.1.0+cu118"),
+            make_candidate("torch", "2.1.0+cu121"),
+            make_candidate("torchvision", "0.16.0+cu118"),
+        ]
+
+        def resolve(self, root_reqs, check_supported_wheels):
+            applicable = get_applicable_candidates(candidates)
+            names = {candidate.name for candidate in applicable}
+            if names != {"torch", "torchvision"}:
+                try:
+                    raise ResolutionImpossible([])
+                except ResolutionImpossible as error:
+                    raise InstallationError("resolution impossible") from error
+
+            return applicable
+
+        return mocker.patch.object(Resolver, "resolve", side_effect=resolve)
+
+    def test_fallback(self, resolve):
+        computation_backends = {cb.CUDABackend(11, 8), cb.CUDABackend(12, 1)}
+
+        with _patch.patch_backend_consistent_resolution(computation_backends):
+            result = Resolver.resolve(None, [], False)
+
+        assert resolve.call_count == 2
+        assert {str(candidate.version) for candidate in result} == {
+            "2.1.0+cu118",
+            "0.16.0+cu118",
+        }
+
+    def test_no_fallback(self, resolve):
+        with _patch.patch_backend_consistent_resolution({cb.CUDABackend(12, 1)}):
+            with pytest.raises(InstallationError, match="resolution impossible"):
+                Resolver.resolve(None, [], False)
+
+    def test_best_candidate_cache(self, mocker):
+        class Finder:
+            def __init__(self):
+                self.evaluations = 0
+
+            def find_all_candidates(self, project_name):
+                return []
+
+            def make_candidate_evaluator(self, project_name, specifier, hashes):
+                self.evaluations += 1
+                return SimpleNamespace(
+                    compute_best_candidate=lambda candidates: self.evaluations
+                )
+
+        # Simulates a concurrent invocation that has already cached its result.
+        other_finder = Finder()
+        PackageFinder.find_best_candidate(other_finder, "torch")
+
+        finder = Finder()
+        results = []
+
+        def resolve(self, root_reqs, check_supported_wheels):
+            results.extend(
+                PackageFinder.find_best_candidate(finder, "torch") for _ in range(2)
+            )
+            if len(results) < 4:
+                try:
+                    raise ResolutionImpossible([])
+                except ResolutionImpossible as error:
+                    raise InstallationError("resolution impossible") from error
+
+        mocker.patch.object(Resolver, "resolve", side_effect=resolve)
+
+        # Other patches of find_best_candidate still need to be applied.
+        calls = []
+        other_patch = apply_fn_patch(
+            "pip",
+            "_internal",
+            "index",
+            "package_finder",
+            "PackageFinder",
+            "find_best_candidate",
+            postprocessing=lambda input, output: calls.append(output) or output,
+        )
+
+        try:
+            with (
+                other_patch,
+                _patch.patch_backend_consistent_resolution(
+                    {cb.CUDABackend(11, 8), cb.CUDABackend(12, 1)}
+                ),
+            ):
+                Resolver.resolve(None, [], False)
+
+            # The candidates are computed once per attempt.
+            assert results == [1, 1, 2, 2]
+            assert calls == results
+            # The cache of the other invocation is left untouched.
+            assert PackageFinder.find_best_candidate(other_finder, "torch") == 1
+            assert other_finder.evaluations == 1
+        finally:
+            PackageFinder.find_best_candidate.cache_clear()
+
+
+def process_project_url(content, *, project_name="torch", url, target_python=None):
+    page = IndexContent(
+        content,
+        "text/html",
+        encoding="utf-8",
+        url=url,
+    )
+    finder = SimpleNamespace(
+        _link_collector=SimpleNamespace(fetch_response=lambda location: page),
+        evaluate_links=lambda link_evaluator, links: links,
+    )
+    return PackageFinder.process_project_url(
+        finder,
+        Link(url),
+        link_evaluator=SimpleNamespace(
+            project_name=project_name, _target_python=target_python
+        ),
+    )
+
+
+def make_index_content(*filenames):
+    return "\n".join(
+        f'<a href="{filename}">{filename}</a>' for filename in filenames
+    ).encode()
+
+
+class TestLinkParsing:
+    def test_filter(self):
+        content = make_index_content(
+            "torch-2.0.1%2Bcu118-cp311-cp311-linux_x86_64.whl",
+            "torch-2.1.0%2Bcu118-cp311-cp311-linux_x86_64.whl",
+            "torch-2.1.0.tar.gz",
+        )
+
+        def make_version_filter(project_name, page):
+            assert project_name == "torch"
+            return lambda version: version.startswith("2.1")
+
+        with _patch.patch_link_parsing(make_version_filter):
+            links = process_project_url(
+                content, url="https://download.pytorch.org/whl/cu118/torch/"
+            )
+
+        assert [link.filename for link in links] == [
+            "torch-2.1.0+cu118-cp311-cp311-linux_x86_64.whl",
+            "torch-2.1.0.tar.gz",
+        ]
+
+    def test_link_index(self, tmp_path):
+        content = make_index_content(
+            "torch-2.1.0%2Bcu121-cp310-cp310-linux_x86_64.whl",
+            "torch-2.1.0%2Bcu121-cp311-cp311-linux_x86_64.whl",
+        )
+        store = LinkIndexStore(str(tmp_path))
+
+        def open_link_index(page, parse_links):
+            return store.open(page.url, page.content, lambda: parse_links(page))
+
+        with _patch.patch_link_parsing(
+            lambda project_name, page: None, open_link_index=open_link_index
+        ):
+            links = process_project_url(
+                content,
+                url="https://download.pytorch.org/whl/cu121/torch/",
+                target_python=TargetPython(
+                    py_version_info=(3, 11),
+                    platforms=["linux_x86_64"],
+                    abis=["cp311"],
+                    implementation="cp",
+                ),
+            )
+        store.close()
+
+        assert [link.filename for link in links] == [
+            "torch-2.1.0+cu121-cp311-cp311-linux_x86_64.whl",
+        ]
+
+    def test_link_index_specifier_pruning(self, tmp_path, mocker):
+        content = make_index_content(
+            "torch-2.1.0%2Bcpu-cp311-cp311-linux_x86_64.whl",
+            "torch-2.2.0%2Bcpu-cp311-cp311-linux_x86_64.whl",
+        )
+        mocker.patch.object(InstallCommand, "run", lambda self, options, args: None)
+
+        def versions(user_specifiers):
+            with _patch.patch_link_index():
+                InstallCommand.run(None, SimpleNamespace(cache_dir=str(tmp_path)), [])
+                with _patch.patch_specifier_link_pruning(user_specifiers):
+                    links = process_project_url(
+                        content,
+                        url="https://download.pytorch.org/whl/cpu/torch/",
+                        target_python=TargetPython(
+                            py_version_info=(3, 11),
+                            platforms=["linux_x86_64"],
+                            abis=["cp311"],
+                            implementation="cp",
+                        ),
+                    )
+            return [link.filename.split("-")[1] for link in links]
+
+        # The index compiled during the pinned run must not be limited to the pinned
+        # version.
+        assert versions({"torch": SpecifierSet("==2.1.0")}) == ["2.1.0+cpu"]
+        assert versions({}) == ["2.1.0+cpu", "2.2.0+cpu"]
+
+    def test_no_filter(self):
+        content = make_index_content(
+            "torch-2.0.1%2Bcu118-cp311-cp311-linux_x86_64.whl",
+        )
+
+        with _patch.patch_link_parsing(lambda project_name, page: None):
+            links = process_project_url(
+                content, url="https://download.pytorch.org/whl/cu118/torch/"
+            )
+
+        assert len(links) == 1
+
+    def test_specifier_pruning(self):
+        content = make_index_content(
+            "torch-2.0.1%2Bcu118-cp311-cp311-linux_x86_64.whl",
+            "torch-2.1.0%2Bcu118-cp310-cp310-linux_x86_64.whl",
+            "torch-2.1.0%2Bcu118-cp311-cp311-linux_x86_64.whl",
+        )
+
+        with _patch.patch_specifier_link_pruning({"torch": SpecifierSet("==2.1.0")}):
+            links = process_project_url(
+                content, url="https://download.pytorch.org/whl/cu118/torch/"
+            )
+
+        assert {link.filename.split("-")[1] for link in links} == {"2.1.0+cu118"}
+        assert len(links) == 2
+
+    def test_nightly_pruning(self):
+        content = make_index_content(
+            "torch-2.2.0.dev20231001%2Bcu121-cp311-cp311-linux_x86_64.whl",
+            "torch-2.2.0.dev20231010%2Bcu121-cp311-cp311-linux_x86_64.whl",
+        )
+
+        with _patch.patch_nightly_link_pruning(None, 1):
+            links = process_project_url(
+                content, url="https://download.pytorch.org/whl/nightly/cu121/torch/"
+            )
+
+        assert [link.filename for link in links] == [
+            "torch-2.2.0.dev20231010+cu121-cp311-cp311-linux_x86_64.whl"
+        ]
+
+
+def test_get_user_specifiers():
+    def make_requirement(string, *, user_supplied=True):
+        req = Requirement(string)
+        return SimpleNamespace(
+            name=req.name,
+            req=req,
+            user_supplied=user_supplied,
+            match_markers=lambda: req.marker is None or req.marker.evaluate(),
+        )
+
+    user_specifiers = _patch.get_user_specifiers(
+        [
+            make_requirement("Torch>=2"),
+            make_requirement("torch<2.2"),
+            make_requirement("torchvision==0.16.0", user_supplied=False),
+            make_requirement("torchaudio==0.13.1; python_version<'3.8'"),
+            make_requirement("torchaudio==2.1.0; python_version>='3.8'"),
+        ]
+    )
+
+    assert user_specifiers == {
+        "torch": SpecifierSet(">=2,<2.2"),
+        "torchaudio": SpecifierSet("==2.1.0"),
+    }
+
+
+class TestTracing:
+    def test_candidate_selection(self, tmp_path, vanilla_candidate_selection):
+        path = tmp_path / "trace.json"
+        candidates = [
+            make_candidate("torch", "2.1.0+cu118"),
+            make_candidate("torch", "2.1.0+cu121"),
+        ]
+
+        with _patch.patch_candidate_selection({cb.CUDABackend(12, 1)}):
+            with _patch.patch_tracing(str(path)):
+                get_applicable_candidates(candidates)
+
+        with open(path) as file:
+            (event,) = json.load(file)["traceEvents"]
+
+        assert event["name"] == "CandidateEvaluator.get_applicable_candidates"
+        assert event["args"] == dict(
+            candidates=2,
+            candidates_before_backend_filtering=2,
+            candidates_after_backend_filtering=1,
+            applicable=1,
+        )
+
+    def test_backend_consistent_resolution(
+        self, tmp_path, mocker, vanilla_candidate_selection
+    ):
+        path = tmp_path / "trace.json"
+        candidates = [make_candidate("torch", "2.1.0+cu118")]
+        mocker.patch.object(
+            Resolver,
+            "resolve",
+            lambda self, root_reqs, check_supported_wheels: get_applicable_candidates(
+                candidates
+            ),
+        )
+
+        with _patch.patch_backend_consistent_resolution({cb.CUDABackend(11, 8)}):
+            with _patch.patch_tracing(str(path)):
+                Resolver.resolve(None, [], False)
+
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+
+        assert [event["name"] for event in events] == [
+            "Resolver.resolve",
+            "resolution attempt",
+            "CandidateEvaluator.get_applicable_candidates",
+        ]
+        assert events[-1]["args"]["candidates_after_backend_filtering"] == 1
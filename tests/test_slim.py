@@ -0,0 +1,51 @@
+import zipfile
+
+import pytest
+
+from light_the_torch._slim import is_excluded, parse_patterns, SlimZipFile
+
+
+def test_parse_patterns():
+    assert parse_patterns(" torch/include/*, torch/lib/*.a,") == [
+        "torch/include/*",
+        "torch/lib/*.a",
+    ]
+
+
+def test_parse_patterns_empty():
+    with pytest.raises(ValueError):
+        parse_patterns(" , ")
+
+
+@pytest.mark.parametrize(
+    ("record_path", "expected"),
+    [
+        ("torch/include/ATen/ATen.h", True),
+        ("torch/lib/libtorch.a", True),
+        ("torch/lib/libtorch.so", False),
+        ("torch-2.1.0.dist-info/RECORD", False),
+        ("torch-2.1.0.dist-info/licenses/include/LICENSE", False),
+    ],
+)
+def test_is_excluded(record_path, expected):
+    patterns = ["torch/include/*", "*.a", "*/include/*"]
+
+    assert is_excluded(record_path, patterns) is expected
+
+
+def test_slim_zip_file(tmp_path):
+    path = tmp_path / "torch.whl"
+    with zipfile.ZipFile(path, "w") as file:
+        file.writestr("torch/__init__.py", "")
+        file.writestr("torch/include/torch.h", "")
+
+    with zipfile.ZipFile(path) as file:
+        slim_file = SlimZipFile(file, ["torch/include/*"])
+
+        assert slim_file.namelist() == ["torch/__init__.py"]
+        assert [info.filename for info in slim_file.infolist()] == ["torch/__init__.py"]
+        assert [info.filename for info in slim_file.excluded] == [
+            "torch/include/torch.h"
+        ]
+        assert slim_file.filename == str(path)
+        assert slim_file.read("torch/include/torch.h") == b""
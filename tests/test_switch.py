@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import pytest
+
+from light_the_torch import _cb as cb, _commands as commands, _patch, _switch as switch
+from light_the_torch._cli import main
+from pip._vendor.packaging.requirements import Requirement
+from pip._vendor.packaging.version import Version
+
+
+def make_distribution(name, version, *, requires=()):
+    return SimpleNamespace(
+        canonical_name=name,
+        version=Version(version),
+        iter_dependencies=lambda: [Requirement(string) for string in requires],
+    )
+
+
+@pytest.fixture
+def distributions():
+    return [
+        make_distribution(
+            "torch", "2.0.1+cu118", requires=["nvidia-cublas-cu11", "filelock"]
+        ),
+        make_distribution("torchvision", "0.15.2+cu118", requires=["torch"]),
+        make_distribution("torchdata", "0.6.1", requires=["torch"]),
+        make_distribution("nvidia-cublas-cu11", "11.10.3.66"),
+        make_distribution("filelock", "3.12.0"),
+    ]
+
+
+def test_plan_backend_switch(distributions):
+    requirements = switch.plan_backend_switch(distributions, cb.CUDABackend(12, 1))
+
+    assert requirements == ["torch==2.0.1+cu121", "torchvision==0.15.2+cu121"]
+
+
+@pytest.mark.parametrize(
+    ("version", "requirement", "channel"),
+    [
+        pytest.param("2.1.0+cu118", "torch==2.1.0+cu121", "stable", id="stable"),
+        pytest.param("2.1.0rc1+cu118", "torch==2.1.0rc1+cu121", "test", id="test"),
+        pytest.param(
+            "2.2.0.dev20231010+cpu",
+            "torch==2.2.0.dev20231010+cu121",
+            "nightly",
+            id="nightly",
+        ),
+    ],
+)
+def test_plan_backend_switch_channel(version, requirement, channel):
+    distributions = [make_distribution("torch", version)]
+    computation_backend = cb.CUDABackend(12, 1)
+
+    assert switch.plan_backend_switch(distributions, computation_backend) == [
+        requirement
+    ]
+    assert switch.installed_channel(
+        distributions, computation_backend
+    ) == _patch.Channel.from_str(channel)
+
+
+def test_plan_backend_switch_noop(distributions):
+    assert not switch.plan_backend_switch(distributions, cb.CUDABackend(11, 8))
+
+
+def test_obsolete_distributions():
+    distributions = [
+        make_distribution("torch", "2.1.0+cu121", requires=["nvidia_cublas_cu12"]),
+        make_distribution("nvidia-cublas-cu11", "11.10.3.66"),
+        make_distribution("nvidia-cublas-cu12", "12.1.3.1"),
+    ]
+
+    obsolete = switch.obsolete_distributions(
+        {"nvidia-cublas-cu11", "nvidia-cuda-runtime-cu11"}, distributions
+    )
+
+    assert obsolete == ["nvidia-cublas-cu11"]
+
+
+def test_switch_backend_command(mocker, distributions):
+    environments = iter(
+        [
+            distributions,
+            [
+                make_distribution(
+                    "torch", "2.0.1+cu121", requires=["nvidia-cublas-cu12"]
+                ),
+                *distributions[1:],
+                make_distribution("nvidia-cublas-cu12", "12.1.3.1"),
+            ],
+        ]
+    )
+    mocker.patch.object(
+        commands,
+        "get_default_environment",
+        lambda: SimpleNamespace(
+            iter_installed_distributions=lambda **kwargs: next(environments)
+        ),
+    )
+    call = mocker.patch.object(commands.subprocess, "call", return_value=0)
+
+    assert main(["switch-backend", "--pytorch-computation-backend=cu121"]) == 0
+
+    install_call, uninstall_call = [args for args, _ in call.call_args_list]
+    assert install_call[0][3:] == [
+        "install",
+        "--pytorch-computation-backend=cu121",
+        "torch==2.0.1+cu121",
+        "torchvision==0.15.2+cu121",
+    ]
+    assert uninstall_call[0][3:] == ["uninstall", "-y", "nvidia-cublas-cu11"]
+
+
+def test_switch_backend_command_dry_run(mocker, distributions):
+    mocker.patch.object(
+        commands,
+        "get_default_environment",
+        lambda: SimpleNamespace(
+            iter_installed_distributions=lambda **kwargs: distributions
+        ),
+    )
+    call = mocker.patch.object(commands.subprocess, "call")
+
+    assert (
+        main(["switch-backend", "--pytorch-computation-backend=cu121", "--dry-run"])
+        == 0
+    )
+
+    call.assert_not_called()
+
+
+def test_switch_backend_command_channel(mocker):
+    distributions = [make_distribution("torch", "2.2.0.dev20231010+cpu")]
+    mocker.patch.object(
+        commands,
+        "get_default_environment",
+        lambda: SimpleNamespace(
+            iter_installed_distributions=lambda **kwargs: distributions
+        ),
+    )
+    call = mocker.patch.object(commands.subprocess, "call", return_value=0)
+
+    assert main(["switch-backend", "--pytorch-computation-backend=cu121"]) == 0
+
+    (install_call,) = [args for args, _ in call.call_args_list]
+    assert install_call[0][3:] == [
+        "install",
+        "--pytorch-computation-backend=cu121",
+        "--pytorch-channel=nightly",
+        "torch==2.2.0.dev20231010+cu121",
+    ]
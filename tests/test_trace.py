@@ -0,0 +1,66 @@
+import json
+import threading
+
+import pytest
+
+from light_the_torch import _trace as trace
+
+
+def test_nested_spans():
+    tracer = trace.Tracer()
+
+    with tracer.span("outer", foo="bar"):
+        with tracer.span("inner"):
+            tracer.annotate(inner=True)
+        tracer.annotate(outer=True)
+
+    outer, inner = tracer.spans
+    assert outer.name == "outer"
+    assert outer.args == dict(foo="bar", outer=True)
+    assert inner.args == dict(inner=True)
+    assert outer.start <= inner.start <= inner.end <= outer.end
+
+
+def test_error():
+    tracer = trace.Tracer()
+
+    with pytest.raises(RuntimeError):
+        with tracer.span("span"):
+            raise RuntimeError
+
+    (span,) = tracer.spans
+    assert span.args == dict(error="RuntimeError")
+    assert span.end is not None
+
+
+def test_annotate_other_thread():
+    tracer = trace.Tracer()
+
+    with tracer.span("span"):
+        thread = threading.Thread(target=lambda: tracer.annotate(foo="bar"))
+        thread.start()
+        thread.join()
+
+    (span,) = tracer.spans
+    assert not span.args
+
+
+def test_no_active_tracer():
+    with trace.span("span"):
+        trace.annotate(foo="bar")
+
+
+def test_tracing_export(tmp_path):
+    path = tmp_path / "trace.json"
+
+    with trace.tracing(str(path)):
+        with trace.span("span", foo="bar"):
+            trace.annotate(baz=1)
+
+    with open(path) as file:
+        (event,) = json.load(file)["traceEvents"]
+
+    assert event["name"] == "span"
+    assert event["ph"] == "X"
+    assert event["dur"] >= 0
+    assert event["args"] == dict(foo="bar", baz=1)
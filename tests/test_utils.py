@@ -0,0 +1,113 @@
+import contextlib
+import functools
+import os
+import threading
+
+from light_the_torch._utils import (
+    apply_fn_patch,
+    apply_fn_wrapper,
+    apply_shared_patch,
+    cache_subdir,
+)
+
+
+def add(a, b=0):
+    return a + b
+
+
+def add_patch(offset):
+    return apply_fn_patch(
+        __name__, "add", postprocessing=lambda input, output: output + offset
+    )
+
+
+def test_apply_fn_patch():
+    vanilla_add = add
+
+    with add_patch(10):
+        assert add(1, b=2) == 13
+
+    assert add is vanilla_add
+    assert add(1, b=2) == 3
+
+
+def test_apply_fn_patch_layering():
+    def preprocessing(input):
+        input.b = 2
+
+    with apply_fn_patch(__name__, "add", preprocessing=preprocessing):
+        with apply_fn_wrapper(
+            __name__, "add", wrapper=lambda fn: lambda a, b=0: fn(a, b) * 10
+        ):
+            assert add(1) == 30
+
+        assert add(1) == 3
+
+
+def test_apply_fn_patch_wrapper_signature():
+    # The wrapper of another patch uses different names for the parameters.
+    with apply_fn_wrapper(__name__, "add", wrapper=lambda fn: lambda x, y=0: fn(x, y)):
+        with add_patch(10):
+            assert add(1) == 11
+            assert add(1, 2) == 13
+
+
+def test_apply_fn_patch_concurrent():
+    # Both threads have their patches applied at the same time, but only see their
+    # own.
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def run(offset):
+        with add_patch(offset):
+            barrier.wait()
+            results[offset] = add(1)
+            barrier.wait()
+
+    threads = [threading.Thread(target=run, args=(offset,)) for offset in [10, 20]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {10: 11, 20: 21}
+    assert add(1) == 1
+
+
+@functools.lru_cache()
+def cached_add(a, b=0):
+    return a + b
+
+
+def test_apply_fn_patch_cached():
+    with apply_fn_patch(__name__, "cached_add"):
+        assert cached_add(1) == 1
+        assert cached_add.cache_info().currsize == 1
+
+        cached_add.cache_clear()
+
+        assert cached_add.cache_info().currsize == 0
+
+
+def test_apply_shared_patch():
+    entered = []
+
+    @contextlib.contextmanager
+    def patch():
+        entered.append(True)
+        try:
+            yield
+        finally:
+            entered.pop()
+
+    with apply_shared_patch("foo", patch):
+        with apply_shared_patch("foo", patch):
+            assert entered == [True]
+        assert entered == [True]
+
+    assert entered == []
+
+
+def test_cache_subdir():
+    assert cache_subdir(False, "ltt", "locks") is None
+    assert cache_subdir("foo", "ltt", "locks") == os.path.join("foo", "ltt", "locks")